@@ -1,31 +1,88 @@
-from flask import Flask, redirect, url_for
+from flask import Flask, redirect, url_for, flash, request
 from flask_login import LoginManager, current_user
-from models.models import db, User
+from flask_wtf.csrf import generate_csrf
+from models.models import db, User, apply_sqlite_pragmas
 from routes.auth import auth_bp    # Blueprint para autenticación
 from routes.tasks import tasks_bp  # Blueprint para tareas
 from routes.oauth import oauth_bp
+from routes.api import api_bp      # API JSON de tareas
+from services.api_service import init_deals_cache, deals_cache
+from services.oauth_service import init_oauth, oidc_cache
+from services.auth_service import init_user_cache, load_user_snapshot, user_cache
+from services.password_service import init_password_hashing
+from services.metrics_service import init_metrics, metrics, cache_collector
+from services.http_service import init_http_clients, http_collector
+from services.sweeper_service import init_sweeper, sweeper_collector
+from services.query_audit_service import init_query_audit
+from services.profiling_service import init_profiling
+from services.storage_service import StreamingUploadRequest
+from services.migration_service import upgrade
+from services.task_service import init_fragment_cache, task_list_fragments
+from cli import register_commands
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def create_app():
+def create_app(test_config=None):
     app = Flask(__name__)
     app.config.from_object('config.Config')
+    # La configuración de pruebas se aplica antes de crear el motor de la base de datos
+    if test_config is not None:
+        app.config.from_object(test_config)
+    # config se importa después de load_dotenv para leer las variables del .env
+    from config import validate_config
+    validate_config(app.config)
+
+    # Los archivos subidos se reciben en disco por bloques, con límite de tamaño
+    app.request_class = StreamingUploadRequest
 
     # Configuración de la base de datos
     db.init_app(app)
 
-    # Inicializar base de datos en el contexto de la app
+    # El esquema se gestiona con migraciones (`flask db upgrade`); el arranque de los
+    # workers no toca el esquema salvo en bases de datos efímeras
     with app.app_context():
-        db.create_all()
+        apply_sqlite_pragmas(db.engine, app.config.get('SQLITE_PRAGMAS'))
+        if app.config.get('DB_AUTO_MIGRATE'):
+            upgrade(db.engine)
+
+        # Métricas de peticiones, SQL, llamadas externas y cachés en /metrics
+        init_metrics(app, db.engine)
+
+        # Registro de consultas lentas y detección de N+1 (sólo desarrollo/preproducción)
+        init_query_audit(app, db.engine)
+
+    # Clientes HTTP salientes con pool, plazos, reintentos y circuit breaker
+    init_http_clients(app)
+
+    # Caché de ofertas de CheapShark
+    init_deals_cache(app)
+
+    # Proveedores OAuth (se registran una sola vez por proceso)
+    init_oauth(app)
 
     # Login Manager
     login_manager = LoginManager()
     login_manager.init_app(app)
 
+    # Token CSRF para los formularios que no son FlaskForm (p. ej. borrar una tarea)
+    app.jinja_env.globals['csrf_token'] = generate_csrf
+
+    # Caché de usuarios delante del user_loader
+    init_user_cache(app)
+
+    # Caché de fragmentos renderizados del listado de tareas
+    init_fragment_cache(app)
+
+    # Pool acotado para el hashing de contraseñas
+    init_password_hashing(app)
+
+    # Purga en segundo plano de tareas borradas y archivos sin referencias
+    init_sweeper(app)
+
     @login_manager.user_loader
     def load_user(user_id):
-        return db.session.get(User, int(user_id))
+        return load_user_snapshot(int(user_id))
 
     @app.route("/")
     def index():
@@ -33,10 +90,32 @@ def create_app():
             return redirect(url_for('tasks.dashboard'))
         return redirect(url_for('auth.login'))
 
+    @app.errorhandler(413)
+    def upload_too_large(error):
+        limit = app.config['MAX_UPLOAD_SIZE'] // (1024 * 1024)
+        flash(f"El archivo es demasiado grande. Límite: {limit} MB.", "error")
+        return redirect(request.referrer or url_for('index'))
+
+    metrics.register_collector('deals', cache_collector(
+        'deals', deals_cache.stats, hits=('hits', 'stale_hits', 'negative_hits'), misses=('misses',)))
+    metrics.register_collector('users', cache_collector('users', user_cache.stats))
+    metrics.register_collector('task_list_fragments', cache_collector('task_list_fragments', task_list_fragments.stats))
+    metrics.register_collector('oidc', cache_collector(
+        'oidc', oidc_cache.total_stats, hits=('hits', 'stale_hits', 'negative_hits'), misses=('misses',)))
+    metrics.register_collector('http', http_collector)
+    metrics.register_collector('sweeper', sweeper_collector)
+
+    # Perfilado de peticiones bajo demanda (cabecera X-Profile o muestreo)
+    init_profiling(app)
+
+    # Comandos de consola (flask db ...)
+    register_commands(app)
+
     # Registrar Blueprints
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(tasks_bp, url_prefix='/tasks')
     app.register_blueprint(oauth_bp, url_prefix='/oauth')
+    app.register_blueprint(api_bp, url_prefix='/api/v1')
 
     return app
 
@@ -0,0 +1,162 @@
+"""
+Concurrent-writer benchmark of the database profiles under gunicorn.
+
+For every profile a fresh database is created, the app is started with gunicorn and
+several writer threads create tasks through the JSON API for a fixed time. The report
+shows write throughput, latency percentiles and how many requests failed (for SQLite,
+mostly "database is locked" errors surfacing as 500 responses).
+
+Usage:
+    python benchmarks/db_profiles.py --profiles default sqlite-wal sqlite-memory --workers 4 --writers 16
+
+The OAuth environment variables required by config.Config must be set. The
+`server-pool` profile is only run when DATABASE_URL is set.
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import requests
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=5)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"gunicorn did not start listening on {url}")
+
+
+def form_post(session, url, data):
+    """POST a Flask-WTF form, sending the CSRF token found on the form page."""
+    page = session.get(url).text
+    match = re.search(r'name="csrf_token" type="hidden" value="([^"]+)"', page)
+    return session.post(url, data=dict(data, csrf_token=match.group(1) if match else ''))
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def writer(base_url, cookies, deadline, latencies, errors, lock):
+    session = requests.Session()
+    session.cookies.update(cookies)
+    count = 0
+    while time.monotonic() < deadline:
+        payload = {'operations': [{'op': 'create', 'title': f'bench {threading.get_ident()} {count}', 'priority': 2}]}
+        start = time.perf_counter()
+        try:
+            response = session.post(f'{base_url}/api/v1/tasks/batch', json=payload, timeout=30)
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors.append(elapsed)
+        count += 1
+
+
+def run_profile(profile, workers, writers, duration):
+    if profile == 'sqlite-memory' and workers > 1:
+        # Cada worker tendría su propia base de datos en memoria
+        workers = 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DB_PROFILE=profile, SQLITE_PATH=os.path.join(tmp, 'bench.db'))
+        # Crear el esquema una sola vez antes de arrancar los workers
+        subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'db', 'upgrade'],
+                       cwd=ROOT_DIR, env=env, check=True)
+
+        port = free_port()
+        base_url = f'http://127.0.0.1:{port}'
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{port}',
+             '--log-level', 'warning', 'app:create_app()'],
+            cwd=ROOT_DIR, env=env
+        )
+        try:
+            wait_until_ready(f'{base_url}/auth/login')
+            session = requests.Session()
+            credentials = {'username': 'bench', 'password': 'bench-password'}
+            form_post(session, f'{base_url}/auth/register', credentials)
+            form_post(session, f'{base_url}/auth/login', credentials)
+
+            latencies, errors, lock = [], [], threading.Lock()
+            deadline = time.monotonic() + duration
+            threads = [
+                threading.Thread(target=writer, args=(base_url, session.cookies, deadline, latencies, errors, lock))
+                for _ in range(writers)
+            ]
+            started = time.monotonic()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.monotonic() - started
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    return {
+        'profile': profile,
+        'workers': workers,
+        'writers': writers,
+        'writes': len(latencies),
+        'errors': len(errors),
+        'writes_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 1) if latencies else 0.0,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--profiles', nargs='+', default=['default', 'sqlite-wal', 'sqlite-memory', 'server-pool'])
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    parser.add_argument('--writers', type=int, default=16, help='concurrent client threads')
+    parser.add_argument('--duration', type=float, default=10, help='seconds of load per profile')
+    parser.add_argument('--json', help='also write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    results = []
+    for profile in args.profiles:
+        if profile == 'server-pool' and not os.getenv('DATABASE_URL'):
+            print('server-pool: skipped (DATABASE_URL is not set)')
+            continue
+        result = run_profile(profile, args.workers, args.writers, args.duration)
+        results.append(result)
+        print(f"{result['profile']:>14}: {result['writes_per_second']:>8} writes/s  "
+              f"p50 {result['p50_ms']:>7} ms  p99 {result['p99_ms']:>7} ms  "
+              f"errors {result['errors']} (workers={result['workers']}, writers={result['writers']})")
+
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+"""
+Concurrent load test of a real gunicorn deployment sharing one SQLite file.
+
+A temporary database is seeded with users and tasks, local stand-ins replace CheapShark
+and the Google OAuth endpoints, and the app is started under gunicorn with the production
+configuration (gunicorn.conf.py, preloaded `wsgi:app`). Virtual users then log in and
+replay a weighted mix of requests at a fixed concurrency:
+
+    login       POST /auth/login (one password hash check)
+    dashboard   GET /tasks/dashboard, revalidating with the last ETag like a browser
+    create      POST /tasks/dashboard as a partial request (new task fragment)
+    toggle      POST /tasks/toggle_complete/<id> as a partial request
+    oauth       GET /oauth/login (redirect to the OAuth stand-in, not followed)
+
+The report shows throughput, latency percentiles and status codes per operation, the
+error rate and SQLite lock contention: requests that failed because the database was
+locked, counted from the gunicorn error log.
+
+Usage:
+    python benchmarks/load.py --workers 4 --concurrency 32 --duration 30
+    python benchmarks/load.py --mix dashboard=70 create=10 toggle=15 login=5 --json load.json
+"""
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+import requests
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.db_profiles import free_port, wait_until_ready, percentile  # noqa: E402
+from benchmarks.stubs import cheapshark_stub, oauth_stub, oauth_environment  # noqa: E402
+
+DEFAULT_MIX = {'dashboard': 60, 'create': 15, 'toggle': 15, 'login': 8, 'oauth': 2}
+PASSWORD = 'load-password'
+PARTIAL = {'X-Requested-With': 'fetch'}
+LOCK_ERROR = 'database is locked'
+
+
+def parse_mix(items):
+    """Parse `name=weight` items into a weight table, validating the operation names."""
+    mix = {}
+    for item in items:
+        name, _, weight = item.partition('=')
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Unknown operation '{name}'")
+        mix[name] = float(weight)
+    return mix
+
+
+def seed(env, users, tasks_per_user):
+    """Create the schema and the load-test users and tasks in the database of `env`."""
+    script = f"""
+from app import create_app
+from models.models import db, User, Task
+from services.password_service import hash_password
+from services.search_service import rebuild_index
+app = create_app()
+with app.app_context():
+    password = hash_password({PASSWORD!r})
+    for n in range({users}):
+        user = User(username=f'load{{n}}', password=password)
+        db.session.add(user)
+        db.session.flush()
+        db.session.execute(Task.__table__.insert(), [
+            {{'title': f'Task {{i}}', 'description': 'Seeded', 'priority': i % 4 + 1,
+              'is_complete': i % 3 == 0, 'user_id': user.id}}
+            for i in range({tasks_per_user})
+        ])
+    db.session.commit()
+    rebuild_index()
+"""
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'db', 'upgrade'],
+                   cwd=ROOT_DIR, env=env, check=True, stdout=subprocess.DEVNULL)
+    subprocess.run([sys.executable, '-c', script], cwd=ROOT_DIR, env=env, check=True)
+
+
+class VirtualUser:
+    """One simulated browser: a cookie session, its CSRF token, known tasks and last ETag."""
+
+    def __init__(self, base_url, username):
+        self.base_url = base_url
+        self.username = username
+        self.session = requests.Session()
+        self.csrf_token = ''
+        self.task_ids = []
+        self.etag = None
+
+    def login(self):
+        page = self.session.get(f'{self.base_url}/auth/login', timeout=30).text
+        token = re.search(r'name="csrf_token" type="hidden" value="([^"]+)"', page)
+        response = self.session.post(f'{self.base_url}/auth/login', allow_redirects=False, timeout=30, data={
+            'username': self.username, 'password': PASSWORD, 'csrf_token': token.group(1) if token else ''
+        })
+        # Tras el login hay que volver a leer el token del formulario de tareas
+        self.csrf_token = ''
+        self.etag = None
+        return response
+
+    def dashboard(self):
+        headers = {'If-None-Match': self.etag} if self.etag else {}
+        response = self.session.get(f'{self.base_url}/tasks/dashboard', headers=headers, timeout=30)
+        if response.status_code == 200:
+            self.etag = response.headers.get('ETag')
+            token = re.search(r'name="csrf_token" type="hidden" value="([^"]+)"', response.text)
+            if token:
+                self.csrf_token = token.group(1)
+            self.task_ids = [int(task_id) for task_id in re.findall(r'id="task-(\d+)"', response.text)] or self.task_ids
+        return response
+
+    def create(self):
+        if not self.csrf_token:
+            self.etag = None
+            self.dashboard()
+        response = self.session.post(f'{self.base_url}/tasks/dashboard', headers=PARTIAL, timeout=30, data={
+            'title': f'Load task {random.randint(0, 10 ** 6)}', 'description': 'Created under load',
+            'priority': random.randint(1, 4), 'csrf_token': self.csrf_token,
+        })
+        match = re.search(r'id="task-(\d+)"', response.text) if response.status_code == 201 else None
+        if match:
+            self.task_ids.append(int(match.group(1)))
+        return response
+
+    def toggle(self):
+        if not self.task_ids:
+            self.etag = None
+            self.dashboard()
+        task_id = random.choice(self.task_ids) if self.task_ids else 0
+        return self.session.post(f'{self.base_url}/tasks/toggle_complete/{task_id}', headers=PARTIAL, timeout=30)
+
+    def oauth(self):
+        return self.session.get(f'{self.base_url}/oauth/login', allow_redirects=False, timeout=30)
+
+
+def run_user(user, mix, deadline, results, lock):
+    names, weights = zip(*mix.items())
+    operation = 'login'
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            status = getattr(user, operation)().status_code
+        except requests.RequestException:
+            status = 'exception'
+        elapsed = time.perf_counter() - start
+        with lock:
+            results[operation].append((elapsed, status))
+        operation = random.choices(names, weights)[0]
+
+
+def report(results, elapsed, lock_errors):
+    """Summarize the collected samples per operation and in total."""
+    summary = {'duration_s': round(elapsed, 1), 'operations': {}, 'lock_errors': lock_errors}
+    total = errors = 0
+    for operation, samples in sorted(results.items()):
+        latencies = [latency for latency, _ in samples]
+        statuses = defaultdict(int)
+        for _, status in samples:
+            statuses[str(status)] += 1
+        failed = sum(count for status, count in statuses.items() if not status.isdigit() or int(status) >= 400)
+        total += len(samples)
+        errors += failed
+        summary['operations'][operation] = {
+            'requests': len(samples),
+            'throughput_rps': round(len(samples) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+            'p90_ms': round(percentile(latencies, 0.90) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+            'error_rate': round(failed / len(samples), 4) if samples else 0.0,
+            'statuses': dict(statuses),
+        }
+    summary['requests'] = total
+    summary['throughput_rps'] = round(total / elapsed, 1) if elapsed else 0.0
+    summary['error_rate'] = round(errors / total, 4) if total else 0.0
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=20, help='seconds of load')
+    parser.add_argument('--users', type=int, default=8, help='seeded accounts shared by the virtual users')
+    parser.add_argument('--tasks-per-user', type=int, default=1000, help='seeded tasks per account')
+    parser.add_argument('--mix', nargs='+', default=None, metavar='OP=WEIGHT',
+                        help=f"operation weights (default: {' '.join(f'{k}={v}' for k, v in DEFAULT_MIX.items())})")
+    parser.add_argument('--profile', default=os.getenv('DB_PROFILE', 'sqlite-wal'), help='DB_PROFILE to run')
+    parser.add_argument('--json', help='also write the report to this JSON file')
+    args = parser.parse_args(argv)
+    mix = parse_mix(args.mix) if args.mix else DEFAULT_MIX
+
+    with tempfile.TemporaryDirectory() as tmp, cheapshark_stub() as deals, oauth_stub() as identity:
+        env = dict(os.environ, DB_PROFILE=args.profile, SQLITE_PATH=os.path.join(tmp, 'load.db'),
+                   CHEAPSHARK_API_URL=deals.url + '/api/1.0/deals', **oauth_environment(identity))
+        for name, value in (('OAUTH_CLIENT_ID', 'load'), ('OAUTH_CLIENT_SECRET', 'load'),
+                            ('OAUTH_REDIRECT_URI', 'http://127.0.0.1/oauth/callback')):
+            env.setdefault(name, value)
+        seed(env, args.users, args.tasks_per_user)
+
+        port = free_port()
+        base_url = f'http://127.0.0.1:{port}'
+        error_log = os.path.join(tmp, 'gunicorn-error.log')
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-w', str(args.workers),
+             '-b', f'127.0.0.1:{port}', '--error-logfile', error_log, 'wsgi:app'],
+            cwd=ROOT_DIR, env=env
+        )
+        try:
+            wait_until_ready(f'{base_url}/auth/login')
+            users = [VirtualUser(base_url, f'load{n % args.users}') for n in range(args.concurrency)]
+            results, lock = defaultdict(list), threading.Lock()
+            deadline = time.monotonic() + args.duration
+            threads = [threading.Thread(target=run_user, args=(user, mix, deadline, results, lock)) for user in users]
+            started = time.monotonic()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.monotonic() - started
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+        with open(error_log, errors='replace') as log:
+            lock_errors = sum(line.count(LOCK_ERROR) for line in log if 'OperationalError' in line)
+
+    summary = report(results, elapsed, lock_errors)
+    summary.update(workers=args.workers, concurrency=args.concurrency, profile=args.profile, mix=mix)
+
+    print(f"{summary['requests']} requests in {summary['duration_s']} s: {summary['throughput_rps']} req/s, "
+          f"error rate {summary['error_rate']:.2%}, SQLite lock errors {lock_errors}")
+    for operation, stats in summary['operations'].items():
+        print(f"{operation:>10}: {stats['throughput_rps']:>7} req/s  p50 {stats['p50_ms']:>7} ms  "
+              f"p90 {stats['p90_ms']:>7} ms  p99 {stats['p99_ms']:>7} ms  errors {stats['error_rate']:.2%}  "
+              f"{stats['statuses']}")
+
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump(summary, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+"""
+Micro-benchmarks of the task and login hot paths, with JSON baselines.
+
+A temporary SQLite database is seeded with one user per dataset size (10 to 100k tasks
+by default) and every benchmark is timed against each of them:
+
+    get_tasks_by_user     load every task of the user
+    get_task_page         first dashboard page (keyset pagination)
+    create_task           create one task through the service
+    update_task           edit one task through the service
+    toggle_task           toggle one task through the service
+    login                 `authenticate`, i.e. one password hash check
+    dashboard_cold        GET /tasks/dashboard with the task list fragment cache empty
+    dashboard_warm        GET /tasks/dashboard served from the fragment cache
+
+CheapShark is replaced by a local stub server, so timings never include the network.
+
+Usage:
+    python benchmarks/micro.py                       # run and compare with the baseline, if any
+    python benchmarks/micro.py --save-baseline       # run and store a new baseline
+    python benchmarks/micro.py --check               # regression check: the baseline must exist
+    python benchmarks/micro.py --sizes 10 1000 --threshold 0.5
+
+The run exits with status 1 when the median of any benchmark is slower than its
+baseline by more than `--threshold` (a fraction, 0.25 = 25%). Baselines depend on the
+machine, so record them on the machine that runs the comparison. Without a baseline a
+plain run only prints its timings; with `--check` it exits with status 2 before running
+anything, so a missing baseline never passes as "no regressions".
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DEFAULT_BASELINE = os.path.join(ROOT_DIR, 'benchmarks', 'baselines', 'micro.json')
+DEFAULT_SIZES = [10, 1000, 10000, 100000]
+PASSWORD = 'bench-password'
+SEED_CHUNK = 10000
+
+
+def summarize(samples):
+    """Return the median, p95 and minimum of a list of timings in seconds, in milliseconds."""
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    return {
+        'median_ms': round(statistics.median(samples) * 1000, 3),
+        'p95_ms': round(p95 * 1000, 3),
+        'min_ms': round(samples[0] * 1000, 3),
+        'runs': len(samples),
+    }
+
+
+def measure(fn, repeat, setup=None):
+    """Time `fn()` `repeat` times, calling `setup()` untimed before each run."""
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare benchmark results with a baseline.
+
+    Args:
+        results (dict): Benchmark keys ('name@size') mapped to their summaries.
+        baseline (dict): The same structure, as stored by `--save-baseline`.
+        threshold (float): Allowed slowdown of the median, as a fraction.
+
+    Returns:
+        list[str]: One message per regression (empty if there is none).
+    """
+    regressions = []
+    for key, result in sorted(results.items()):
+        reference = baseline.get(key)
+        if not reference or not reference.get('median_ms'):
+            continue
+        ratio = result['median_ms'] / reference['median_ms']
+        if ratio > 1 + threshold:
+            regressions.append(
+                f"{key}: {result['median_ms']} ms vs baseline {reference['median_ms']} ms (+{(ratio - 1) * 100:.0f}%)"
+            )
+    return regressions
+
+
+def seed(db, User, Task, hash_password, size):
+    """Create the user `bench<size>` with `size` tasks and return its id."""
+    user = User(username=f'bench{size}', password=hash_password(PASSWORD))
+    db.session.add(user)
+    db.session.commit()
+    for start in range(0, size, SEED_CHUNK):
+        rows = [
+            {'title': f'Task {i}', 'description': f'Synthetic task number {i}', 'priority': i % 4 + 1,
+             'is_complete': i % 3 == 0, 'user_id': user.id}
+            for i in range(start, min(size, start + SEED_CHUNK))
+        ]
+        db.session.execute(Task.__table__.insert(), rows)
+        db.session.commit()
+    return user.id
+
+
+def run(sizes, repeat):
+    """Seed a temporary database, run every benchmark and return the results."""
+    tmp = tempfile.mkdtemp(prefix='todo-bench-')
+    os.environ.setdefault('DB_PROFILE', 'sqlite-wal')
+    os.environ['SQLITE_PATH'] = os.path.join(tmp, 'bench.db')
+    for name, value in (('OAUTH_CLIENT_ID', 'bench'), ('OAUTH_CLIENT_SECRET', 'bench'),
+                        ('OAUTH_REDIRECT_URI', 'http://localhost/oauth/callback')):
+        os.environ.setdefault(name, value)
+    sys.path.insert(0, ROOT_DIR)
+
+    from benchmarks.stubs import cheapshark_stub
+    from app import create_app
+    from models.models import db, User, Task
+    from services import api_service
+    from services.auth_service import authenticate
+    from services.migration_service import upgrade
+    from services.password_service import hash_password
+    from services.search_service import rebuild_index
+    from services.task_service import (get_tasks_by_user, get_task_page, create_task, update_task,
+                                       toggle_task_completion, task_list_fragments)
+
+    app = create_app()
+    app.config.update(WTF_CSRF_ENABLED=False, UPLOAD_FOLDER=os.path.join(tmp, 'uploads'))
+    results = {}
+
+    with cheapshark_stub() as stub, app.app_context():
+        api_service.CHEAPSHARK_API_URL = stub.url + '/api/1.0/deals'
+        upgrade(db.engine)
+        users = {size: seed(db, User, Task, hash_password, size) for size in sizes}
+        rebuild_index()
+
+        for size in sizes:
+            user = db.session.get(User, users[size])
+            task_ids = [task_id for (task_id,) in db.session.query(Task.id).filter_by(user_id=user.id)]
+
+            def form(title):
+                return SimpleNamespace(title=SimpleNamespace(data=title),
+                                       description=SimpleNamespace(data='Benchmark'),
+                                       priority=SimpleNamespace(data=random.choice((1, 2, 3, 4))),
+                                       image=SimpleNamespace(data=None))
+
+            with app.test_request_context():
+                benchmarks = {
+                    'get_tasks_by_user': lambda: get_tasks_by_user(user),
+                    'get_task_page': lambda: get_task_page(user, is_complete=False),
+                    'create_task': lambda: create_task(form('Benchmark task'), user),
+                    'update_task': lambda: update_task(random.choice(task_ids), user, form('Edited')),
+                    'toggle_task': lambda: toggle_task_completion(random.choice(task_ids), user),
+                    'login': lambda: authenticate(user.username, PASSWORD),
+                }
+                for name, fn in benchmarks.items():
+                    fn()  # calentamiento
+                    results[f'{name}@{size}'] = measure(fn, repeat)
+                    db.session.expunge_all()
+                    user = db.session.get(User, users[size])
+
+            client = app.test_client()
+            client.post('/auth/login', data={'username': user.username, 'password': PASSWORD})
+            client.get('/tasks/dashboard')  # consume los mensajes flash del login
+            results[f'dashboard_cold@{size}'] = measure(
+                lambda: client.get('/tasks/dashboard'), repeat, setup=task_list_fragments.clear
+            )
+            results[f'dashboard_warm@{size}'] = measure(lambda: client.get('/tasks/dashboard'), repeat)
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES, help='tasks per seeded user')
+    parser.add_argument('--repeat', type=int, default=20, help='timed runs per benchmark')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=float(os.getenv('BENCH_THRESHOLD', 0.25)),
+                        help='allowed slowdown of the median before failing (0.25 = 25%%)')
+    parser.add_argument('--json', help='also write the results to this JSON file')
+    parser.add_argument('--check', action='store_true', help='fail if there is no baseline to compare with')
+    args = parser.parse_args(argv)
+
+    if args.check and not args.save_baseline and not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one.", file=sys.stderr)
+        return 2
+
+    results = run(args.sizes, args.repeat)
+    for key, result in results.items():
+        print(f"{key:>28}: median {result['median_ms']:>10} ms  p95 {result['p95_ms']:>10} ms  "
+              f"min {result['min_ms']:>10} ms")
+
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one.")
+        return 0
+    with open(args.baseline) as source:
+        regressions = compare(results, json.load(source), args.threshold)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
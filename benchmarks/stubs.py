@@ -0,0 +1,127 @@
+"""
+Local stand-ins for the external services the app calls, used by the benchmarks so
+they never depend on the network or on the speed of a third-party API.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+import json
+import threading
+
+
+def sample_deals(count=60):
+    """Return `count` CheapShark-like deals that all pass the app's score filters."""
+    return [
+        {
+            'title': f'Benchmark Game {i}',
+            'salePrice': f'{4.99 + i % 10:.2f}',
+            'normalPrice': '29.99',
+            'dealID': f'bench-deal-{i}',
+            'metacriticScore': str(86 + i % 10),
+            'dealRating': '9.5',
+        }
+        for i in range(count)
+    ]
+
+
+class StubServer:
+    """
+    Threaded HTTP server answering GET and POST requests from a table of JSON responses.
+
+    Attributes:
+        routes (dict): Request paths mapped to callables returning `(status, body)`,
+            where `body` is serialized as JSON.
+        peers (set): Client addresses seen, i.e. one per TCP connection.
+        url (str): Base URL of the running server.
+    """
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.peers = set()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Conexiones persistentes, como las de un servidor real
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                server.peers.add(self.client_address)
+                handler = server.routes.get(urlsplit(self.path).path)
+                status, body = handler() if handler else (404, {'error': 'not found'})
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                self.do_GET()
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._httpd.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self._httpd.server_address[1]}'
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def cheapshark_stub(deals=None):
+    """
+    Build a stand-in for the CheapShark deals endpoint.
+
+    Point `CHEAPSHARK_API_URL` at `stub.url + '/api/1.0/deals'` to use it.
+
+    Args:
+        deals (list[dict], optional): The deals to serve. Defaults to `sample_deals()`.
+
+    Returns:
+        StubServer: The (not yet started) server.
+    """
+    deals = sample_deals() if deals is None else deals
+    return StubServer({'/api/1.0/deals': lambda: (200, deals)})
+
+
+def oauth_stub():
+    """
+    Build a stand-in for the Google OAuth endpoints used by the app.
+
+    It serves an empty JWKS, a userinfo document and placeholder authorize and token
+    endpoints, which is enough for the login redirect and the JWKS prefetch. Point the
+    `GOOGLE_*` settings at it with `oauth_environment(stub)`.
+
+    Returns:
+        StubServer: The (not yet started) server.
+    """
+    return StubServer({
+        '/o/oauth2/auth': lambda: (200, {'status': 'authorize'}),
+        '/o/oauth2/token': lambda: (400, {'error': 'invalid_grant'}),
+        '/v1/userinfo': lambda: (200, {'sub': 'load-test', 'email': 'load@example.com'}),
+        '/oauth2/v3/certs': lambda: (200, {'keys': []}),
+    })
+
+
+def oauth_environment(stub):
+    """Return the environment variables that point the Google provider at `stub`."""
+    return {
+        'GOOGLE_AUTHORIZE_URL': stub.url + '/o/oauth2/auth',
+        'GOOGLE_TOKEN_URL': stub.url + '/o/oauth2/token',
+        'GOOGLE_USERINFO_URL': stub.url + '/v1/userinfo',
+        'GOOGLE_JWKS_URI': stub.url + '/oauth2/v3/certs',
+    }
@@ -0,0 +1,220 @@
+import click
+import multiprocessing
+import signal
+from flask import current_app
+from flask.cli import AppGroup
+from models.models import db, User
+from services.bulk_service import FORMATS, detect_format, read_rows, import_tasks, export_tasks
+from services.migration_service import MIGRATIONS, pending_migrations, upgrade
+from services.search_service import rebuild_index
+from services.startup_service import PHASES, measure_startup, summarize_startup
+from services.stats_service import reconcile_task_stats
+from services.sweeper_service import sweep
+from services.job_service import Worker, queue_stats, retry_failed_jobs
+
+db_cli = AppGroup('db', help='Database schema migrations.')
+search_cli = AppGroup('search', help='Full-text task search index.')
+perf_cli = AppGroup('perf', help='Performance checks.')
+tasks_cli = AppGroup('tasks', help='Bulk import, export and purge of tasks.')
+stats_cli = AppGroup('stats', help='Per-user task counters.')
+jobs_cli = AppGroup('jobs', help='Background job queue.')
+
+
+@db_cli.command('upgrade')
+@click.option('--target', type=int, default=None, help='Last migration version to apply.')
+def db_upgrade(target):
+    """Apply pending schema migrations."""
+    applied = upgrade(db.engine, target)
+    for migration in applied:
+        click.echo(f"Applied {migration.version:04d}: {migration.description}")
+    if not applied:
+        click.echo('Database schema is up to date.')
+
+
+@db_cli.command('status')
+def db_status():
+    """Show applied and pending schema migrations."""
+    pending = {migration.version for migration in pending_migrations(db.engine)}
+    for migration in MIGRATIONS:
+        state = 'pending' if migration.version in pending else 'applied'
+        click.echo(f"{migration.version:04d} [{state}] {migration.description}")
+
+
+@search_cli.command('rebuild')
+def search_rebuild():
+    """Rebuild the full-text index from the existing tasks."""
+    indexed = rebuild_index()
+    if indexed is None:
+        raise click.ClickException('This database has no full-text index (SQLite FTS5 only).')
+    click.echo(f"Indexed {indexed} tasks.")
+
+
+def _get_user(username):
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        raise click.ClickException(f"Unknown user '{username}'.")
+    return user
+
+
+@tasks_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--user', 'username', required=True, help='Owner of the imported tasks.')
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), default=None,
+              help='File format. Defaults to the file extension (.csv, .ndjson or .jsonl).')
+@click.option('--batch-size', type=int, default=None, help='Rows per commit. Defaults to IMPORT_BATCH_SIZE.')
+def tasks_import(path, username, fmt, batch_size):
+    """Import tasks from a CSV or NDJSON file."""
+    user = _get_user(username)
+    fmt = fmt or detect_format(None, path)
+    if fmt is None:
+        raise click.ClickException('Cannot tell the file format from its name; pass --format.')
+    config = current_app.config
+    with open(path, 'rb') as stream:
+        report = import_tasks(user.id, read_rows(stream, fmt),
+                              batch_size=batch_size or config['IMPORT_BATCH_SIZE'],
+                              max_errors=config['IMPORT_MAX_ERRORS'])
+    for error in report['errors']:
+        click.echo(f"Line {error['line']}: {error['error']}", err=True)
+    click.echo(f"Imported {report['imported']} tasks, {report['failed']} rows failed.")
+
+
+@tasks_cli.command('export')
+@click.option('--user', 'username', required=True, help='Owner of the exported tasks.')
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), default='csv', show_default=True)
+@click.option('--output', type=click.File('w', encoding='utf-8'), default='-', help='Output file (default: stdout).')
+def tasks_export(username, fmt, output):
+    """Export the tasks of a user as CSV or NDJSON."""
+    user = _get_user(username)
+    for piece in export_tasks(user.id, fmt, chunk_size=current_app.config['EXPORT_CHUNK_SIZE']):
+        output.write(piece)
+
+
+@tasks_cli.command('sweep')
+@click.option('--purge-after', type=float, default=None,
+              help='Seconds a deleted task is kept before it is purged. Defaults to PURGE_DELETED_AFTER.')
+@click.option('--upload-min-age', type=float, default=None,
+              help='Seconds an unreferenced upload is left untouched. Defaults to UPLOAD_GC_MIN_AGE.')
+def tasks_sweep(purge_after, upload_min_age):
+    """Purge deleted tasks and delete uploads no task references, like the background sweeper."""
+    config = current_app.config
+    report = sweep(config['PURGE_DELETED_AFTER'] if purge_after is None else purge_after,
+                   config['UPLOAD_GC_MIN_AGE'] if upload_min_age is None else upload_min_age)
+    click.echo(f"Purged {report['purged_tasks']} tasks and deleted {report['deleted_files']} files.")
+
+
+@stats_cli.command('reconcile')
+@click.option('--user', 'username', default=None, help='Only reconcile the counters of this user.')
+def stats_reconcile(username):
+    """Recompute the task counters from the tasks and fix the ones that drifted."""
+    user_id = _get_user(username).id if username else None
+    corrected = reconcile_task_stats(user_id)
+    click.echo(f"Corrected {corrected} counters." if corrected else 'Task counters are up to date.')
+
+
+def _run_worker(concurrency, burst):
+    # Punto de entrada de cada proceso hijo de `flask worker --processes`
+    from app import create_app
+    app = create_app()
+    _serve_jobs(Worker(app, concurrency=concurrency), burst)
+
+
+def _serve_jobs(worker, burst):
+    def stop(signum, frame):
+        worker.stop()
+
+    previous = {signum: signal.signal(signum, stop) for signum in (signal.SIGTERM, signal.SIGINT)}
+    try:
+        return worker.run(burst=burst)
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+
+
+@click.command('worker')
+@click.option('--concurrency', type=int, default=None, help='Jobs run at once per process. Defaults to JOB_CONCURRENCY.')
+@click.option('--processes', type=int, default=1, show_default=True,
+              help='Worker processes, to use several CPU cores.')
+@click.option('--burst', is_flag=True, help='Exit once there are no due jobs instead of waiting for more.')
+def worker_command(concurrency, processes, burst):
+    """Run background jobs from the queue until stopped (SIGTERM or Ctrl+C finish the running jobs first)."""
+    concurrency = concurrency or current_app.config['JOB_CONCURRENCY']
+    if processes <= 1:
+        processed = _serve_jobs(Worker(current_app._get_current_object(), concurrency=concurrency), burst)
+        click.echo(f"Processed {processed} jobs.")
+        return
+
+    context = multiprocessing.get_context('spawn')
+    children = [context.Process(target=_run_worker, args=(concurrency, burst), name=f'worker-{n}')
+                for n in range(processes)]
+    for child in children:
+        child.start()
+
+    def stop(signum, frame):
+        for child in children:
+            if child.is_alive():
+                child.terminate()
+
+    previous = {signum: signal.signal(signum, stop) for signum in (signal.SIGTERM, signal.SIGINT)}
+    try:
+        for child in children:
+            child.join()
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+    if any(child.exitcode for child in children):
+        raise click.ClickException('A worker process exited with an error.')
+
+
+@jobs_cli.command('status')
+def jobs_status():
+    """Show how many jobs are queued, running and failed."""
+    for status, count in queue_stats().items():
+        click.echo(f"{status:>8}: {count}")
+
+
+@jobs_cli.command('retry')
+@click.option('--name', default=None, help='Only retry the failed jobs with this name.')
+def jobs_retry(name):
+    """Queue the failed jobs again."""
+    click.echo(f"Queued {retry_failed_jobs(name)} failed jobs again.")
+
+
+@perf_cli.command('startup')
+@click.option('--runs', type=int, default=5, show_default=True, help='Fresh processes to start.')
+@click.option('--budget-ms', type=float, default=None,
+              help='Maximum median cold start (import + create_app + first request). Defaults to STARTUP_BUDGET_MS.')
+def perf_startup(runs, budget_ms):
+    """Measure the cold start of the app in fresh processes and check it against the budget."""
+    budget_ms = current_app.config['STARTUP_BUDGET_MS'] if budget_ms is None else budget_ms
+    summary = summarize_startup(measure_startup(runs))
+    for phase in PHASES:
+        click.echo(f"{phase:>17}: median {summary[phase]['median_ms']:>8} ms  max {summary[phase]['max_ms']:>8} ms")
+
+    problems = []
+    if summary['total_ms']['median_ms'] > budget_ms:
+        problems.append(f"median cold start {summary['total_ms']['median_ms']} ms is over the {budget_ms:g} ms budget")
+    if summary['deferred_loaded']:
+        problems.append(f"modules meant to load on first use were imported at startup: "
+                        f"{', '.join(summary['deferred_loaded'])}")
+    if problems:
+        raise click.ClickException('; '.join(problems))
+    click.echo(f"Within the {budget_ms:g} ms startup budget.")
+
+
+def register_commands(app):
+    """
+    Register the application's CLI command groups.
+
+    Args:
+        app (Flask): The Flask application instance.
+
+    Returns:
+        None
+    """
+    app.cli.add_command(db_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(perf_cli)
+    app.cli.add_command(tasks_cli)
+    app.cli.add_command(stats_cli)
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(worker_command)
@@ -1,13 +1,179 @@
 import os
+from sqlalchemy.pool import StaticPool
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+SQLITE_PATH = os.getenv('SQLITE_PATH', os.path.join(BASE_DIR, 'instance', 'app.db'))
+SQLITE_FILE_URI = 'sqlite:///' + SQLITE_PATH
+
+# Database performance profiles, selected with the DB_PROFILE environment variable.
+# `pragmas` are applied to every new SQLite connection (see models.apply_sqlite_pragmas).
+DB_PROFILES = {
+    # Plain file database with SQLAlchemy defaults (previous behaviour)
+    'default': {
+        'uri': SQLITE_FILE_URI,
+        'engine_options': {},
+        'pragmas': {},
+    },
+    # File database in WAL mode: readers do not block the writer and commits only fsync the log
+    'sqlite-wal': {
+        'uri': SQLITE_FILE_URI,
+        'engine_options': {
+            'connect_args': {'timeout': 15},
+            'pool_size': 10,
+            'max_overflow': 10,
+        },
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': 15000,
+            'cache_size': -64000,
+            'mmap_size': 268435456,
+            'temp_store': 'MEMORY',
+        },
+    },
+    # Single shared in-memory database, for tests and benchmarks (one process only)
+    'sqlite-memory': {
+        'uri': 'sqlite://',
+        'engine_options': {
+            'connect_args': {'check_same_thread': False},
+            'poolclass': StaticPool,
+        },
+        'pragmas': {
+            'journal_mode': 'MEMORY',
+            'synchronous': 'OFF',
+            'temp_store': 'MEMORY',
+        },
+        # Cada proceso empieza con una base de datos vacía
+        'auto_migrate': True,
+    },
+    # Client/server database (PostgreSQL, MySQL...) from DATABASE_URL with a sized pool
+    'server-pool': {
+        'uri': os.getenv('DATABASE_URL'),
+        'engine_options': {
+            'pool_size': int(os.getenv('DB_POOL_SIZE', 10)),
+            'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 20)),
+            'pool_timeout': 10,
+            'pool_recycle': 1800,
+            'pool_pre_ping': True,
+        },
+        'pragmas': {},
+    },
+}
 
 
 class Config:
     # Base settings
-    BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(BASE_DIR, 'instance', 'app.db')
+    BASE_DIR = BASE_DIR
+    DB_PROFILE = os.getenv('DB_PROFILE', 'sqlite-wal')
+    if DB_PROFILE not in DB_PROFILES:
+        raise ValueError(f"DB_PROFILE desconocido: {DB_PROFILE}")
+    if not DB_PROFILES[DB_PROFILE]['uri']:
+        raise ValueError(f"El perfil {DB_PROFILE} necesita la variable de entorno DATABASE_URL")
+    SQLALCHEMY_DATABASE_URI = DB_PROFILES[DB_PROFILE]['uri']
+    SQLALCHEMY_ENGINE_OPTIONS = DB_PROFILES[DB_PROFILE]['engine_options']
+    SQLITE_PRAGMAS = DB_PROFILES[DB_PROFILE]['pragmas']
+    # Apply pending migrations in create_app; otherwise run `flask db upgrade` at deploy time
+    DB_AUTO_MIGRATE = os.getenv('DB_AUTO_MIGRATE', str(DB_PROFILES[DB_PROFILE].get('auto_migrate', False))).lower() == 'true'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Dashboard and API listing
+    TASKS_PAGE_SIZE = int(os.getenv('TASKS_PAGE_SIZE', 50))
+    API_BATCH_LIMIT = int(os.getenv('API_BATCH_LIMIT', 500))
+
+    # Bulk import/export of tasks (CSV / NDJSON). Imports are streamed from the request
+    # body, so they have their own size limit instead of MAX_CONTENT_LENGTH.
+    IMPORT_MAX_SIZE = int(os.getenv('IMPORT_MAX_SIZE', 100 * 1024 * 1024))
+    IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', 1000))
+    IMPORT_MAX_ERRORS = int(os.getenv('IMPORT_MAX_ERRORS', 100))
+    EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 1000))
+
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'static/uploads')
 
+    # Uploads are streamed to disk; the limit is enforced while the bytes arrive
+    MAX_UPLOAD_SIZE = int(os.getenv('MAX_UPLOAD_SIZE', 5 * 1024 * 1024))
+    UPLOAD_SPOOL_THRESHOLD = int(os.getenv('UPLOAD_SPOOL_THRESHOLD', 512 * 1024))
+    MAX_CONTENT_LENGTH = MAX_UPLOAD_SIZE + 1024 * 1024
+
+    # Background sweeper (seconds): purges soft deleted tasks once PURGE_DELETED_AFTER has
+    # passed and deletes unreferenced uploads older than UPLOAD_GC_MIN_AGE. 0 disables it.
+    SWEEP_INTERVAL = float(os.getenv('SWEEP_INTERVAL', 300))
+    PURGE_DELETED_AFTER = float(os.getenv('PURGE_DELETED_AFTER', 3600))
+    UPLOAD_GC_MIN_AGE = float(os.getenv('UPLOAD_GC_MIN_AGE', 3600))
+    # Run the sweeper in a thread of each web process; turn it off when `flask worker`
+    # runs it as the periodic 'tasks.sweep' job
+    SWEEPER_THREAD = os.getenv('SWEEPER_THREAD', 'true').lower() == 'true'
+
+    # Background job queue stored in the database and run by `flask worker` (seconds)
+    JOB_CONCURRENCY = int(os.getenv('JOB_CONCURRENCY', 4))
+    JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 1))
+    JOB_VISIBILITY_TIMEOUT = float(os.getenv('JOB_VISIBILITY_TIMEOUT', 300))
+    JOB_RETRY_BACKOFF = float(os.getenv('JOB_RETRY_BACKOFF', 10))
+    JOB_MAX_BACKOFF = float(os.getenv('JOB_MAX_BACKOFF', 3600))
+    # With SWEEPER_THREAD off, released uploads are collected by one 'uploads.collect' job
+    # per window of this many seconds, run when the window closes; 0 queues a job for
+    # every release. With the thread on, the next sweep collects them
+    UPLOAD_COLLECT_DELAY = float(os.getenv('UPLOAD_COLLECT_DELAY', 30))
+    # Periodic recomputation of the per-user task counters; 0 disables it
+    STATS_RECONCILE_INTERVAL = float(os.getenv('STATS_RECONCILE_INTERVAL', 24 * 3600))
+
+    # CheapShark deals cache (seconds)
+    DEALS_CACHE_TTL = int(os.getenv('DEALS_CACHE_TTL', 300))
+    DEALS_CACHE_STALE_TTL = int(os.getenv('DEALS_CACHE_STALE_TTL', 3600))
+    DEALS_CACHE_NEGATIVE_TTL = int(os.getenv('DEALS_CACHE_NEGATIVE_TTL', 30))
+
+    # Outbound HTTP clients (CheapShark, OAuth): keep-alive pool, per-attempt timeout,
+    # deadline per call, jittered retries of idempotent requests and circuit breaker
+    HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', 5))
+    HTTP_DEADLINE = float(os.getenv('HTTP_DEADLINE', 10))
+    HTTP_RETRIES = int(os.getenv('HTTP_RETRIES', 2))
+    HTTP_RETRY_BACKOFF = float(os.getenv('HTTP_RETRY_BACKOFF', 0.2))
+    HTTP_RETRY_MAX_BACKOFF = float(os.getenv('HTTP_RETRY_MAX_BACKOFF', 2))
+    HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 10))
+    HTTP_BREAKER_FAILURES = int(os.getenv('HTTP_BREAKER_FAILURES', 5))
+    HTTP_BREAKER_RESET = float(os.getenv('HTTP_BREAKER_RESET', 30))
+
+    # Per-process cache of logged-in users
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 1024))
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 60))
+
+    # Per-process cache of rendered task list fragments, keyed by user and task list version
+    FRAGMENT_CACHE_SIZE = int(os.getenv('FRAGMENT_CACHE_SIZE', 512))
+    FRAGMENT_CACHE_TTL = int(os.getenv('FRAGMENT_CACHE_TTL', 600))
+
+    # Metrics exposed on /metrics, off unless enabled. Outside development (DEBUG) and
+    # testing, METRICS_TOKEN is required to enable them: /metrics then asks for it as a
+    # bearer token. With several gunicorn workers, METRICS_DIR must be a directory shared
+    # by all of them and emptied when the server starts.
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'false').lower() == 'true'
+    METRICS_DIR = os.getenv('METRICS_DIR')
+    METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 1))
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+    # Development/staging query audit: slow-query log with query plans and N+1 detection
+    QUERY_AUDIT_ENABLED = os.getenv('QUERY_AUDIT_ENABLED', 'false').lower() == 'true'
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 100))
+    QUERY_REPEAT_THRESHOLD = int(os.getenv('QUERY_REPEAT_THRESHOLD', 5))
+    QUERY_AUDIT_EXPLAIN = os.getenv('QUERY_AUDIT_EXPLAIN', 'true').lower() == 'true'
+
+    # On-demand request profiling: requests with the header `X-Profile: <PROFILE_TOKEN>`
+    # and a random PROFILE_SAMPLE_RATE fraction are profiled into PROFILE_DIR
+    # (instance/profiles by default). Disabled, with no overhead, when both are unset.
+    PROFILE_TOKEN = os.getenv('PROFILE_TOKEN')
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+    PROFILE_DIR = os.getenv('PROFILE_DIR')
+    PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', 200))
+
+    # Cold-start budget checked by `flask perf startup` (import + create_app + first request)
+    STARTUP_BUDGET_MS = float(os.getenv('STARTUP_BUDGET_MS', 1500))
+
+    # Password hashing (Werkzeug method string, e.g. 'scrypt:32768:8:1' or 'pbkdf2:sha256:600000').
+    # Stored hashes created with other parameters are upgraded on the next successful login.
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')
+    PASSWORD_SALT_LENGTH = int(os.getenv('PASSWORD_SALT_LENGTH', 16))
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv('PASSWORD_HASH_QUEUE_LIMIT', 16))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 5))
+
     # App secrets
     SECRET_KEY = os.getenv('SECRET_KEY', 'fallback_secret_key')
 
@@ -16,6 +182,46 @@ class Config:
     OAUTH_CLIENT_SECRET = os.getenv('OAUTH_CLIENT_SECRET', None)
     OAUTH_REDIRECT_URI = os.getenv('OAUTH_REDIRECT_URI', None)
 
-    # Optional: Raise an error if any OAuth-related environment variable is missing
-    if not all([OAUTH_CLIENT_ID, OAUTH_CLIENT_SECRET, OAUTH_REDIRECT_URI]):
+    # OAuth providers, registered once per process by services.oauth_service.init_oauth.
+    # Providers that declare `server_metadata_url` use OIDC discovery. The Google endpoints
+    # can be pointed at a local stand-in (see benchmarks/load.py).
+    OAUTH_PROVIDERS = {
+        'google': {
+            'client_id': OAUTH_CLIENT_ID,
+            'client_secret': OAUTH_CLIENT_SECRET,
+            'access_token_url': os.getenv('GOOGLE_TOKEN_URL', 'https://accounts.google.com/o/oauth2/token'),
+            'authorize_url': os.getenv('GOOGLE_AUTHORIZE_URL', 'https://accounts.google.com/o/oauth2/auth'),
+            'api_base_url': 'https://www.googleapis.com/oauth2/v1/',
+            'userinfo_endpoint': os.getenv('GOOGLE_USERINFO_URL', 'https://openidconnect.googleapis.com/v1/userinfo'),
+            'jwks_uri': os.getenv('GOOGLE_JWKS_URI', 'https://www.googleapis.com/oauth2/v3/certs'),
+            'client_kwargs': {'scope': 'openid email profile'},
+        },
+    }
+
+    # OIDC discovery / JWKS cache (seconds)
+    OAUTH_METADATA_TTL = int(os.getenv('OAUTH_METADATA_TTL', 86400))
+    OAUTH_JWKS_TTL = int(os.getenv('OAUTH_JWKS_TTL', 3600))
+    OAUTH_JWKS_MIN_REFRESH_INTERVAL = int(os.getenv('OAUTH_JWKS_MIN_REFRESH_INTERVAL', 60))
+    OAUTH_HTTP_TIMEOUT = int(os.getenv('OAUTH_HTTP_TIMEOUT', 5))
+
+
+def validate_config(config):
+    """
+    Check the settings that the app cannot run without.
+
+    Called by `create_app` rather than when this module is imported, so tools that only
+    read settings (the gunicorn configuration, CLI helpers) do not need the secrets.
+
+    Args:
+        config (Mapping): The Flask app config.
+
+    Raises:
+        ValueError: If any OAuth-related environment variable is missing, or if metrics
+            are enabled outside development and testing without a `METRICS_TOKEN`.
+    """
+    if not all(config.get(name) for name in ('OAUTH_CLIENT_ID', 'OAUTH_CLIENT_SECRET', 'OAUTH_REDIRECT_URI')):
         raise ValueError("Faltan variables de entorno requeridas para OAuth")
+    if (config.get('METRICS_ENABLED') and not config.get('METRICS_TOKEN')
+            and not (config.get('DEBUG') or config.get('TESTING'))):
+        # Sin token, /metrics expondría el tráfico por ruta y los contadores internos
+        raise ValueError("METRICS_ENABLED requiere METRICS_TOKEN fuera de desarrollo y pruebas")
@@ -19,3 +19,8 @@ class TaskForm(FlaskForm):
     priority = SelectField('Priority', choices=[(1, 'Low'), (2, 'Medium'), (3, 'High'), (4, 'Urgent')], coerce=int)
     is_complete = BooleanField('Complete')
     image = FileField('Attach Image')
+
+
+class DeleteTaskForm(FlaskForm):
+    # Sin campos: sólo comprueba el token CSRF del formulario de borrado
+    pass
@@ -0,0 +1,52 @@
+"""
+gunicorn configuration for production:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Every setting can be overridden from the environment (GUNICORN_BIND, GUNICORN_WORKERS,
+GUNICORN_THREADS, GUNICORN_TIMEOUT, GUNICORN_PRELOAD) or on the command line.
+"""
+import glob
+import multiprocessing
+import os
+import time
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 1))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# La app se carga una vez en el proceso maestro y los workers la heredan al hacer fork
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+accesslog = os.getenv('GUNICORN_ACCESSLOG')
+errorlog = os.getenv('GUNICORN_ERRORLOG', '-')
+loglevel = os.getenv('GUNICORN_LOGLEVEL', 'info')
+
+
+def on_starting(server):
+    # Las métricas de una ejecución anterior no deben sumarse a las nuevas
+    directory = os.getenv('METRICS_DIR')
+    if directory:
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            os.remove(path)
+    # Con preload, los módulos que la app importa en el primer uso se cargan aquí una vez
+    if server.cfg.preload_app:
+        from services.startup_service import warm_imports
+        warm_imports()
+
+
+def post_fork(server, worker):
+    worker.startup_started = time.monotonic()
+    if server.cfg.preload_app:
+        # Las conexiones heredadas del maestro no se comparten entre procesos
+        from services.startup_service import after_fork
+        after_fork(worker.app.wsgi())
+
+
+def post_worker_init(worker):
+    from services.startup_service import record_worker_startup
+    elapsed = record_worker_startup(worker.startup_started, worker.cfg.preload_app)
+    worker.log.info("Worker %s ready in %.1f ms", worker.pid, elapsed * 1000)
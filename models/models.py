@@ -1,8 +1,46 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+from sqlalchemy import event, DDL
+from datetime import datetime, timezone
 
 db = SQLAlchemy()
 
+# Índice de texto completo (SQLite FTS5) sobre el título y la descripción de las tareas.
+# Su rowid es el id de la tarea y lo mantiene services.search_service.
+TASK_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS task_fts USING fts5("
+    "title, description, user_id UNINDEXED, tokenize='unicode61 remove_diacritics 2')"
+)
+event.listen(db.metadata, 'after_create', DDL(TASK_FTS_DDL).execute_if(dialect='sqlite'))
+event.listen(db.metadata, 'before_drop', DDL("DROP TABLE IF EXISTS task_fts").execute_if(dialect='sqlite'))
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """
+    Run PRAGMA statements on every new connection of a SQLite engine.
+
+    Args:
+        engine (Engine): The SQLAlchemy engine. Non-SQLite engines are left untouched.
+        pragmas (dict): PRAGMA names mapped to the values to set.
+
+    Returns:
+        None
+    """
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def utcnow():
+    """Current UTC time as a naive datetime, the way DateTime columns store it."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 
 class User(UserMixin, db.Model):
     """
@@ -15,6 +53,8 @@ class User(UserMixin, db.Model):
         password (str): The user's password. Can be NULL for OAuth-authenticated users.
         oauth_provider (str): Name of the OAuth authentication provider (optional).
         oauth_id (str): Unique identifier provided by the OAuth service (optional).
+        task_version (int): Counter bumped on every change to the user's tasks, used to
+            validate cached copies of the task list.
         tasks (list[Task]): List of tasks associated with the user.
     """
     id = db.Column(db.Integer, primary_key=True)
@@ -22,6 +62,7 @@ class User(UserMixin, db.Model):
     password = db.Column(db.String(200), nullable=True)
     oauth_provider = db.Column(db.String(50), nullable=True)
     oauth_id = db.Column(db.String(100), nullable=True)
+    task_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     tasks = db.relationship('Task', backref='owner', lazy=True)
 
 
@@ -38,7 +79,24 @@ class Task(db.Model):
         is_complete (bool): Indicates if the task is completed. Defaults to False.
         image (str): Path to an attached image for the task (optional).
         user_id (int): Identifier of the user to whom the task belongs.
+        deleted_at (datetime): When the task was deleted, or NULL if it is live. Deleted
+            tasks are purged later by services.sweeper_service.
+
+    The composite index on (user_id, is_complete, priority, id) serves the dashboard
+    listing, which filters by owner and completion state and pages by (priority, id).
+    It only covers live tasks, so queries must filter on `deleted_at IS NULL` (see
+    `Task.live`) to use it; the sweeper finds deleted tasks through `ix_task_deleted_at`,
+    and the upload collector checks which files are still attached through `ix_task_image`.
     """
+    __table_args__ = (
+        db.Index('ix_task_user_complete_priority_id', 'user_id', 'is_complete', 'priority', 'id',
+                 sqlite_where=db.text('deleted_at IS NULL'), postgresql_where=db.text('deleted_at IS NULL')),
+        db.Index('ix_task_deleted_at', 'deleted_at',
+                 sqlite_where=db.text('deleted_at IS NOT NULL'), postgresql_where=db.text('deleted_at IS NOT NULL')),
+        db.Index('ix_task_image', 'image',
+                 sqlite_where=db.text('image IS NOT NULL'), postgresql_where=db.text('image IS NOT NULL')),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=True)
@@ -46,3 +104,87 @@ class Task(db.Model):
     is_complete = db.Column(db.Boolean, default=False)
     image = db.Column(db.String(100), nullable=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=True)
+
+    @classmethod
+    def live(cls):
+        """SQL condition matching the tasks that have not been deleted."""
+        return cls.deleted_at.is_(None)
+
+
+class TaskStat(db.Model):
+    """
+    :no-index:
+    Model representing the number of tasks a user has with a given priority and completion state.
+
+    The counters are kept up to date by services.stats_service in the same transaction
+    as the task changes, so the statistics of a user are read without scanning its tasks.
+
+    Attributes:
+        user_id (int): Identifier of the user the counter belongs to. Part of the primary key.
+        priority (int): Priority of the counted tasks. Part of the primary key.
+        is_complete (bool): Completion state of the counted tasks. Part of the primary key.
+        count (int): Number of tasks of the user with this priority and state.
+    """
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    priority = db.Column(db.Integer, primary_key=True)
+    is_complete = db.Column(db.Boolean, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class Job(db.Model):
+    """
+    :no-index:
+    Model representing a background job in the durable queue of services.job_service.
+
+    Attributes:
+        id (int): Unique identifier for the job.
+        name (str): Name of the registered handler that runs the job.
+        payload (str): JSON object with the keyword arguments of the handler.
+        status (str): 'queued', 'running' or 'failed' (finished jobs are deleted, and
+            periodic ones are queued again).
+        key (str): Optional unique key; at most one job with the same key exists.
+        attempts (int): Number of times the job has been claimed by a worker.
+        max_attempts (int): Attempts after which a failing job is no longer retried.
+        run_at (datetime): When the job becomes due.
+        locked_until (datetime): While running, when the claim expires and another
+            worker may take the job over (visibility timeout).
+        locked_by (str): Identifier of the worker running the job.
+        last_error (str): The error of the last failed attempt.
+        created_at (datetime): When the job was enqueued.
+
+    The index on (status, run_at) lets workers find due jobs without scanning the queue.
+    """
+    __table_args__ = (
+        db.Index('ix_job_status_run_at', 'status', 'run_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    key = db.Column(db.String(200), nullable=True, unique=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False)
+    locked_until = db.Column(db.DateTime, nullable=True)
+    locked_by = db.Column(db.String(100), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+
+class Attachment(db.Model):
+    """
+    :no-index:
+    Model representing a stored upload, shared by every task that attaches the same content.
+
+    Attributes:
+        sha256 (str): Hex SHA-256 digest of the file content. Primary key.
+        filename (str): Path of the stored file, relative to the upload folder.
+        size (int): Size of the file in bytes.
+        ref_count (int): Number of tasks currently referencing the file.
+    """
+    sha256 = db.Column(db.String(64), primary_key=True)
+    filename = db.Column(db.String(100), unique=True, nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
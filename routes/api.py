@@ -0,0 +1,148 @@
+from flask import Blueprint, Response, jsonify, request, current_app, stream_with_context
+from flask_login import login_required, current_user
+from werkzeug.exceptions import RequestEntityTooLarge
+from services.task_service import get_task_page, apply_task_batch, task_to_dict, delete_task, delete_tasks
+from services.search_service import search_tasks
+from services.stats_service import get_task_stats
+from services.bulk_service import FORMATS, detect_format, read_rows, import_tasks, export_tasks
+from services.storage_service import content_limit
+
+api_bp = Blueprint('api', __name__)
+
+# Filtros de estado aceptados por el listado
+STATUS_FILTERS = {'open': False, 'done': True, 'all': None}
+EXPORT_MIMETYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+
+def error_response(message, status):
+    return jsonify({'error': message}), status
+
+
+@api_bp.route('/tasks', methods=['GET'])
+@login_required
+def list_tasks():
+    status = request.args.get('status', 'all')
+    if status not in STATUS_FILTERS:
+        return error_response("'status' must be one of open, done, all", 400)
+
+    limit = min(request.args.get('limit', current_app.config['TASKS_PAGE_SIZE'], type=int),
+                current_app.config['API_BATCH_LIMIT'])
+    try:
+        tasks, next_cursor = get_task_page(
+            current_user,
+            is_complete=STATUS_FILTERS[status],
+            priority=request.args.get('priority', type=int),
+            after=request.args.get('after'),
+            limit=max(limit, 1)
+        )
+    except ValueError:
+        return error_response('Invalid cursor', 400)
+
+    return jsonify({'tasks': [task_to_dict(task) for task in tasks], 'next_cursor': next_cursor})
+
+
+@api_bp.route('/tasks/search', methods=['GET'])
+@login_required
+def search_task_list():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return error_response("'q' is required", 400)
+
+    page = max(request.args.get('page', 1, type=int), 1)
+    limit = min(request.args.get('limit', current_app.config['TASKS_PAGE_SIZE'], type=int),
+                current_app.config['API_BATCH_LIMIT'])
+    tasks, has_next = search_tasks(current_user, query, page=page, per_page=max(limit, 1))
+    return jsonify({
+        'tasks': [task_to_dict(task) for task in tasks],
+        'next_page': page + 1 if has_next else None,
+    })
+
+
+@api_bp.route('/tasks/stats', methods=['GET'])
+@login_required
+def task_stats():
+    return jsonify(get_task_stats(current_user))
+
+
+@api_bp.route('/tasks/<int:task_id>', methods=['DELETE'])
+@login_required
+def delete_single_task(task_id):
+    if delete_task(task_id, current_user) is None:
+        return error_response('Task not found', 404)
+    return '', 204
+
+
+@api_bp.route('/tasks/delete', methods=['POST'])
+@login_required
+def delete_task_list():
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return error_response("Expected a JSON object with 'ids' or 'status'", 400)
+
+    ids = payload.get('ids')
+    if ids is not None:
+        if not isinstance(ids, list) or not all(isinstance(task_id, int) and not isinstance(task_id, bool)
+                                                for task_id in ids):
+            return error_response("'ids' must be a list of task ids", 400)
+        if len(ids) > current_app.config['API_BATCH_LIMIT']:
+            return error_response(f"At most {current_app.config['API_BATCH_LIMIT']} ids per request", 413)
+    status = payload.get('status')
+    if status is not None and status not in STATUS_FILTERS:
+        return error_response("'status' must be one of open, done, all", 400)
+    if ids is None and status is None:
+        return error_response("Expected 'ids' or 'status'", 400)
+
+    deleted = delete_tasks(current_user, task_ids=ids, is_complete=STATUS_FILTERS.get(status))
+    return jsonify({'deleted': deleted})
+
+
+@api_bp.route('/tasks/batch', methods=['POST'])
+@login_required
+def batch_tasks():
+    payload = request.get_json(silent=True)
+    operations = payload.get('operations') if isinstance(payload, dict) else None
+    if not isinstance(operations, list):
+        return error_response("Expected a JSON object with an 'operations' list", 400)
+    if len(operations) > current_app.config['API_BATCH_LIMIT']:
+        return error_response(f"At most {current_app.config['API_BATCH_LIMIT']} operations per batch", 413)
+
+    results = apply_task_batch(current_user, operations)
+    return jsonify({
+        'results': results,
+        'succeeded': sum(1 for result in results if result['status'] == 'ok'),
+        'failed': sum(1 for result in results if result['status'] == 'error'),
+    })
+
+
+@api_bp.route('/tasks/import', methods=['POST'])
+@login_required
+@content_limit('IMPORT_MAX_SIZE')
+def import_task_file():
+    # El formato sale siempre del Content-Type: un formulario de otro sitio sólo puede
+    # enviar text/plain, urlencoded o multipart, así que no puede lanzar una importación
+    fmt = detect_format(request.mimetype)
+    if fmt not in FORMATS or request.args.get('format', fmt) != fmt:
+        return error_response("Send text/csv or application/x-ndjson; ?format, if given, must match it", 415)
+
+    # El cuerpo se lee por trozos desde el socket, sin cargarlo entero en memoria
+    config = current_app.config
+    try:
+        report = import_tasks(current_user.id, read_rows(request.stream, fmt),
+                              batch_size=config['IMPORT_BATCH_SIZE'], max_errors=config['IMPORT_MAX_ERRORS'])
+    except RequestEntityTooLarge:
+        return error_response(f"Imports are limited to {config['IMPORT_MAX_SIZE']} bytes", 413)
+    return jsonify(report)
+
+
+@api_bp.route('/tasks/export', methods=['GET'])
+@login_required
+def export_task_file():
+    fmt = request.args.get('format', 'csv')
+    if fmt not in FORMATS:
+        return error_response("'format' must be one of csv, ndjson", 400)
+
+    body = export_tasks(current_user.id, fmt, chunk_size=current_app.config['EXPORT_CHUNK_SIZE'])
+    return Response(stream_with_context(body), mimetype=EXPORT_MIMETYPES[fmt], headers={
+        'Content-Disposition': f'attachment; filename=tasks.{fmt}',
+        'Cache-Control': 'private, no-store',
+    })
@@ -1,18 +1,26 @@
 from flask import Blueprint, render_template, redirect, url_for, flash
 from flask_login import login_user, logout_user
-from werkzeug.security import check_password_hash
 from forms.forms import LoginForm, RegisterForm
-from services.auth_service import create_user, get_user_by_username
+from services.auth_service import create_user, authenticate
+from services.password_service import HashingOverloaded
 
 auth_bp = Blueprint('auth', __name__)
 
 
+def overloaded(template, form):
+    flash('El servicio está saturado, inténtalo de nuevo en unos segundos.', 'warning')
+    return render_template(template, form=form), 503, {'Retry-After': '1'}
+
+
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
     form = LoginForm()
     if form.validate_on_submit():
-        user = get_user_by_username(form.username.data)
-        if user and check_password_hash(user.password, form.password.data):
+        try:
+            user = authenticate(form.username.data, form.password.data)
+        except HashingOverloaded:
+            return overloaded('login.html', form)
+        if user:
             login_user(user)
             return redirect(url_for('tasks.dashboard'))
         flash('Invalid username or password')
@@ -23,7 +31,11 @@ def login():
 def register():
     form = RegisterForm()
     if form.validate_on_submit():
-        if not create_user(form.username.data, form.password.data):
+        try:
+            created = create_user(form.username.data, form.password.data)
+        except HashingOverloaded:
+            return overloaded('register.html', form)
+        if not created:
             flash('Username not available, please choose another one', 'warning')
             return redirect(url_for('auth.register'))
         flash('Account created successfully! Please log in.', 'success')
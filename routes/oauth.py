@@ -1,38 +1,47 @@
-from flask import Blueprint, redirect, url_for, session, flash, current_app
+from flask import Blueprint, redirect, url_for, session, flash, abort
 from flask_login import login_user
-from services.oauth_service import oauth, init_oauth
-from models.models import User, db
+from services.oauth_service import get_provider, oidc_cache
+from services.auth_service import get_or_create_oauth_user
 import secrets
 
 oauth_bp = Blueprint('oauth', __name__)
 
 
-@oauth_bp.before_app_request
-def setup_oauth():
-    init_oauth(current_app)
+@oauth_bp.route('/login', defaults={'provider': 'google'})
+@oauth_bp.route('/login/<provider>')
+def oauth_login(provider):
+    client = get_provider(provider)
+    if client is None:
+        abort(404)
 
-
-@oauth_bp.route('/login')
-def oauth_login():
     # Generar nonce y guardarlo en la sesión
     nonce = secrets.token_urlsafe(16)
     session['oauth_nonce'] = nonce
 
-    redirect_uri = url_for('oauth.oauth_callback', _external=True)
-    return oauth.google.authorize_redirect(redirect_uri, nonce=nonce)
+    redirect_uri = url_for('oauth.oauth_callback', provider=provider, _external=True)
+    response = client.authorize_redirect(redirect_uri, nonce=nonce)
+
+    # Precargar las claves del proveedor mientras el usuario se autentica
+    oidc_cache.prefetch(client)
+    return response
+
 
+@oauth_bp.route('/callback', defaults={'provider': 'google'})
+@oauth_bp.route('/callback/<provider>')
+def oauth_callback(provider):
+    client = get_provider(provider)
+    if client is None:
+        abort(404)
 
-@oauth_bp.route('/callback')
-def oauth_callback():
     try:
-        # Google toke
-        token = oauth.google.authorize_access_token()
+        # Provider token
+        token = client.authorize_access_token()
         nonce = session.pop('oauth_nonce', None)
         if not nonce:
             raise Exception("Nonce perdido o no proporcionado.")
 
         # Validate token
-        idinfo = oauth.google.parse_id_token(token, nonce=nonce)
+        idinfo = client.parse_id_token(token, nonce=nonce)
 
         # Extract email
         email = idinfo.get('email')
@@ -40,11 +49,7 @@ def oauth_callback():
             raise Exception("No se obtuvo email del proveedor.")
 
         # Search user or create a new one
-        user = User.query.filter_by(username=email).first()
-        if not user:
-            user = User(username=email, oauth_provider='google', oauth_id=idinfo['sub'])
-            db.session.add(user)
-            db.session.commit()
+        user = get_or_create_oauth_user(email, provider, idinfo['sub'])
 
         # Login
         login_user(user)
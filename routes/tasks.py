@@ -1,11 +1,22 @@
-from flask import Blueprint, render_template, redirect, url_for, abort
+from flask import (Blueprint, render_template, redirect, url_for, abort, request, current_app, session,
+                   make_response, jsonify)
 from flask_login import login_required, current_user
-from forms.forms import TaskForm
-from services.task_service import get_tasks_by_user, create_task, update_task, toggle_task_completion
-from services.api_service import get_game_deals
+from flask_wtf.csrf import generate_csrf
+from forms.forms import TaskForm, DeleteTaskForm
+from services.task_service import (get_task_page, get_task_list_version, create_task, update_task,
+                                   toggle_task_completion, delete_task, task_list_fragments, task_to_dict)
+from services.search_service import search_tasks
+from services.stats_service import get_task_stats
+from services.api_service import get_game_deals, get_game_deals_fingerprint
+from markupsafe import Markup
+import hashlib
+import time
 
 tasks_bp = Blueprint('tasks', __name__)
 
+# Filtros de estado aceptados por el dashboard
+STATUS_FILTERS = {'open': False, 'done': True, 'all': None}
+
 
 @tasks_bp.route('/')
 @login_required
@@ -16,17 +27,164 @@ def home():
         return redirect(url_for('auth.login'))
 
 
+def wants_partial():
+    """
+    Check whether a request was sent by the page script (static/js/tasks.js), which
+    only needs the changed task instead of a redirect to the full dashboard.
+
+    Returns:
+        bool: True if the request has the `X-Requested-With: fetch` header.
+    """
+    return request.headers.get('X-Requested-With') == 'fetch'
+
+
+def task_partial(task, status=200):
+    """
+    Build the partial response for a changed task.
+
+    Args:
+        task (Task): The created or updated task.
+        status (int): The HTTP status code.
+
+    Returns:
+        tuple: The task's `<li>` fragment, or a JSON object with the task if the client
+            prefers JSON, and the status code.
+    """
+    if request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json':
+        return jsonify({'task': task_to_dict(task)}), status
+    return render_template('_task_item.html', task=task), status
+
+
+def csrf_scope():
+    """
+    Identify the CSRF tokens a page can embed: they depend on the session's CSRF secret
+    and are renewed every half `WTF_CSRF_TIME_LIMIT`, so cached pages and fragments that
+    contain a token are keyed by both and never reused by another session or after the
+    token expires.
+
+    Returns:
+        str: A short hash of the session's CSRF secret and the current token period.
+    """
+    csrf_period = 0
+    time_limit = current_app.config.get('WTF_CSRF_TIME_LIMIT', 3600)
+    if current_app.config.get('WTF_CSRF_ENABLED', True) and time_limit:
+        csrf_period = int(time.time() // max(time_limit // 2, 1))
+    # generate_csrf crea el secreto de la sesión antes de renderizar el primer formulario
+    generate_csrf()
+    scope = (session.get('csrf_token'), csrf_period)
+    return hashlib.sha256(repr(scope).encode()).hexdigest()[:16]
+
+
+def dashboard_etag(version, status, priority, after):
+    """
+    Build the strong ETag of a dashboard page without querying its tasks.
+
+    The tag covers the user's task list version, the list filters, the game deals on the
+    page and the CSRF tokens embedded in its forms, so a cached page is only reused while
+    all of them are unchanged.
+
+    Args:
+        version (int): The user's task list version.
+        status (str): The status filter.
+        priority (int): The priority filter, or None.
+        after (str): The page cursor, or None.
+
+    Returns:
+        str: The ETag value, or None if the page must not be cached.
+    """
+    if '_flashes' in session:
+        # Los mensajes flash sólo se muestran una vez
+        return None
+    parts = (current_user.id, version, status, priority, after,
+             get_game_deals_fingerprint(), csrf_scope())
+    return hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+
+
+def render_task_list(status, priority, after):
+    """
+    Query one page of the current user's tasks and render the task list fragment.
+
+    Args:
+        status (str): The status filter.
+        priority (int): The priority filter, or None.
+        after (str): The page cursor, or None.
+
+    Returns:
+        Markup: The rendered task list and its pagination link.
+
+    Raises:
+        ValueError: If `after` is not a valid cursor.
+    """
+    tasks, next_cursor = get_task_page(
+        current_user,
+        is_complete=STATUS_FILTERS[status],
+        priority=priority,
+        after=after,
+        limit=current_app.config['TASKS_PAGE_SIZE']
+    )
+    return Markup(render_template('_task_list.html', tasks=tasks, next_cursor=next_cursor,
+                                  status=status, priority=priority, after=after))
+
+
 @tasks_bp.route('/dashboard', methods=['GET', 'POST'])
 @login_required
 def dashboard():
     form = TaskForm()
     if form.validate_on_submit():
-        create_task(form, current_user)
+        task = create_task(form, current_user)
+        if wants_partial():
+            return task_partial(task, 201)
         return redirect(url_for('tasks.dashboard'))
+    if request.method == 'POST' and wants_partial():
+        return jsonify({'errors': form.errors}), 400
+
+    status = request.args.get('status', 'open')
+    if status not in STATUS_FILTERS:
+        abort(400)
+    priority = request.args.get('priority', type=int)
+
+    after = request.args.get('after')
+    version = get_task_list_version(current_user)
+    etag = dashboard_etag(version, status, priority, after) if request.method == 'GET' else None
+    if etag and request.if_none_match.contains(etag):
+        # Nada ha cambiado: se responde sin consultar las tareas ni renderizar la plantilla
+        response = make_response('', 304)
+    else:
+        # El listado sólo se vuelve a renderizar cuando cambia la versión de las tareas
+        # (o el token CSRF de sus formularios de borrado)
+        fragment_key = (current_user.id, version, status, priority, after, csrf_scope())
+        try:
+            task_list = task_list_fragments.get_or_set(
+                fragment_key, lambda: render_task_list(status, priority, after)
+            )
+        except ValueError:
+            abort(400)
+        stats = task_list_fragments.get_or_set((current_user.id, version, 'stats'),
+                                               lambda: get_task_stats(current_user))
 
-    tasks = get_tasks_by_user(current_user)
-    game_deals = get_game_deals()
-    return render_template('dashboard.html', form=form, tasks=tasks, game_deals=game_deals)
+        game_deals = get_game_deals()
+        response = make_response(render_template(
+            'dashboard.html', form=form, task_list=task_list, game_deals=game_deals,
+            status=status, priority=priority, stats=stats
+        ))
+
+    if etag:
+        response.set_etag(etag)
+        # Cada vista debe revalidarse, y sólo el navegador del usuario puede guardarla
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        response.vary.add('Cookie')
+    return response
+
+
+@tasks_bp.route('/search')
+@login_required
+def search():
+    query = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    tasks, has_next = search_tasks(current_user, query, page=page,
+                                   per_page=current_app.config['TASKS_PAGE_SIZE'])
+    return render_template('search.html', tasks=tasks, query=query, page=page, has_next=has_next)
 
 
 @tasks_bp.route('/edit_task/<int:task_id>', methods=['GET', 'POST'])
@@ -38,13 +196,34 @@ def edit_task(task_id):
 
     form = TaskForm(obj=task)
     if form.validate_on_submit():
-        update_task(task_id, current_user, form)
+        task = update_task(task_id, current_user, form)
+        if wants_partial():
+            return task_partial(task)
         return redirect(url_for('tasks.dashboard'))
+    if request.method == 'POST' and wants_partial():
+        return jsonify({'errors': form.errors}), 400
     return render_template('edit_task.html', form=form, task=task)
 
 
 @tasks_bp.route('/toggle_complete/<int:task_id>', methods=['POST'])
 @login_required
 def toggle_complete(task_id):
-    toggle_task_completion(task_id, current_user)
+    task = toggle_task_completion(task_id, current_user)
+    if wants_partial():
+        if task is None:
+            abort(404)
+        return task_partial(task)
+    return redirect(url_for('tasks.dashboard'))
+
+
+@tasks_bp.route('/delete_task/<int:task_id>', methods=['POST'])
+@login_required
+def delete(task_id):
+    if not DeleteTaskForm().validate_on_submit():
+        abort(400)
+    task = delete_task(task_id, current_user)
+    if wants_partial():
+        if task is None:
+            abort(404)
+        return '', 204
     return redirect(url_for('tasks.dashboard'))
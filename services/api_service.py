@@ -1,9 +1,22 @@
-import requests
+import hashlib
+import json
+import logging
+import os
+import threading
+from services.cache_service import StaleWhileRevalidateCache
+from services.http_service import HTTPClient
 
-CHEAPSHARK_API_URL = "https://www.cheapshark.com/api/1.0/deals"
+logger = logging.getLogger(__name__)
 
+# Se puede sustituir por un servidor local (p. ej. en las pruebas de carga)
+CHEAPSHARK_API_URL = os.getenv('CHEAPSHARK_API_URL', "https://www.cheapshark.com/api/1.0/deals")
+CHEAPSHARK_TIMEOUT = 5
 
-def get_game_deals():
+# Conexiones persistentes, plazo por llamada, reintentos y circuit breaker hacia CheapShark
+cheapshark_http = HTTPClient('cheapshark', timeout=CHEAPSHARK_TIMEOUT)
+
+
+def fetch_game_deals():
     """
     Fetch and filter game deals from the CheapShark API.
 
@@ -22,29 +35,94 @@ def get_game_deals():
             - 'dealID' (str): A URL linking to the game deal.
             - 'metacriticScore' (str): Metacritic score of the game.
             - 'dealRating' (str): Deal rating given by the users.
-        
-        Returns an empty list if the request fails or no deals meet the filtering criteria.
+
+    Raises:
+        requests.RequestException: If the request fails or times out.
+        CircuitOpenError: If CheapShark kept failing and is not being called for now.
     """
+    deals = cheapshark_http.get_json(CHEAPSHARK_API_URL, params={"storeID": "1", "upperPrice": "20"})
+
+    return [
+        {
+            'title': deal.get('title', 'N/A'),
+            'salePrice': deal.get('salePrice', 'N/A'),
+            'normalPrice': deal.get('normalPrice', 'N/A'),
+            'dealID': f"https://www.cheapshark.com/redirect.php?dealID={deal.get('dealID', '')}",
+            'metacriticScore': deal.get('metacriticScore', 'N/A'),
+            'dealRating': deal.get('dealRating', 'N/A'),
+        }
+        for deal in deals
+        if int(deal.get('metacriticScore', 0)) > 85 and float(deal.get('dealRating', 0)) >= 9
+    ]
+
+
+def _load_game_deals():
     try:
-        response = requests.get(CHEAPSHARK_API_URL, params={"storeID": "1", "upperPrice": "20"})
-        response.raise_for_status()
-        deals = response.json()
-
-        filtered_deals = [
-            {
-                'title': deal.get('title', 'N/A'),
-                'salePrice': deal.get('salePrice', 'N/A'),
-                'normalPrice': deal.get('normalPrice', 'N/A'),
-                'dealID': f"https://www.cheapshark.com/redirect.php?dealID={deal.get('dealID', '')}",
-                'metacriticScore': deal.get('metacriticScore', 'N/A'),
-                'dealRating': deal.get('dealRating', 'N/A'),
-            }
-            for deal in deals
-            if int(deal.get('metacriticScore', 0)) > 85 and float(deal.get('dealRating', 0)) >= 9
-        ]
-
-        return filtered_deals
-
-    except requests.RequestException as e:
-        print(f"Error fetching deals: {e}")
-        return []
+        return fetch_game_deals()
+    except Exception as e:
+        logger.warning("Error fetching deals: %s", e)
+        raise
+
+
+# Caché global de ofertas compartida por todas las peticiones del proceso
+deals_cache = StaleWhileRevalidateCache(_load_game_deals, default=[])
+# Última lista de ofertas vista por get_game_deals_fingerprint y su huella
+_deals_fingerprint = (None, None)
+_fingerprint_lock = threading.Lock()
+
+
+def init_deals_cache(app):
+    """
+    Configure the game deals cache from the Flask application settings.
+
+    Reads `DEALS_CACHE_TTL`, `DEALS_CACHE_STALE_TTL` and `DEALS_CACHE_NEGATIVE_TTL`
+    from the app config. Settings that are missing keep the cache defaults.
+
+    Args:
+        app (Flask): The Flask application instance.
+
+    Returns:
+        None
+    """
+    deals_cache.configure(
+        ttl=app.config.get('DEALS_CACHE_TTL'),
+        stale_ttl=app.config.get('DEALS_CACHE_STALE_TTL'),
+        negative_ttl=app.config.get('DEALS_CACHE_NEGATIVE_TTL'),
+    )
+
+
+def get_game_deals():
+    """
+    Return the filtered CheapShark game deals through the shared deals cache.
+
+    Fresh deals are served from memory. Stale deals are served while a single
+    background thread re-fetches them, and after a failed fetch CheapShark is not
+    called again until the negative-cache period has passed. While the CheapShark
+    circuit breaker is open the last good deals (or none) are served right away.
+
+    Returns:
+        list[dict]: The filtered game deals, as returned by `fetch_game_deals`.
+            Returns an empty list if the deals could not be fetched and none are cached.
+    """
+    return deals_cache.get()
+
+
+def get_game_deals_fingerprint():
+    """
+    Return a short hash of the deals currently served by `get_game_deals`.
+
+    The hash depends only on the content, so it is the same in every worker process, and
+    it is only recomputed when the cache holds a new list: once per refresh, even when
+    many request threads ask for it at the same time.
+
+    Returns:
+        str: A hex digest identifying the current deals.
+    """
+    global _deals_fingerprint
+    deals = get_game_deals()
+    with _fingerprint_lock:
+        cached_deals, fingerprint = _deals_fingerprint
+        if cached_deals is not deals:
+            fingerprint = hashlib.sha256(json.dumps(deals, sort_keys=True).encode()).hexdigest()[:16]
+            _deals_fingerprint = (deals, fingerprint)
+    return fingerprint
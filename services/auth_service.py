@@ -1,5 +1,90 @@
-from werkzeug.security import generate_password_hash
+from flask_login import UserMixin
 from models.models import db, User
+from services.cache_service import LRUCache
+from services.password_service import hash_password, verify_password, needs_rehash
+
+
+class UserSnapshot(UserMixin):
+    """
+    Lightweight, detached copy of a user, used as `current_user` by Flask-Login.
+
+    Snapshots hold plain values only, so they can be cached and shared between requests
+    without keeping ORM objects or database sessions alive. The password hash is not
+    copied.
+
+    Attributes:
+        id (int): Unique identifier for the user.
+        username (str): The user's username.
+        oauth_provider (str): Name of the OAuth authentication provider (optional).
+        oauth_id (str): Unique identifier provided by the OAuth service (optional).
+    """
+
+    def __init__(self, id, username, oauth_provider=None, oauth_id=None):
+        self.id = id
+        self.username = username
+        self.oauth_provider = oauth_provider
+        self.oauth_id = oauth_id
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.username, user.oauth_provider, user.oauth_id)
+
+    def __eq__(self, other):
+        return isinstance(other, (UserSnapshot, User)) and self.id == other.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+# Caché de usuarios del proceso; cada worker de gunicorn tiene la suya y el TTL
+# limita cuánto puede tardar en verse un cambio hecho en otro worker
+user_cache = LRUCache(maxsize=1024, ttl=60)
+
+
+def init_user_cache(app):
+    """
+    Configure the user cache from the `USER_CACHE_SIZE` and `USER_CACHE_TTL` settings.
+
+    Args:
+        app (Flask): The Flask application instance.
+
+    Returns:
+        None
+    """
+    user_cache.configure(maxsize=app.config.get('USER_CACHE_SIZE'), ttl=app.config.get('USER_CACHE_TTL'))
+
+
+def invalidate_user(user_id):
+    """
+    Drop a user's cached snapshot so the next request reloads it from the database.
+
+    Args:
+        user_id (int): The identifier of the user that changed.
+
+    Returns:
+        None
+    """
+    user_cache.invalidate(user_id)
+
+
+def load_user_snapshot(user_id):
+    """
+    Return the snapshot of a user, from the user cache or from the database.
+
+    Args:
+        user_id (int): The identifier of the user.
+
+    Returns:
+        UserSnapshot: The user snapshot, or None if the user does not exist.
+    """
+    snapshot = user_cache.get(user_id)
+    if snapshot is None:
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        snapshot = UserSnapshot.from_user(user)
+        user_cache.set(user_id, snapshot)
+    return snapshot
 
 
 def get_user_by_username(username):
@@ -28,12 +113,66 @@ def create_user(username, password):
 
     Returns:
         bool: True if the user is successfully created, False if the username already exists.
+
+    Raises:
+        HashingOverloaded: If the password hashing executor is saturated.
     """
     existing_user = get_user_by_username(username)
     if existing_user:
         return False
-    hashed_password = generate_password_hash(password)
+    hashed_password = hash_password(password)
     new_user = User(username=username, password=hashed_password)
     db.session.add(new_user)
     db.session.commit()
+    invalidate_user(new_user.id)
     return True
+
+
+def authenticate(username, password):
+    """
+    Check a username and password, upgrading the stored hash if its parameters changed.
+
+    When the password matches but the stored hash was created with a different method,
+    cost or salt length than the current `PASSWORD_HASH_METHOD` / `PASSWORD_SALT_LENGTH`
+    settings, the password is re-hashed with the current ones and saved.
+
+    Args:
+        username (str): The username.
+        password (str): The plain-text password.
+
+    Returns:
+        User: The authenticated user, or None if the credentials are invalid.
+
+    Raises:
+        HashingOverloaded: If the password hashing executor is saturated.
+    """
+    user = get_user_by_username(username)
+    if not user or not user.password or not verify_password(user.password, password):
+        return None
+
+    if needs_rehash(user.password):
+        user.password = hash_password(password)
+        db.session.commit()
+        invalidate_user(user.id)
+    return user
+
+
+def get_or_create_oauth_user(email, provider, oauth_id):
+    """
+    Retrieve the user linked to an OAuth identity, creating it on first login.
+
+    Args:
+        email (str): The email returned by the provider, used as username.
+        provider (str): The name of the OAuth provider.
+        oauth_id (str): The user's identifier at the provider.
+
+    Returns:
+        User: The existing or newly created user.
+    """
+    user = get_user_by_username(email)
+    if not user:
+        user = User(username=email, oauth_provider=provider, oauth_id=oauth_id)
+        db.session.add(user)
+        db.session.commit()
+        invalidate_user(user.id)
+    return user
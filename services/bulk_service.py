@@ -0,0 +1,208 @@
+from models.models import db, Task
+from services.search_service import index_tasks
+from services.task_service import validate_task_fields, bump_task_list_version
+from services.stats_service import stat_key, adjust_task_stats
+from sqlalchemy import insert, select
+from collections import Counter
+import csv
+import io
+import json
+
+FORMATS = ('csv', 'ndjson')
+EXPORT_COLUMNS = ('id', 'title', 'description', 'priority', 'is_complete')
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_MAX_ERRORS = 100
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'x'}
+FALSE_VALUES = {'', '0', 'false', 'no', 'n'}
+
+
+def detect_format(mimetype, filename=None):
+    """
+    Work out the import format from a MIME type or a file name.
+
+    Args:
+        mimetype (str): The Content-Type of the body, without parameters.
+        filename (str, optional): The name of the imported file.
+
+    Returns:
+        str: 'csv' or 'ndjson', or None if the format is not recognised.
+    """
+    if mimetype in ('text/csv', 'application/csv'):
+        return 'csv'
+    if mimetype in ('application/x-ndjson', 'application/ndjson', 'application/jsonl', 'application/x-jsonlines'):
+        return 'ndjson'
+    extension = (filename or '').rsplit('.', 1)[-1].lower()
+    return {'csv': 'csv', 'ndjson': 'ndjson', 'jsonl': 'ndjson'}.get(extension)
+
+
+def _csv_fields(row):
+    # En CSV todo llega como texto: se convierte a los tipos que espera validate_task_fields
+    fields = {key: value for key, value in row.items() if key in ('title', 'description', 'priority', 'is_complete')}
+    if isinstance(fields.get('priority'), str) and fields['priority'].strip().isdigit():
+        fields['priority'] = int(fields['priority'])
+    if 'is_complete' in fields:
+        value = (fields['is_complete'] or '').strip().lower()
+        if value in TRUE_VALUES:
+            fields['is_complete'] = True
+        elif value in FALSE_VALUES:
+            fields['is_complete'] = False
+    if fields.get('description') == '':
+        fields['description'] = None
+    return fields
+
+
+def _is_utf8(text):
+    # Los bytes que no son UTF-8 llegan como sustitutos (surrogateescape)
+    try:
+        text.encode('utf-8')
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+def read_rows(stream, fmt):
+    """
+    Parse an import file incrementally, one row at a time.
+
+    Args:
+        stream (BinaryIO): The file or request body, read as UTF-8 (a BOM is ignored).
+            Rows with bytes that are not valid UTF-8 are reported as row errors. A CSV
+            syntax error (such as a field over the `csv` module's size limit) is reported
+            as the error of its row and ends the parsing, since the rows after it cannot
+            be told apart reliably.
+        fmt (str): 'csv' (with a header row naming the columns) or 'ndjson' (one JSON
+            object per line; blank lines are skipped).
+
+    Yields:
+        tuple[int, dict | Exception]: The line number and the row's task fields, or
+            the error that made the row unreadable.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', errors='surrogateescape',
+                            newline='' if fmt == 'csv' else None)
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                # La fila que falla empieza justo después de la última leída
+                yield reader.line_num + 1, ValueError(f'Invalid CSV, rest of the file skipped: {e}')
+                return
+            if None in row:
+                yield reader.line_num, ValueError('Too many columns')
+            elif not all(_is_utf8(value) for value in row.values() if value):
+                yield reader.line_num, ValueError('Not valid UTF-8')
+            else:
+                yield reader.line_num, _csv_fields(row)
+
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        if not _is_utf8(line):
+            yield line_number, ValueError('Not valid UTF-8')
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, ValueError('Invalid JSON')
+            continue
+        if not isinstance(row, dict):
+            yield line_number, ValueError('Expected a JSON object')
+            continue
+        yield line_number, row
+
+
+def import_tasks(user_id, rows, batch_size=DEFAULT_BATCH_SIZE, max_errors=DEFAULT_MAX_ERRORS):
+    """
+    Insert the valid rows as tasks of a user, in batches committed one at a time.
+
+    Each batch is written with a single multi-row INSERT, indexed for full-text search
+    and committed together with the user's task counters and a bump of the user's task
+    list version, so memory use does not grow with the size of the import and other
+    requests see whole batches.
+    Invalid rows are skipped and reported; they do not stop the import.
+
+    Args:
+        user_id (int): The id of the user who will own the tasks.
+        rows (Iterable[tuple[int, dict | Exception]]): The rows, as yielded by `read_rows`.
+        batch_size (int): Rows inserted and committed together.
+        max_errors (int): Row errors included in the report (all of them are counted).
+
+    Returns:
+        dict: 'imported' and 'failed' row counts, and 'errors', a list of
+            `{'line', 'error'}` for the first `max_errors` invalid rows.
+    """
+    report = {'imported': 0, 'failed': 0, 'errors': []}
+    batch = []
+
+    def flush():
+        ids = db.session.execute(insert(Task).returning(Task.id), batch).scalars().all()
+        index_tasks(ids)
+        adjust_task_stats(user_id, Counter(stat_key(row) for row in batch))
+        bump_task_list_version(user_id)
+        db.session.commit()
+        report['imported'] += len(batch)
+        batch.clear()
+
+    for line, row in rows:
+        try:
+            if isinstance(row, Exception):
+                raise row
+            fields = validate_task_fields(row)
+        except ValueError as e:
+            report['failed'] += 1
+            if len(report['errors']) < max_errors:
+                report['errors'].append({'line': line, 'error': str(e)})
+            continue
+        fields.setdefault('description', None)
+        fields.setdefault('is_complete', False)
+        batch.append(dict(fields, user_id=user_id))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return report
+
+
+def export_tasks(user_id, fmt, chunk_size=DEFAULT_BATCH_SIZE):
+    """
+    Stream every task of a user as CSV or NDJSON.
+
+    Rows are read with a server-side cursor (`yield_per`) in chunks of `chunk_size` and
+    encoded one chunk at a time, so memory use stays flat for any number of tasks.
+    Meant to be returned as a streamed response body.
+
+    Args:
+        user_id (int): The id of the user whose tasks are exported.
+        fmt (str): 'csv' (with a header row) or 'ndjson'.
+        chunk_size (int): Rows fetched and encoded together.
+
+    Yields:
+        str: Pieces of the export, one per chunk of rows.
+    """
+    query = (
+        select(*(getattr(Task, column) for column in EXPORT_COLUMNS))
+        .where(Task.user_id == user_id, Task.live())
+        .order_by(Task.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == 'csv' else None
+    if writer:
+        writer.writerow(EXPORT_COLUMNS)
+
+    for rows in db.session.execute(query).partitions():
+        for row in rows:
+            if writer:
+                writer.writerow((row.id, row.title, row.description or '', row.priority,
+                                 'true' if row.is_complete else 'false'))
+            else:
+                record = dict(row._mapping, is_complete=bool(row.is_complete))
+                buffer.write(json.dumps(record, ensure_ascii=False) + '\n')
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,344 @@
+from collections import OrderedDict
+import threading
+import time
+
+
+class StaleWhileRevalidateCache:
+    """
+    In-memory cache for a single value loaded from a slow upstream source.
+
+    The cached value is served directly while it is fresh. Once it is older than `ttl`
+    it is still served for another `stale_ttl` seconds while a single background thread
+    reloads it. When there is no usable value the caller loads it synchronously, and
+    concurrent callers wait for that same load instead of starting their own
+    (single-flight). After a failed load no upstream call is made for `negative_ttl`
+    seconds and the last good value (or `default`) is returned instead.
+
+    Attributes:
+        ttl (float): Seconds a loaded value is considered fresh.
+        stale_ttl (float): Extra seconds a value may be served while being refreshed.
+        negative_ttl (float): Seconds to wait after a failed load before retrying.
+        default (Any): Value returned when nothing has been loaded successfully.
+        wait_timeout (float): Maximum seconds a caller waits for another caller's load.
+        last_error (Exception): The exception raised by the most recent failed load.
+    """
+
+    def __init__(self, loader, ttl=300, stale_ttl=3600, negative_ttl=30, default=None,
+                 wait_timeout=10, clock=time.monotonic):
+        self._loader = loader
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._inflight = None
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.default = default
+        self.wait_timeout = wait_timeout
+        self.clear()
+
+    def configure(self, ttl=None, stale_ttl=None, negative_ttl=None, wait_timeout=None):
+        """
+        Update the cache timings. Arguments left as None keep their current value.
+
+        Args:
+            ttl (float, optional): Seconds a loaded value is considered fresh.
+            stale_ttl (float, optional): Extra seconds a stale value may be served.
+            negative_ttl (float, optional): Seconds to skip upstream calls after a failure.
+            wait_timeout (float, optional): Maximum seconds to wait for an in-flight load.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if ttl is not None:
+                self.ttl = ttl
+            if stale_ttl is not None:
+                self.stale_ttl = stale_ttl
+            if negative_ttl is not None:
+                self.negative_ttl = negative_ttl
+            if wait_timeout is not None:
+                self.wait_timeout = wait_timeout
+
+    def clear(self):
+        """
+        Drop the cached value, the failure state and the counters.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._has_value = False
+            self._value = None
+            self._loaded_at = None
+            self._failed_at = None
+            self.last_error = None
+            self._stats = dict.fromkeys(
+                ('hits', 'stale_hits', 'misses', 'negative_hits', 'refreshes', 'loads', 'failures'), 0
+            )
+
+    def stats(self):
+        """
+        Return a snapshot of the cache counters.
+
+        The counters are `hits` (fresh value served), `stale_hits` (stale value served),
+        `misses` (caller had to wait for a load), `negative_hits` (upstream skipped because
+        of a recent failure), `refreshes` (background reloads started), `loads` (upstream
+        calls made) and `failures` (upstream calls that raised).
+
+        Returns:
+            dict: Counter names mapped to their current values.
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def get(self):
+        """
+        Return the cached value, loading or refreshing it from upstream when needed.
+
+        Returns:
+            Any: The cached value, the last good value after a failure, or `default`.
+        """
+        with self._lock:
+            now = self._clock()
+            if self._has_value:
+                age = now - self._loaded_at
+                if age < self.ttl:
+                    self._stats['hits'] += 1
+                    return self._value
+                if age < self.ttl + self.stale_ttl:
+                    self._stats['stale_hits'] += 1
+                    if not self._in_negative_period(now):
+                        self._start_background_refresh()
+                    return self._value
+
+            if self._in_negative_period(now):
+                self._stats['negative_hits'] += 1
+                return self._current()
+
+            self._stats['misses'] += 1
+            event, leader = self._join_or_lead()
+
+        return self._finish(event, leader)
+
+    def refresh(self):
+        """
+        Reload the value synchronously, sharing the load with any one already in flight.
+
+        Returns:
+            Any: The newly loaded value, or the previous value if the load failed.
+        """
+        with self._lock:
+            event, leader = self._join_or_lead()
+        return self._finish(event, leader)
+
+    def warm(self):
+        """
+        Start a background load when there is no fresh value, without waiting for it.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            now = self._clock()
+            fresh = self._has_value and now - self._loaded_at < self.ttl
+            if not fresh and not self._in_negative_period(now):
+                self._start_background_refresh()
+
+    def _in_negative_period(self, now):
+        return self._failed_at is not None and now - self._failed_at < self.negative_ttl
+
+    def _current(self):
+        return self._value if self._has_value else self.default
+
+    def _join_or_lead(self):
+        # Must be called with the lock held.
+        if self._inflight is not None:
+            return self._inflight, False
+        self._inflight = threading.Event()
+        return self._inflight, True
+
+    def _finish(self, event, leader):
+        if leader:
+            self._load(event)
+        else:
+            event.wait(self.wait_timeout)
+        with self._lock:
+            return self._current()
+
+    def _start_background_refresh(self):
+        # Must be called with the lock held.
+        if self._inflight is not None:
+            return
+        self._inflight = threading.Event()
+        self._stats['refreshes'] += 1
+        threading.Thread(target=self._load, args=(self._inflight,), daemon=True).start()
+
+    def _load(self, event):
+        with self._lock:
+            self._stats['loads'] += 1
+        try:
+            value = self._loader()
+        except Exception as e:
+            with self._lock:
+                self._failed_at = self._clock()
+                self._stats['failures'] += 1
+                self.last_error = e
+        else:
+            with self._lock:
+                self._value = value
+                self._has_value = True
+                self._loaded_at = self._clock()
+                self._failed_at = None
+        finally:
+            with self._lock:
+                self._inflight = None
+            event.set()
+
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded key/value cache with least-recently-used eviction and TTL.
+
+    Attributes:
+        maxsize (int): Maximum number of entries kept; the least recently used entry is
+            evicted when it is exceeded.
+        ttl (float): Seconds an entry is valid, or None for no expiry.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.clear()
+
+    def configure(self, maxsize=None, ttl=None):
+        """
+        Update the cache limits. Arguments left as None keep their current value.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if maxsize is not None:
+                self.maxsize = maxsize
+            if ttl is not None:
+                self.ttl = ttl
+            self._evict()
+
+    def clear(self):
+        """
+        Drop every entry and reset the counters.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._entries = OrderedDict()
+            self._stats = dict.fromkeys(('hits', 'misses', 'evictions', 'invalidations'), 0)
+
+    def stats(self):
+        """
+        Return a snapshot of the cache counters.
+
+        Returns:
+            dict: `hits`, `misses`, `evictions`, `invalidations`, the current `size`
+                and the `hit_rate` (hits divided by lookups, 0.0 before any lookup).
+        """
+        with self._lock:
+            stats = dict(self._stats, size=len(self._entries))
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    def get(self, key, default=None):
+        """
+        Return the entry for `key`, marking it as recently used.
+
+        Args:
+            key (Hashable): The entry key.
+            default (Any): Value returned if the key is missing or expired.
+
+        Returns:
+            Any: The cached value or `default`.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or self._clock() < expires_at:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return value
+                del self._entries[key]
+            self._stats['misses'] += 1
+            return default
+
+    def set(self, key, value):
+        """
+        Store `value` under `key`, evicting the least recently used entries if needed.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            expires_at = self._clock() + self.ttl if self.ttl is not None else None
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def get_or_set(self, key, factory):
+        """
+        Return the entry for `key`, creating and storing it with `factory` on a miss.
+
+        The factory runs outside the lock, so two threads missing the same key at once
+        may both call it; the last value stored wins.
+
+        Args:
+            key (Hashable): The entry key.
+            factory (Callable): Function called without arguments to build the value.
+
+        Returns:
+            Any: The cached or newly built value.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key):
+        """
+        Remove the entry for `key`, if any.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._stats['invalidations'] += 1
+
+    def invalidate_where(self, predicate):
+        """
+        Remove every entry whose key matches `predicate`.
+
+        Args:
+            predicate (Callable): Function called with each key; entries for which it
+                returns True are removed.
+
+        Returns:
+            int: The number of removed entries.
+        """
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            self._stats['invalidations'] += len(keys)
+            return len(keys)
+
+    def _evict(self):
+        # Must be called with the lock held.
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
@@ -0,0 +1,419 @@
+from services.metrics_service import observe_outbound
+import os
+import random
+import threading
+import time
+
+# Métodos que se pueden repetir sin efectos secundarios
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+DEFAULT_RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+# Clientes HTTP del proceso, por servicio
+http_clients = {}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream service whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After `failure_threshold` failures in a row the circuit opens and calls are refused
+    for `reset_timeout` seconds. Then a single trial call is let through (half-open):
+    if it succeeds the circuit closes, otherwise it opens again.
+
+    Attributes:
+        failure_threshold (int): Consecutive failures that open the circuit.
+        reset_timeout (float): Seconds the circuit stays open before a trial call.
+        state (str): 'closed', 'open' or 'half_open'.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Close the circuit and forget past failures.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self.state = 'closed'
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+            self.opens = 0
+
+    def allow(self):
+        """
+        Decide whether a call may go to the upstream service now.
+
+        Returns:
+            bool: True if the call may proceed. Every allowed call must be followed by
+                `record_success` or `record_failure`.
+        """
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and self._clock() - self._opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self._trial = False
+            if self.state == 'half_open' and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self._failures = 0
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == 'half_open' or self._failures >= self.failure_threshold:
+                if self.state != 'open':
+                    self.opens += 1
+                self.state = 'open'
+                self._opened_at = self._clock()
+                self._trial = False
+
+
+class HTTPClient:
+    """
+    Shared outbound HTTP client for one upstream service.
+
+    Requests go through a pooled `requests.Session`, so connections are kept alive and
+    reused (one pool per process, re-created after a fork). Every call is bounded by a
+    deadline covering all its attempts. Idempotent requests that fail with a connection
+    error, a timeout or a retryable status are retried with exponential backoff and full
+    jitter while the deadline allows it. A circuit breaker refuses calls, raising
+    `CircuitOpenError`, while the service keeps failing, so callers fall back to a cached
+    or empty result immediately instead of waiting for timeouts.
+
+    requests is imported on first use, not with this module.
+
+    Attributes:
+        name (str): Service name used in metrics and errors.
+        timeout (float): Maximum seconds for each attempt (connect and read).
+        deadline (float): Maximum seconds for a whole call, retries included.
+        retries (int): Extra attempts for idempotent requests.
+        backoff (float): Base delay in seconds before the first retry.
+        max_backoff (float): Upper bound of the delay between two attempts.
+        pool_size (int): Connections kept alive per host.
+        retry_statuses (frozenset[int]): Response statuses that are retried.
+        breaker (CircuitBreaker): The client's circuit breaker.
+    """
+
+    def __init__(self, name, timeout=5, deadline=10, retries=2, backoff=0.2, max_backoff=2.0, pool_size=10,
+                 failure_threshold=5, reset_timeout=30, retry_statuses=DEFAULT_RETRY_STATUSES,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.name = name
+        self.timeout = timeout
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pool_size = pool_size
+        self.retry_statuses = frozenset(retry_statuses)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout, clock=clock)
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._session = None
+        self._adapter = None
+        self._pid = None
+        self._stats = {'requests': 0, 'retries': 0, 'failures': 0, 'short_circuits': 0}
+        http_clients[name] = self
+
+    def configure(self, timeout=None, deadline=None, retries=None, backoff=None, max_backoff=None, pool_size=None,
+                  failure_threshold=None, reset_timeout=None):
+        """
+        Update the client settings. Arguments left as None keep their current value.
+        A new pool size applies to the next pool, i.e. after `close()` or a fork.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            for setting, value in (('timeout', timeout), ('deadline', deadline), ('retries', retries),
+                                   ('backoff', backoff), ('max_backoff', max_backoff), ('pool_size', pool_size)):
+                if value is not None:
+                    setattr(self, setting, value)
+        if failure_threshold is not None:
+            self.breaker.failure_threshold = failure_threshold
+        if reset_timeout is not None:
+            self.breaker.reset_timeout = reset_timeout
+
+    def reset(self):
+        """
+        Close the circuit and zero the counters.
+
+        Returns:
+            None
+        """
+        self.breaker.reset()
+        with self._lock:
+            self._stats = dict.fromkeys(self._stats, 0)
+
+    def stats(self):
+        """
+        Return the client's cumulative counters.
+
+        Returns:
+            dict: `requests`, `retries`, `failures` (calls that failed after every
+                attempt), `short_circuits` (calls refused by the breaker) and
+                `circuit_opens`.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats['circuit_opens'] = self.breaker.opens
+        return stats
+
+    def _count(self, counter):
+        with self._lock:
+            self._stats[counter] += 1
+
+    def session(self):
+        """
+        Return this process's pooled session, creating it on first use or after a fork.
+
+        Returns:
+            requests.Session: The session.
+        """
+        with self._lock:
+            if self._session is None or self._pid != os.getpid():
+                import requests
+                from requests.adapters import HTTPAdapter
+                # Los reintentos los gestiona request(), no urllib3
+                adapter = HTTPAdapter(pool_maxsize=self.pool_size, max_retries=0)
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._session, self._adapter, self._pid = session, adapter, os.getpid()
+            return self._session
+
+    def adapter(self):
+        """
+        Return the pooled transport adapter, to send another session's requests through
+        the same keep-alive connections.
+
+        Returns:
+            requests.adapters.HTTPAdapter: The adapter.
+        """
+        self.session()
+        return self._adapter
+
+    def close(self):
+        """
+        Close the pooled connections of this process.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            session, self._session = self._session, None
+        if session is not None and self._pid == os.getpid():
+            session.close()
+
+    def _refuse(self):
+        self._count('short_circuits')
+        observe_outbound(self.name, time.perf_counter(), 'short_circuit')
+        raise CircuitOpenError(f"Circuito abierto para {self.name}: no se llama al servicio")
+
+    def _pause(self, attempt):
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def request(self, method, url, deadline=None, retries=None, **kwargs):
+        """
+        Send a request through the pool with deadline, retries and circuit breaker.
+
+        Args:
+            method (str): The HTTP method.
+            url (str): The URL.
+            deadline (float, optional): Seconds for the whole call. Defaults to `deadline`.
+            retries (int, optional): Extra attempts. Defaults to `retries` for idempotent
+                methods and to 0 otherwise.
+            **kwargs: Passed to `requests.Session.request`. `timeout` bounds each attempt.
+
+        Returns:
+            requests.Response: The response. Statuses that are not retried are returned
+                as they are, for the caller to check; 5xx ones count as failures for the
+                circuit breaker.
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open.
+            requests.RequestException: If every attempt failed or the deadline passed.
+                Any other exception raised while sending is passed on as well, and also
+                counts as a failure for the circuit breaker.
+        """
+        import requests
+        if not self.breaker.allow():
+            self._refuse()
+        if retries is None:
+            retries = self.retries if method.upper() in IDEMPOTENT_METHODS else 0
+        timeout = kwargs.pop('timeout', self.timeout)
+        deadline_at = self._clock() + (self.deadline if deadline is None else deadline)
+        started = time.perf_counter()
+        self._count('requests')
+
+        attempt = 0
+        try:
+            while True:
+                remaining = deadline_at - self._clock()
+                if remaining <= 0:
+                    error = requests.Timeout(f"{self.name}: plazo de {deadline or self.deadline} s agotado")
+                else:
+                    try:
+                        response = self.session().request(method, url, timeout=min(timeout, remaining), **kwargs)
+                    except requests.RequestException as e:
+                        error = e
+                    else:
+                        if response.status_code not in self.retry_statuses:
+                            # Un 5xx también cuenta como fallo del servicio para el circuit breaker
+                            if response.status_code >= 500:
+                                self.breaker.record_failure()
+                            else:
+                                self.breaker.record_success()
+                            observe_outbound(self.name, started, 'ok' if response.status_code < 400 else 'error')
+                            return response
+                        error = requests.HTTPError(f"{response.status_code} de {self.name}: {url}", response=response)
+                        response.close()
+
+                pause = self._pause(attempt)
+                if attempt >= retries or remaining <= 0 or self._clock() + pause >= deadline_at:
+                    self.breaker.record_failure()
+                    self._count('failures')
+                    observe_outbound(self.name, started, 'error')
+                    raise error
+                attempt += 1
+                self._count('retries')
+                self._sleep(pause)
+        except requests.RequestException:
+            # El resultado ya se ha registrado antes de lanzarla
+            raise
+        except BaseException:
+            # Cualquier otro error (un fallo del adaptador, una interrupción) también cuenta
+            # como fallo, para que una llamada de prueba nunca deje el circuito bloqueado
+            self.breaker.record_failure()
+            self._count('failures')
+            observe_outbound(self.name, started, 'error')
+            raise
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def get_json(self, url, **kwargs):
+        """
+        GET a URL and decode its JSON body.
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open.
+            requests.RequestException: If the request failed or returned an error status.
+            ValueError: If the body is not valid JSON.
+        """
+        response = self.get(url, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Run a call to this service made by another library (for example the OAuth token
+        exchange in authlib) under the circuit breaker, without retries.
+
+        Connection errors and timeouts (`requests.RequestException`) count as failures;
+        any other exception means the service answered and counts as a success. Exceptions
+        that are not an `Exception` (an interrupted call) count as failures.
+
+        Args:
+            fn (Callable): The function doing the request.
+            *args: Positional arguments for `fn`.
+            **kwargs: Keyword arguments for `fn`.
+
+        Returns:
+            Any: Whatever `fn` returns.
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open.
+        """
+        import requests
+        if not self.breaker.allow():
+            self._refuse()
+        started = time.perf_counter()
+        self._count('requests')
+        try:
+            result = fn(*args, **kwargs)
+        except requests.RequestException:
+            self.breaker.record_failure()
+            self._count('failures')
+            observe_outbound(self.name, started, 'error')
+            raise
+        except Exception:
+            self.breaker.record_success()
+            observe_outbound(self.name, started, 'error')
+            raise
+        except BaseException:
+            # Una interrupción no dice nada del servicio, pero debe cerrar la llamada de prueba
+            self.breaker.record_failure()
+            observe_outbound(self.name, started, 'error')
+            raise
+        self.breaker.record_success()
+        observe_outbound(self.name, started, 'ok')
+        return result
+
+
+def init_http_clients(app):
+    """
+    Configure every outbound HTTP client from the Flask application settings.
+
+    Reads `HTTP_TIMEOUT`, `HTTP_DEADLINE`, `HTTP_RETRIES`, `HTTP_RETRY_BACKOFF`,
+    `HTTP_RETRY_MAX_BACKOFF`, `HTTP_POOL_SIZE`, `HTTP_BREAKER_FAILURES` and
+    `HTTP_BREAKER_RESET`. Settings that are missing keep the client defaults.
+
+    Args:
+        app (Flask): The Flask application instance.
+
+    Returns:
+        None
+    """
+    for client in http_clients.values():
+        client.configure(
+            timeout=app.config.get('HTTP_TIMEOUT'),
+            deadline=app.config.get('HTTP_DEADLINE'),
+            retries=app.config.get('HTTP_RETRIES'),
+            backoff=app.config.get('HTTP_RETRY_BACKOFF'),
+            max_backoff=app.config.get('HTTP_RETRY_MAX_BACKOFF'),
+            pool_size=app.config.get('HTTP_POOL_SIZE'),
+            failure_threshold=app.config.get('HTTP_BREAKER_FAILURES'),
+            reset_timeout=app.config.get('HTTP_BREAKER_RESET'),
+        )
+
+
+def http_collector():
+    """
+    Export the counters of every HTTP client as `outbound_retries_total`,
+    `outbound_short_circuits_total` and `outbound_circuit_opens_total`.
+
+    Returns:
+        list[tuple]: `(name, labels, value)` samples for `MetricsRegistry.register_collector`.
+    """
+    samples = []
+    for name, client in http_clients.items():
+        stats = client.stats()
+        samples += [
+            ('outbound_retries_total', {'service': name}, stats['retries']),
+            ('outbound_short_circuits_total', {'service': name}, stats['short_circuits']),
+            ('outbound_circuit_opens_total', {'service': name}, stats['circuit_opens']),
+        ]
+    return samples
@@ -0,0 +1,391 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from models.models import db, Job, utcnow
+from services.metrics_service import metrics
+from sqlalchemy import select, update, delete, or_, and_, func
+from sqlalchemy.exc import IntegrityError
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_RETRY_BACKOFF = 10
+DEFAULT_MAX_BACKOFF = 3600
+DEFAULT_VISIBILITY_TIMEOUT = 300
+DEFAULT_POLL_INTERVAL = 1.0
+
+# Manejadores registrados con @job, por nombre
+job_handlers = {}
+
+
+class JobHandler:
+    """
+    A function registered to run the jobs of one name.
+
+    Attributes:
+        name (str): Name the jobs are enqueued with.
+        func (Callable): Function called with the job payload as keyword arguments.
+        max_attempts (int): Attempts before a failing job is given up, or None for
+            `DEFAULT_MAX_ATTEMPTS`.
+        timeout (float): Seconds the job may need, or None if `JOB_VISIBILITY_TIMEOUT`
+            is enough. Workers claim jobs for the longest timeout of any handler.
+        every (str): For periodic jobs, name of the config setting holding the interval
+            in seconds between runs (0 disables the job).
+    """
+
+    def __init__(self, name, func, max_attempts=None, timeout=None, every=None):
+        self.name = name
+        self.func = func
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.every = every
+
+    def interval(self, config):
+        """Seconds between runs of a periodic job, or 0 if it is not periodic or disabled."""
+        return float(config.get(self.every) or 0) if self.every else 0
+
+
+def job(name, max_attempts=None, timeout=None, every=None):
+    """
+    Register a function as the handler of the jobs called `name`.
+
+    Args:
+        name (str): Name the jobs are enqueued with.
+        max_attempts (int, optional): Attempts before a failing job is given up.
+        timeout (float, optional): Seconds the job may need before another worker can
+            take it over, if longer than `JOB_VISIBILITY_TIMEOUT`.
+        every (str, optional): Makes the job periodic: name of the config setting with
+            the interval in seconds between runs. Workers keep exactly one instance of
+            it queued.
+
+    Returns:
+        Callable: The decorator, which returns the function unchanged.
+    """
+    def decorator(func):
+        job_handlers[name] = JobHandler(name, func, max_attempts, timeout, every)
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, delay=0, key=None, max_attempts=None):
+    """
+    Add a job to the queue inside the current transaction.
+
+    The job is committed together with the caller's changes, so it only runs if they
+    are saved, and it is never lost once they are. With a `key`, the job is not added
+    while another job with the same key is waiting or running.
+
+    Args:
+        name (str): Name of the registered handler.
+        payload (dict, optional): JSON-serialisable keyword arguments of the handler.
+        delay (float): Seconds to wait before the job becomes due.
+        key (str, optional): Unique key of the job.
+        max_attempts (int, optional): Attempts before the job is given up. Defaults to
+            the handler's setting or `DEFAULT_MAX_ATTEMPTS`.
+
+    Returns:
+        Job: The queued job, or None if a job with the same key already exists.
+
+    Raises:
+        KeyError: If no handler is registered with that name.
+    """
+    handler = job_handlers[name]
+    now = utcnow()
+    new_job = Job(name=name, payload=json.dumps(payload or {}), status='queued', key=key, attempts=0,
+                  max_attempts=max_attempts or handler.max_attempts or DEFAULT_MAX_ATTEMPTS,
+                  run_at=now + timedelta(seconds=delay), created_at=now)
+    if key is None:
+        db.session.add(new_job)
+        return new_job
+    if db.session.execute(select(Job.id).where(Job.key == key)).first():
+        return None
+    try:
+        with db.session.begin_nested():
+            db.session.add(new_job)
+        return new_job
+    except IntegrityError:
+        # Otra petición encoló el mismo trabajo a la vez
+        return None
+
+
+def schedule_periodic_jobs(config):
+    """
+    Make sure every enabled periodic job has its queued instance, and commit.
+
+    Periodic jobs are keyed by their name, so calling this from several workers at once
+    still leaves a single instance of each.
+
+    Args:
+        config (Mapping): The application config with the job intervals.
+
+    Returns:
+        list[str]: The names of the periodic jobs that were added.
+    """
+    added = []
+    for handler in job_handlers.values():
+        if handler.interval(config) > 0 and enqueue(handler.name, key=f'periodic:{handler.name}'):
+            added.append(handler.name)
+    db.session.commit()
+    return added
+
+
+def claim_jobs(worker_id, limit, visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT):
+    """
+    Atomically take up to `limit` due jobs for a worker, and commit.
+
+    A single `UPDATE ... RETURNING` marks the jobs as running, so two workers never
+    claim the same job. Jobs whose claim expired (their worker died or hung past the
+    visibility timeout) are due again and are claimed like queued ones.
+
+    Args:
+        worker_id (str): Identifier of the claiming worker.
+        limit (int): Maximum number of jobs to claim.
+        visibility_timeout (float): Seconds the worker has to finish each job.
+
+    Returns:
+        list[Row]: The claimed jobs, with their id, name, payload, attempts and
+            max_attempts (attempts already include this one).
+    """
+    now = utcnow()
+    due = (
+        select(Job.id)
+        .where(or_(and_(Job.status == 'queued', Job.run_at <= now),
+                   and_(Job.status == 'running', Job.locked_until < now)))
+        .order_by(Job.run_at, Job.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    claimed = db.session.execute(
+        update(Job)
+        .where(Job.id.in_(due.scalar_subquery()))
+        .values(status='running', attempts=Job.attempts + 1, locked_by=worker_id,
+                locked_until=now + timedelta(seconds=visibility_timeout))
+        .returning(Job.id, Job.name, Job.payload, Job.attempts, Job.max_attempts)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.session.commit()
+    return claimed
+
+
+def _owned(claimed, worker_id):
+    # Sólo se cierra el trabajo si nadie lo ha reclamado después
+    return (Job.id == claimed.id, Job.locked_by == worker_id, Job.attempts == claimed.attempts)
+
+
+def retry_delay(attempts, backoff=DEFAULT_RETRY_BACKOFF, max_backoff=DEFAULT_MAX_BACKOFF):
+    """
+    Seconds to wait before retrying a job, with exponential backoff and full jitter.
+
+    Args:
+        attempts (int): Attempts made so far.
+        backoff (float): Delay cap after the first failed attempt.
+        max_backoff (float): Maximum delay cap.
+
+    Returns:
+        float: A random delay between 0 and the cap for this attempt.
+    """
+    return random.uniform(0, min(max_backoff, backoff * 2 ** (attempts - 1)))
+
+
+def finish_job(claimed, worker_id, config):
+    """
+    Record that a claimed job ran successfully.
+
+    One-off jobs are deleted; periodic jobs are queued again for their next run.
+
+    Args:
+        claimed (Row): The job, as returned by `claim_jobs`.
+        worker_id (str): Identifier of the worker that ran it.
+        config (Mapping): The application config with the job intervals.
+
+    Returns:
+        None
+    """
+    handler = job_handlers.get(claimed.name)
+    interval = handler.interval(config) if handler else 0
+    if interval > 0:
+        db.session.execute(update(Job).where(*_owned(claimed, worker_id)).values(
+            status='queued', attempts=0, run_at=utcnow() + timedelta(seconds=interval),
+            locked_by=None, locked_until=None, last_error=None
+        ))
+    else:
+        db.session.execute(delete(Job).where(*_owned(claimed, worker_id)))
+    db.session.commit()
+
+
+def fail_job(claimed, worker_id, error, config):
+    """
+    Record that a claimed job failed, scheduling a retry if it has attempts left.
+
+    Jobs that used all their attempts stay in the queue as 'failed' for inspection (and
+    release their key, so the same job can be enqueued again), except periodic jobs,
+    which are simply run again at their next interval.
+
+    Args:
+        claimed (Row): The job, as returned by `claim_jobs`.
+        worker_id (str): Identifier of the worker that ran it.
+        error (str): Description of the error.
+        config (Mapping): The application config with the retry settings.
+
+    Returns:
+        str: 'retry', 'failed' or 'rescheduled'.
+    """
+    handler = job_handlers.get(claimed.name)
+    interval = handler.interval(config) if handler else 0
+    values = {'locked_by': None, 'locked_until': None, 'last_error': error}
+    if claimed.attempts < claimed.max_attempts:
+        outcome = 'retry'
+        delay = retry_delay(claimed.attempts, config.get('JOB_RETRY_BACKOFF', DEFAULT_RETRY_BACKOFF),
+                            config.get('JOB_MAX_BACKOFF', DEFAULT_MAX_BACKOFF))
+        values.update(status='queued', run_at=utcnow() + timedelta(seconds=delay))
+    elif interval > 0:
+        outcome = 'rescheduled'
+        values.update(status='queued', attempts=0, run_at=utcnow() + timedelta(seconds=interval))
+    else:
+        outcome = 'failed'
+        values.update(status='failed', key=None)
+    db.session.execute(update(Job).where(*_owned(claimed, worker_id)).values(**values))
+    db.session.commit()
+    return outcome
+
+
+def queue_stats():
+    """
+    Count the jobs of the queue by status.
+
+    Returns:
+        dict: Number of jobs per status ('queued', 'running', 'failed').
+    """
+    counts = {'queued': 0, 'running': 0, 'failed': 0}
+    counts.update(db.session.execute(select(Job.status, func.count()).group_by(Job.status)).all())
+    return counts
+
+
+def retry_failed_jobs(name=None):
+    """
+    Queue the failed jobs again with a fresh set of attempts, and commit.
+
+    Args:
+        name (str, optional): Only retry the jobs with this name.
+
+    Returns:
+        int: The number of jobs queued again.
+    """
+    query = update(Job).where(Job.status == 'failed').values(status='queued', attempts=0, run_at=utcnow())
+    if name:
+        query = query.where(Job.name == name)
+    retried = db.session.execute(query).rowcount
+    db.session.commit()
+    return retried
+
+
+class Worker:
+    """
+    Runs queued jobs with a pool of threads.
+
+    The main thread claims as many due jobs as there are idle threads, and each job runs
+    in its own application context. Any number of workers, in as many processes or
+    machines as needed, can share the same queue.
+
+    Attributes:
+        app (Flask): The application the jobs run in.
+        concurrency (int): Jobs run at the same time.
+        poll_interval (float): Seconds to wait for new jobs when the queue is empty.
+        visibility_timeout (float): Default seconds a job may run before another worker
+            can take it over.
+        worker_id (str): Identifier written on the claimed jobs.
+        processed (int): Jobs finished by this worker, successfully or not.
+    """
+
+    def __init__(self, app, concurrency=4, poll_interval=None, visibility_timeout=None, worker_id=None):
+        config = app.config
+        self.app = app
+        self.concurrency = max(concurrency, 1)
+        self.poll_interval = poll_interval or config.get('JOB_POLL_INTERVAL', DEFAULT_POLL_INTERVAL)
+        self.visibility_timeout = visibility_timeout or config.get('JOB_VISIBILITY_TIMEOUT',
+                                                                   DEFAULT_VISIBILITY_TIMEOUT)
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+        self.processed = 0
+        self.stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    def stop(self):
+        """Stop claiming jobs; the running ones are allowed to finish."""
+        self.stopping.set()
+
+    def run(self, burst=False):
+        """
+        Claim and run jobs until `stop` is called.
+
+        Args:
+            burst (bool): Return as soon as there are no due jobs left, instead of
+                waiting for new ones.
+
+        Returns:
+            int: The number of jobs processed.
+        """
+        with self.app.app_context():
+            schedule_periodic_jobs(self.app.config)
+            db.session.remove()
+
+        running = set()
+        with ThreadPoolExecutor(self.concurrency, thread_name_prefix='job') as pool:
+            while not self.stopping.is_set():
+                running = {future for future in running if not future.done()}
+                claimed = []
+                if len(running) < self.concurrency:
+                    with self.app.app_context():
+                        claimed = claim_jobs(self.worker_id, self.concurrency - len(running),
+                                             self._claim_timeout())
+                        db.session.remove()
+                for claimed_job in claimed:
+                    running.add(pool.submit(self.execute, claimed_job))
+                if claimed:
+                    continue
+                if burst and not running:
+                    break
+                self.stopping.wait(self.poll_interval if not running else min(self.poll_interval, 0.05))
+        return self.processed
+
+    def _claim_timeout(self):
+        # El plazo más largo de los manejadores registrados evita que se reclame a mitad
+        return max([self.visibility_timeout] + [handler.timeout or 0 for handler in job_handlers.values()])
+
+    def execute(self, claimed):
+        """
+        Run one claimed job and record its outcome.
+
+        Args:
+            claimed (Row): The job, as returned by `claim_jobs`.
+
+        Returns:
+            str: 'done', 'retry', 'failed' or 'rescheduled'.
+        """
+        started = time.perf_counter()
+        with self.app.app_context():
+            try:
+                handler = job_handlers.get(claimed.name)
+                if handler is None:
+                    raise LookupError(f"No handler registered for job '{claimed.name}'")
+                handler.func(**json.loads(claimed.payload))
+                db.session.commit()
+                finish_job(claimed, self.worker_id, self.app.config)
+                outcome = 'done'
+            except Exception as e:
+                db.session.rollback()
+                logger.warning("Job %s (%s) failed on attempt %d: %s", claimed.id, claimed.name, claimed.attempts, e)
+                outcome = fail_job(claimed, self.worker_id, traceback.format_exc(limit=5), self.app.config)
+            finally:
+                db.session.remove()
+        with self._lock:
+            self.processed += 1
+        metrics.inc('jobs_processed_total', {'job': claimed.name, 'outcome': outcome})
+        metrics.observe('job_duration_seconds', time.perf_counter() - started, {'job': claimed.name})
+        return outcome
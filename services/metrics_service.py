@@ -0,0 +1,411 @@
+from flask import g, request, has_request_context, Response, abort
+from sqlalchemy import event
+import glob
+import hmac
+import json
+import os
+import threading
+import time
+
+# Límites de los histogramas de latencia (segundos), como los de los clientes de Prometheus
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Límites del histograma de número de consultas SQL por petición
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+# Descripción de cada métrica, usada en las líneas HELP
+METRIC_HELP = {
+    'http_request_duration_seconds': 'Latency of HTTP requests by endpoint, method and status.',
+    'sql_queries_per_request': 'Number of SQL statements executed by one HTTP request.',
+    'sql_request_duration_seconds': 'Total time spent in SQL statements by one HTTP request.',
+    'sql_query_duration_seconds': 'Latency of individual SQL statements.',
+    'outbound_request_duration_seconds': 'Latency of outbound HTTP calls by service and outcome.',
+    'cache_hits_total': 'Cache lookups answered from the cache.',
+    'cache_misses_total': 'Cache lookups that had to load the value.',
+    'cache_hit_ratio': 'Hits divided by lookups, summed over every worker.',
+}
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """
+    Process-local counters and histograms with Prometheus text exposition.
+
+    Under gunicorn each worker has its own registry. When `directory` is set, every
+    worker writes its samples to `<directory>/<pid>.json` at most every
+    `flush_interval` seconds (and before serving `/metrics`), and `render` adds up the
+    files of every worker, including workers that have exited, so counters never go
+    backwards. The directory must be emptied when the server starts.
+
+    Attributes:
+        directory (str): Shared directory for multi-process aggregation, or None.
+        flush_interval (float): Minimum seconds between two writes of this process's file.
+    """
+
+    def __init__(self, directory=None, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._collectors = {}
+        self._flusher_pid = None
+        self._flushed_at = 0.0
+        self.clear()
+
+    def configure(self, directory=None, flush_interval=None):
+        """
+        Update the aggregation directory and flush interval. Arguments left as None keep
+        their current value.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if directory is not None:
+                self.directory = directory
+                os.makedirs(directory, exist_ok=True)
+            if flush_interval is not None:
+                self.flush_interval = flush_interval
+
+    def clear(self):
+        """
+        Drop every sample recorded by this process.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._counters = {}
+            self._histograms = {}
+            self._dirty = False
+
+    def register_collector(self, name, collector):
+        """
+        Add (or replace) a function called on every snapshot that returns extra counter samples.
+
+        Args:
+            name (str): Unique name of the collector.
+            collector (Callable): Function returning a list of `(name, labels, value)`
+                tuples with cumulative values, e.g. the counters of a cache.
+
+        Returns:
+            None
+        """
+        self._collectors[name] = collector
+
+    def inc(self, name, labels=None, value=1):
+        """
+        Increase a counter.
+
+        Args:
+            name (str): The metric name.
+            labels (dict, optional): The metric labels.
+            value (float): The amount to add.
+
+        Returns:
+            None
+        """
+        key = _label_key(labels or {})
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+            self._dirty = True
+
+    def observe(self, name, value, labels=None, buckets=DEFAULT_BUCKETS):
+        """
+        Record one observation in a histogram.
+
+        Args:
+            name (str): The metric name.
+            value (float): The observed value.
+            labels (dict, optional): The metric labels.
+            buckets (tuple): Upper bounds of the histogram buckets, used when the
+                series is created.
+
+        Returns:
+            None
+        """
+        key = _label_key(labels or {})
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = {'buckets': list(buckets), 'counts': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(histogram['buckets']):
+                if value <= bound:
+                    histogram['counts'][index] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+            self._dirty = True
+
+    def snapshot(self):
+        """
+        Return this process's samples, including those of the registered collectors.
+
+        Returns:
+            dict: `counters` and `histograms`, each a mapping of metric names to lists of
+                `[labels, value]` pairs.
+        """
+        collected = []
+        for collector in list(self._collectors.values()):
+            collected.extend(collector())
+        with self._lock:
+            counters = {name: [[dict(key), value] for key, value in series.items()]
+                        for name, series in self._counters.items()}
+            histograms = {name: [[dict(key), dict(data, counts=list(data['counts']))] for key, data in series.items()]
+                          for name, series in self._histograms.items()}
+        for name, labels, value in collected:
+            counters.setdefault(name, []).append([labels, value])
+        return {'pid': os.getpid(), 'counters': counters, 'histograms': histograms}
+
+    def flush(self, force=False):
+        """
+        Write this process's samples to the shared directory.
+
+        Args:
+            force (bool): Write even if the flush interval has not passed.
+
+        Returns:
+            None
+        """
+        if not self.directory:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._flushed_at < self.flush_interval:
+                return
+            self._flushed_at = now
+            self._dirty = False
+        path = os.path.join(self.directory, f'{os.getpid()}.json')
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as output:
+            json.dump(self.snapshot(), output)
+        os.replace(temporary, path)
+
+    def start_flusher(self):
+        """
+        Start a background thread that flushes pending samples every `flush_interval`
+        seconds, so idle workers are reported too. Safe to call again after a fork.
+
+        Returns:
+            None
+        """
+        if not self.directory or self._flusher_pid == os.getpid():
+            return
+        self._flusher_pid = os.getpid()
+
+        def run():
+            while True:
+                time.sleep(self.flush_interval)
+                if self._dirty:
+                    self.flush(force=True)
+
+        threading.Thread(target=run, name='metrics-flusher', daemon=True).start()
+
+    def collect(self):
+        """
+        Return the samples of every process, added up per metric and label set.
+
+        Returns:
+            tuple[dict, dict]: The counters and the histograms, keyed by metric name and
+                then by sorted label tuples.
+        """
+        if self.directory:
+            self.flush(force=True)
+            snapshots = []
+            for path in glob.glob(os.path.join(self.directory, '*.json')):
+                try:
+                    with open(path) as source:
+                        snapshots.append(json.load(source))
+                except (OSError, ValueError):
+                    continue
+        else:
+            snapshots = [self.snapshot()]
+
+        counters, histograms = {}, {}
+        for snapshot in snapshots:
+            for name, samples in snapshot['counters'].items():
+                series = counters.setdefault(name, {})
+                for labels, value in samples:
+                    key = _label_key(labels)
+                    series[key] = series.get(key, 0) + value
+            for name, samples in snapshot['histograms'].items():
+                series = histograms.setdefault(name, {})
+                for labels, data in samples:
+                    key = _label_key(labels)
+                    total = series.get(key)
+                    if total is None or total['buckets'] != data['buckets']:
+                        series[key] = dict(data, counts=list(data['counts']))
+                        continue
+                    total['counts'] = [a + b for a, b in zip(total['counts'], data['counts'])]
+                    total['sum'] += data['sum']
+                    total['count'] += data['count']
+        return counters, histograms
+
+    def render(self):
+        """
+        Render every metric in the Prometheus text exposition format (version 0.0.4).
+
+        Returns:
+            str: The exposition text.
+        """
+        counters, histograms = self.collect()
+        lines = []
+
+        def header(name, kind):
+            if name in METRIC_HELP:
+                lines.append(f'# HELP {name} {METRIC_HELP[name]}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        for name in sorted(counters):
+            header(name, 'counter')
+            for key, value in sorted(counters[name].items()):
+                lines.append(f'{name}{_format_labels(key)} {_format_value(value)}')
+
+        # Proporción de aciertos a partir de los contadores ya sumados entre workers
+        hits, misses = counters.get('cache_hits_total', {}), counters.get('cache_misses_total', {})
+        if hits:
+            header('cache_hit_ratio', 'gauge')
+            for key in sorted(hits):
+                lookups = hits[key] + misses.get(key, 0)
+                lines.append(f'cache_hit_ratio{_format_labels(key)} {_format_value(hits[key] / lookups if lookups else 0.0)}')
+
+        for name in sorted(histograms):
+            header(name, 'histogram')
+            for key, data in sorted(histograms[name].items()):
+                for bound, count in zip(data['buckets'] + [float('inf')], data['counts'] + [data['count']]):
+                    bucket_labels = key + (('le', _format_value(float(bound))),)
+                    lines.append(f'{name}_bucket{_format_labels(bucket_labels)} {count}')
+                lines.append(f'{name}_sum{_format_labels(key)} {_format_value(float(data["sum"]))}')
+                lines.append(f'{name}_count{_format_labels(key)} {data["count"]}')
+        return '\n'.join(lines) + '\n'
+
+
+# Registro de métricas del proceso
+metrics = MetricsRegistry()
+
+
+def cache_collector(name, stats, hits=('hits',), misses=('misses',)):
+    """
+    Build a collector that exports a cache's counters as `cache_hits_total` and
+    `cache_misses_total`.
+
+    Args:
+        name (str): Value of the `cache` label.
+        stats (Callable): Function returning the cache's cumulative counters.
+        hits (tuple[str]): Counter names that count as hits.
+        misses (tuple[str]): Counter names that count as misses.
+
+    Returns:
+        Callable: The collector, for `MetricsRegistry.register_collector`.
+    """
+    def collect():
+        stats_now = stats()
+        return [
+            ('cache_hits_total', {'cache': name}, sum(stats_now.get(key, 0) for key in hits)),
+            ('cache_misses_total', {'cache': name}, sum(stats_now.get(key, 0) for key in misses)),
+        ]
+    return collect
+
+
+def observe_outbound(service, started, outcome):
+    """
+    Record the duration of an outbound HTTP call.
+
+    Args:
+        service (str): The called service, e.g. 'cheapshark'.
+        started (float): `time.perf_counter()` value taken before the call.
+        outcome (str): 'ok' or 'error'.
+
+    Returns:
+        None
+    """
+    metrics.observe('outbound_request_duration_seconds', time.perf_counter() - started,
+                    {'service': service, 'outcome': outcome})
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('metrics_query_start')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    metrics.observe('sql_query_duration_seconds', elapsed)
+    if has_request_context():
+        g.metrics_sql_count = g.get('metrics_sql_count', 0) + 1
+        g.metrics_sql_time = g.get('metrics_sql_time', 0.0) + elapsed
+
+
+def init_metrics(app, engine):
+    """
+    Instrument the application and expose the metrics on `/metrics`.
+
+    Records request latency per endpoint, the number and duration of SQL statements per
+    request (through engine events) and, through `register_collector`, the counters of
+    the shared caches. Reads `METRICS_ENABLED`, `METRICS_DIR` (shared directory for
+    gunicorn workers), `METRICS_FLUSH_INTERVAL` and `METRICS_TOKEN` (bearer token
+    required to read `/metrics`, if set; `validate_config` requires it in production).
+
+    Args:
+        app (Flask): The Flask application instance.
+        engine (Engine): The SQLAlchemy engine to instrument.
+
+    Returns:
+        None
+    """
+    if not app.config.get('METRICS_ENABLED'):
+        return
+    metrics.configure(directory=app.config.get('METRICS_DIR'),
+                      flush_interval=app.config.get('METRICS_FLUSH_INTERVAL'))
+
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('metrics_started', None)
+        if started is None or request.endpoint == 'metrics':
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        metrics.observe('http_request_duration_seconds', time.perf_counter() - started,
+                        {'endpoint': endpoint, 'method': request.method, 'status': str(response.status_code)})
+        metrics.observe('sql_queries_per_request', g.get('metrics_sql_count', 0), {'endpoint': endpoint},
+                        buckets=QUERY_COUNT_BUCKETS)
+        metrics.observe('sql_request_duration_seconds', g.get('metrics_sql_time', 0.0), {'endpoint': endpoint})
+        metrics.start_flusher()
+        metrics.flush()
+        return response
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        token = app.config.get('METRICS_TOKEN')
+        # Comparación en tiempo constante, para no revelar el token por la duración
+        if token and not hmac.compare_digest(request.headers.get('Authorization', '').encode(),
+                                             f'Bearer {token}'.encode()):
+            abort(403)
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,224 @@
+from datetime import datetime, timezone
+import sqlalchemy as sa
+
+# Tabla en la que se registran las migraciones aplicadas
+schema_version = sa.Table(
+    'schema_version', sa.MetaData(),
+    sa.Column('version', sa.Integer, primary_key=True),
+    sa.Column('description', sa.String(200), nullable=False),
+    sa.Column('applied_at', sa.DateTime, nullable=False),
+)
+
+
+class Migration:
+    """
+    One versioned schema change.
+
+    Each migration describes the schema as it was at its version, instead of reading the
+    current models, so replaying old migrations on a new database always gives the same
+    result. Migrations must be idempotent (`checkfirst=True`) so they can also be applied
+    to databases created by `db.create_all` before migrations existed.
+
+    Attributes:
+        version (int): Sequential version number.
+        description (str): Short description of the change.
+        apply (Callable): Function called with a SQLAlchemy connection to apply it.
+    """
+
+    def __init__(self, version, description, apply):
+        self.version = version
+        self.description = description
+        self.apply = apply
+
+
+def _initial_schema(connection):
+    metadata = sa.MetaData()
+    sa.Table(
+        'user', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('username', sa.String(80), unique=True, nullable=False),
+        sa.Column('password', sa.String(200), nullable=True),
+        sa.Column('oauth_provider', sa.String(50), nullable=True),
+        sa.Column('oauth_id', sa.String(100), nullable=True),
+    )
+    sa.Table(
+        'task', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('title', sa.String(100), nullable=False),
+        sa.Column('description', sa.Text, nullable=True),
+        sa.Column('priority', sa.Integer, nullable=False),
+        sa.Column('is_complete', sa.Boolean, nullable=True),
+        sa.Column('image', sa.String(100), nullable=True),
+        sa.Column('user_id', sa.Integer, sa.ForeignKey('user.id'), nullable=False),
+    )
+    metadata.create_all(connection, checkfirst=True)
+
+
+def _task_listing_index(connection):
+    task = sa.Table('task', sa.MetaData(), autoload_with=connection)
+    sa.Index(
+        'ix_task_user_complete_priority_id', task.c.user_id, task.c.is_complete, task.c.priority, task.c.id
+    ).create(connection, checkfirst=True)
+
+
+def _attachments(connection):
+    sa.Table(
+        'attachment', sa.MetaData(),
+        sa.Column('sha256', sa.String(64), primary_key=True),
+        sa.Column('filename', sa.String(100), unique=True, nullable=False),
+        sa.Column('size', sa.Integer, nullable=False),
+        sa.Column('ref_count', sa.Integer, nullable=False),
+    ).create(connection, checkfirst=True)
+
+
+def _task_search_index(connection):
+    if connection.dialect.name != 'sqlite':
+        return
+    connection.exec_driver_sql(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS task_fts USING fts5("
+        "title, description, user_id UNINDEXED, tokenize='unicode61 remove_diacritics 2')"
+    )
+    connection.exec_driver_sql(
+        "INSERT INTO task_fts (rowid, title, description, user_id) "
+        "SELECT id, title, coalesce(description, ''), user_id FROM task "
+        "WHERE id NOT IN (SELECT rowid FROM task_fts)"
+    )
+
+
+def _task_list_version(connection):
+    columns = {column['name'] for column in sa.inspect(connection).get_columns('user')}
+    if 'task_version' not in columns:
+        connection.exec_driver_sql(
+            'ALTER TABLE "user" ADD COLUMN task_version INTEGER NOT NULL DEFAULT 0'
+        )
+
+
+def _task_stats(connection):
+    if sa.inspect(connection).has_table('task_stat'):
+        return
+    metadata = sa.MetaData()
+    sa.Table('user', metadata, autoload_with=connection)
+    sa.Table(
+        'task_stat', metadata,
+        sa.Column('user_id', sa.Integer, sa.ForeignKey('user.id'), primary_key=True),
+        sa.Column('priority', sa.Integer, primary_key=True),
+        sa.Column('is_complete', sa.Boolean, primary_key=True),
+        sa.Column('count', sa.Integer, nullable=False),
+    ).create(connection)
+    # Los contadores parten de las tareas que ya existen
+    connection.exec_driver_sql(
+        "INSERT INTO task_stat (user_id, priority, is_complete, count) "
+        "SELECT user_id, priority, COALESCE(is_complete, FALSE), COUNT(*) FROM task "
+        "GROUP BY user_id, priority, COALESCE(is_complete, FALSE)"
+    )
+
+
+def _task_soft_delete(connection):
+    columns = {column['name'] for column in sa.inspect(connection).get_columns('task')}
+    if 'deleted_at' not in columns:
+        connection.exec_driver_sql('ALTER TABLE task ADD COLUMN deleted_at DATETIME')
+        # El índice del listado pasa a cubrir sólo las tareas no borradas
+        connection.exec_driver_sql('DROP INDEX IF EXISTS ix_task_user_complete_priority_id')
+        connection.exec_driver_sql(
+            'CREATE INDEX ix_task_user_complete_priority_id ON task (user_id, is_complete, priority, id) '
+            'WHERE deleted_at IS NULL'
+        )
+    if 'ix_task_deleted_at' not in {index['name'] for index in sa.inspect(connection).get_indexes('task')}:
+        connection.exec_driver_sql(
+            'CREATE INDEX ix_task_deleted_at ON task (deleted_at) WHERE deleted_at IS NOT NULL'
+        )
+
+
+def _job_queue(connection):
+    job = sa.Table(
+        'job', sa.MetaData(),
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('name', sa.String(100), nullable=False),
+        sa.Column('payload', sa.Text, nullable=False),
+        sa.Column('status', sa.String(20), nullable=False),
+        sa.Column('key', sa.String(200), nullable=True, unique=True),
+        sa.Column('attempts', sa.Integer, nullable=False),
+        sa.Column('max_attempts', sa.Integer, nullable=False),
+        sa.Column('run_at', sa.DateTime, nullable=False),
+        sa.Column('locked_until', sa.DateTime, nullable=True),
+        sa.Column('locked_by', sa.String(100), nullable=True),
+        sa.Column('last_error', sa.Text, nullable=True),
+        sa.Column('created_at', sa.DateTime, nullable=False),
+    )
+    job.create(connection, checkfirst=True)
+    sa.Index('ix_job_status_run_at', job.c.status, job.c.run_at).create(connection, checkfirst=True)
+
+
+def _task_image_index(connection):
+    if 'ix_task_image' not in {index['name'] for index in sa.inspect(connection).get_indexes('task')}:
+        connection.exec_driver_sql('CREATE INDEX ix_task_image ON task (image) WHERE image IS NOT NULL')
+
+
+MIGRATIONS = [
+    Migration(1, 'Initial user and task tables', _initial_schema),
+    Migration(2, 'Composite index for the task listing', _task_listing_index),
+    Migration(3, 'Content-addressed attachments', _attachments),
+    Migration(4, 'Full-text search index for tasks (SQLite FTS5)', _task_search_index),
+    Migration(5, 'Per-user task list version', _task_list_version),
+    Migration(6, 'Per-user task counters', _task_stats),
+    Migration(7, 'Soft delete of tasks', _task_soft_delete),
+    Migration(8, 'Background job queue', _job_queue),
+    Migration(9, 'Index on task images for the upload collector', _task_image_index),
+]
+
+
+def applied_versions(connection):
+    """
+    Return the versions already applied to a database.
+
+    Args:
+        connection (Connection): A SQLAlchemy connection.
+
+    Returns:
+        set[int]: The applied version numbers (empty for a new database).
+    """
+    if not sa.inspect(connection).has_table('schema_version'):
+        return set()
+    return set(connection.execute(sa.select(schema_version.c.version)).scalars())
+
+
+def pending_migrations(engine):
+    """
+    Return the migrations that have not been applied yet, in order.
+
+    Args:
+        engine (Engine): The SQLAlchemy engine of the database.
+
+    Returns:
+        list[Migration]: The pending migrations.
+    """
+    with engine.connect() as connection:
+        applied = applied_versions(connection)
+    return [migration for migration in MIGRATIONS if migration.version not in applied]
+
+
+def upgrade(engine, target=None):
+    """
+    Apply every pending migration up to `target`, each one in its own transaction.
+
+    Args:
+        engine (Engine): The SQLAlchemy engine of the database.
+        target (int, optional): Last version to apply. Defaults to the latest one.
+
+    Returns:
+        list[Migration]: The migrations that were applied.
+    """
+    applied = []
+    for migration in pending_migrations(engine):
+        if target is not None and migration.version > target:
+            break
+        with engine.begin() as connection:
+            schema_version.create(connection, checkfirst=True)
+            migration.apply(connection)
+            connection.execute(schema_version.insert().values(
+                version=migration.version,
+                description=migration.description,
+                applied_at=datetime.now(timezone.utc).replace(tzinfo=None),
+            ))
+        applied.append(migration)
+    return applied
@@ -0,0 +1,49 @@
+from authlib.integrations.flask_client import FlaskOAuth2App
+from authlib.integrations.requests_client import OAuth2Session
+from services.oauth_service import oidc_cache, oauth_http
+
+
+class PooledOAuth2Session(OAuth2Session):
+    """
+    authlib session that sends its requests through the pooled `oauth_http` connections,
+    with its timeout as default.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('default_timeout', oauth_http.timeout)
+        super().__init__(*args, **kwargs)
+
+    def get_adapter(self, url):
+        # Las sesiones de authlib se cierran tras cada uso; el pool compartido no
+        return oauth_http.adapter()
+
+
+class CachedOAuth2App(FlaskOAuth2App):
+    """
+    OAuth 2.0 / OpenID Connect client that reads its metadata through `oidc_cache` and
+    makes its token requests through `oauth_http`, under its circuit breaker.
+
+    Lives in its own module so that authlib is only imported when the first OAuth
+    client is created (see `services.oauth_service.get_oauth`).
+    """
+
+    client_cls = PooledOAuth2Session
+    _metadata_document = None
+
+    def load_server_metadata(self):
+        if self._server_metadata_url:
+            document = oidc_cache.discovery(self._server_metadata_url)
+            if document is not self._metadata_document:
+                self.server_metadata.update(document)
+                self._metadata_document = document
+        return self.server_metadata
+
+    def fetch_jwk_set(self, force=False):
+        metadata = self.load_server_metadata()
+        uri = metadata.get('jwks_uri')
+        if not uri:
+            return super().fetch_jwk_set(force=force)
+        return oidc_cache.jwks(uri, force=force)
+
+    def fetch_access_token(self, redirect_uri=None, **kwargs):
+        return oauth_http.call(super().fetch_access_token, redirect_uri, **kwargs)
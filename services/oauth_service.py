@@ -1,17 +1,229 @@
-from authlib.integrations.flask_client import OAuth
-import os
+from functools import partial
+from services.cache_service import StaleWhileRevalidateCache
+from services.http_service import HTTPClient
+import threading
+import time
 
-# Crear instancia global de OAuth
-oauth = OAuth()
+
+class OIDCMetadataCache:
+    """
+    In-memory cache of OpenID Connect discovery documents and JWKS key sets.
+
+    Each URL gets its own stale-while-revalidate cache, so expired documents keep being
+    served while they are re-fetched in the background. Forced JWKS refreshes, used when
+    an ID token is signed with an unknown key, are limited to one per
+    `min_refresh_interval` seconds per key set.
+
+    Attributes:
+        metadata_ttl (float): Seconds a discovery document is considered fresh.
+        jwks_ttl (float): Seconds a key set is considered fresh.
+        min_refresh_interval (float): Minimum seconds between forced key set refreshes.
+        timeout (float): Timeout in seconds for each HTTP request.
+    """
+
+    def __init__(self, metadata_ttl=86400, jwks_ttl=3600, min_refresh_interval=60, timeout=5,
+                 clock=time.monotonic):
+        self.metadata_ttl = metadata_ttl
+        self.jwks_ttl = jwks_ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.clear()
+
+    def configure(self, metadata_ttl=None, jwks_ttl=None, min_refresh_interval=None, timeout=None):
+        """
+        Update the cache settings. Arguments left as None keep their current value.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if metadata_ttl is not None:
+                self.metadata_ttl = metadata_ttl
+            if jwks_ttl is not None:
+                self.jwks_ttl = jwks_ttl
+            if min_refresh_interval is not None:
+                self.min_refresh_interval = min_refresh_interval
+            if timeout is not None:
+                self.timeout = timeout
+
+    def clear(self):
+        """
+        Drop every cached document and key set.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._caches = {}
+            self._forced_at = {}
+
+    def stats(self):
+        """
+        Return the counters of every cached URL.
+
+        Returns:
+            dict: URLs mapped to the counters of their cache.
+        """
+        with self._lock:
+            caches = dict(self._caches)
+        return {url: cache.stats() for url, cache in caches.items()}
+
+    def total_stats(self):
+        """
+        Return the counters of every cached URL added together.
+
+        Returns:
+            dict: Counter names mapped to their totals.
+        """
+        totals = {}
+        for stats in self.stats().values():
+            for name, value in stats.items():
+                totals[name] = totals.get(name, 0) + value
+        return totals
+
+    def _fetch_json(self, url):
+        return oauth_http.get_json(url, timeout=self.timeout)
+
+    def _cache_for(self, url, ttl):
+        with self._lock:
+            cache = self._caches.get(url)
+            if cache is None:
+                cache = StaleWhileRevalidateCache(
+                    partial(self._fetch_json, url), ttl=ttl, stale_ttl=ttl, negative_ttl=self.min_refresh_interval,
+                    clock=self._clock
+                )
+                self._caches[url] = cache
+            return cache
+
+    def discovery(self, url):
+        """
+        Return the discovery document published at `url`.
+
+        Args:
+            url (str): The provider's `.well-known/openid-configuration` URL.
+
+        Returns:
+            dict: The discovery document.
+
+        Raises:
+            RuntimeError: If the document could not be fetched and none is cached.
+        """
+        cache = self._cache_for(url, self.metadata_ttl)
+        document = cache.get()
+        if document is None:
+            raise RuntimeError(f"No se pudo obtener la configuración OIDC de {url}: {cache.last_error}")
+        return document
+
+    def jwks(self, uri, force=False):
+        """
+        Return the JWKS key set published at `uri`.
+
+        Args:
+            uri (str): The provider's `jwks_uri`.
+            force (bool): Re-fetch the key set because a token used an unknown key.
+                Ignored if the key set was force-refreshed less than
+                `min_refresh_interval` seconds ago.
+
+        Returns:
+            dict: The key set.
+
+        Raises:
+            RuntimeError: If the key set could not be fetched and none is cached.
+        """
+        cache = self._cache_for(uri, self.jwks_ttl)
+        if force:
+            now = self._clock()
+            with self._lock:
+                forced_at = self._forced_at.get(uri)
+                allowed = forced_at is None or now - forced_at >= self.min_refresh_interval
+                if allowed:
+                    self._forced_at[uri] = now
+            key_set = cache.refresh() if allowed else cache.get()
+        else:
+            key_set = cache.get()
+        if key_set is None:
+            raise RuntimeError(f"No se pudieron obtener las claves OIDC de {uri}: {cache.last_error}")
+        return key_set
+
+    def prefetch(self, client):
+        """
+        Warm the discovery document and key set of a client in the background.
+
+        Args:
+            client (CachedOAuth2App): The OAuth client whose metadata should be warmed.
+
+        Returns:
+            None
+        """
+        if client._server_metadata_url:
+            self._cache_for(client._server_metadata_url, self.metadata_ttl).warm()
+        jwks_uri = client.server_metadata.get('jwks_uri')
+        if jwks_uri:
+            self._cache_for(jwks_uri, self.jwks_ttl).warm()
+
+
+# Cliente HTTP compartido por los documentos OIDC y el intercambio de tokens
+oauth_http = HTTPClient('oauth')
+
+# Caché global de metadatos OIDC compartida por todos los proveedores
+oidc_cache = OIDCMetadataCache()
+
+
+# Instancia global de OAuth, creada en el primer uso: importar authlib (y con él
+# requests) cuesta más que el resto del arranque y muchos procesos no lo necesitan
+_oauth = None
+_app = None
+_pending = {}
+_registered = set()
+_registry_lock = threading.Lock()
+
+
+def get_oauth():
+    """
+    Return the process-wide authlib `OAuth` registry, creating it on first use.
+
+    authlib is imported here rather than at module import, so CLI commands and workers
+    that never serve an OAuth login skip its import cost. Providers declared through
+    `init_oauth` before this call are registered now.
+
+    Returns:
+        OAuth: The OAuth registry, attached to the last app passed to `init_oauth`.
+    """
+    global _oauth
+    with _registry_lock:
+        if _oauth is None:
+            from authlib.integrations.flask_client import OAuth
+            _oauth = OAuth()
+            if _app is not None:
+                _oauth.init_app(_app)
+        if _pending:
+            from services.oauth_client import CachedOAuth2App
+            for name, provider in _pending.items():
+                _oauth.register(name=name, client_cls=CachedOAuth2App, **provider)
+            _pending.clear()
+        return _oauth
+
+
+def __getattr__(name):
+    # `oauth_service.oauth` sigue disponible como atributo del módulo
+    if name == 'oauth':
+        return get_oauth()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def init_oauth(app):
     """
     Initialize and configure OAuth integration with the Flask application.
 
-    This function sets up the OAuth client for the Flask application and registers
-    the Google OAuth provider using environment variables for client ID and client secret.
-    It connects the OAuth client with the Flask app and specifies the necessary endpoints.
+    This function connects the OAuth client with the Flask app and declares every
+    provider listed in the `OAUTH_PROVIDERS` setting. Providers are registered only
+    once per process, so calling it again (for example for another app instance) only
+    re-points the OAuth client to the new app. The authlib client itself is created
+    lazily by `get_oauth`. The OIDC metadata cache is configured from the
+    `OAUTH_METADATA_TTL`, `OAUTH_JWKS_TTL`, `OAUTH_JWKS_MIN_REFRESH_INTERVAL` and
+    `OAUTH_HTTP_TIMEOUT` settings.
 
     Args:
         app (Flask): The Flask application instance to which OAuth is attached.
@@ -19,19 +231,37 @@ def init_oauth(app):
     Returns:
         None
     """
-    oauth.init_app(app)  # Conecta OAuth con la app Flask
-
-    # Configuración del proveedor Google OAuth
-    oauth.register(
-        name='google',
-        client_id=os.getenv('OAUTH_CLIENT_ID'),
-        client_secret=os.getenv('OAUTH_CLIENT_SECRET'),
-        access_token_url='https://accounts.google.com/o/oauth2/token',
-        authorize_url='https://accounts.google.com/o/oauth2/auth',
-        api_base_url='https://www.googleapis.com/oauth2/v1/',
-        userinfo_endpoint='https://openidconnect.googleapis.com/v1/userinfo',
-        jwks_uri='https://www.googleapis.com/oauth2/v3/certs',
-        client_kwargs={
-            'scope': 'openid email profile'
-    }
-)
+    global _app
+    oidc_cache.configure(
+        metadata_ttl=app.config.get('OAUTH_METADATA_TTL'),
+        jwks_ttl=app.config.get('OAUTH_JWKS_TTL'),
+        min_refresh_interval=app.config.get('OAUTH_JWKS_MIN_REFRESH_INTERVAL'),
+        timeout=app.config.get('OAUTH_HTTP_TIMEOUT'),
+    )
+
+    with _registry_lock:
+        _app = app
+        if _oauth is not None:
+            _oauth.init_app(app)  # Conecta OAuth con la app Flask
+        for name, provider in app.config.get('OAUTH_PROVIDERS', {}).items():
+            if name in _registered:
+                continue
+            _pending[name] = provider
+            _registered.add(name)
+    if _oauth is not None:
+        get_oauth()  # Registra ya los proveedores nuevos
+
+
+def get_provider(name):
+    """
+    Return the registered OAuth client for a provider.
+
+    Args:
+        name (str): The provider name, as declared in `OAUTH_PROVIDERS`.
+
+    Returns:
+        CachedOAuth2App: The OAuth client, or None if the provider is not registered.
+    """
+    if name not in _registered:
+        return None
+    return get_oauth().create_client(name)
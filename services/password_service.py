@@ -0,0 +1,219 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+import os
+import threading
+
+DEFAULT_HASH_METHOD = 'scrypt'
+DEFAULT_SALT_LENGTH = 16
+
+
+class HashingOverloaded(Exception):
+    """Raised when the hashing executor is full or a hash takes too long to start."""
+
+
+class HashingExecutor:
+    """
+    Bounded thread pool for CPU-heavy password hashing.
+
+    At most `workers` hashes run at once and at most `queue_limit` more wait for a free
+    worker. Any further request is rejected immediately with `HashingOverloaded`, so a
+    login storm turns into fast 503 responses instead of tying up every web worker.
+    Hash functions release the GIL, so the pool also limits real CPU use.
+
+    The pool is created on first use and re-created after a fork, so it can be configured
+    in a pre-loading master process.
+
+    Attributes:
+        workers (int): Number of hashing threads.
+        queue_limit (int): Number of hashes allowed to wait for a thread.
+        timeout (float): Seconds a caller waits for its hash before giving up.
+    """
+
+    def __init__(self, workers=2, queue_limit=16, timeout=5):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+        self._slots = None
+        self._stats = dict.fromkeys(('submitted', 'rejected', 'timeouts'), 0)
+
+    def configure(self, workers=None, queue_limit=None, timeout=None):
+        """
+        Update the executor limits. Arguments left as None keep their current value.
+
+        A running pool is shut down and re-created with the new limits on next use.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if workers is not None:
+                self.workers = workers
+            if queue_limit is not None:
+                self.queue_limit = queue_limit
+            if timeout is not None:
+                self.timeout = timeout
+            self._shutdown()
+
+    def stats(self):
+        """
+        Return the executor counters: `submitted`, `rejected` and `timeouts`.
+
+        Returns:
+            dict: Counter names mapped to their current values.
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def run(self, fn, *args):
+        """
+        Run `fn(*args)` on the hashing pool and wait for its result.
+
+        Args:
+            fn (Callable): The hashing function.
+            *args: Arguments passed to `fn`.
+
+        Returns:
+            Any: The value returned by `fn`.
+
+        Raises:
+            HashingOverloaded: If the pool and its queue are full, or the result is not
+                ready within `timeout` seconds.
+        """
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._start()
+            pool, slots = self._pool, self._slots
+            if not slots.acquire(blocking=False):
+                self._stats['rejected'] += 1
+                raise HashingOverloaded("Hashing queue is full")
+            self._stats['submitted'] += 1
+
+        future = pool.submit(fn, *args)
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise HashingOverloaded("Hashing timed out")
+
+    def _start(self):
+        # Must be called with the lock held.
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_limit)
+        self._pid = os.getpid()
+
+    def _shutdown(self):
+        # Must be called with the lock held.
+        if self._pool is not None and self._pid == os.getpid():
+            self._pool.shutdown(wait=False)
+        self._pool = None
+
+
+# Pool de hashing compartido por todas las peticiones del proceso
+hashing_executor = HashingExecutor()
+
+
+def init_password_hashing(app):
+    """
+    Configure the hashing executor from the `PASSWORD_HASH_WORKERS`,
+    `PASSWORD_HASH_QUEUE_LIMIT` and `PASSWORD_HASH_TIMEOUT` settings.
+
+    Args:
+        app (Flask): The Flask application instance.
+
+    Returns:
+        None
+    """
+    hashing_executor.configure(
+        workers=app.config.get('PASSWORD_HASH_WORKERS'),
+        queue_limit=app.config.get('PASSWORD_HASH_QUEUE_LIMIT'),
+        timeout=app.config.get('PASSWORD_HASH_TIMEOUT'),
+    )
+
+
+def _hash_settings():
+    config = current_app.config
+    return (config.get('PASSWORD_HASH_METHOD', DEFAULT_HASH_METHOD),
+            config.get('PASSWORD_SALT_LENGTH', DEFAULT_SALT_LENGTH))
+
+
+def _method_prefix(method):
+    """
+    Return the normalized method string Werkzeug writes for `method`, e.g. 'scrypt:32768:8:1'.
+
+    The string is built from the method and Werkzeug's defaults, without hashing anything,
+    so checking a stored hash never runs a hash outside the hashing executor.
+
+    Raises:
+        ValueError: If the method is not 'scrypt' or 'pbkdf2', or has too many arguments.
+    """
+    name, *args = method.split(':')
+    if name == 'scrypt':
+        if not args:
+            args = [2 ** 15, 8, 1]
+        if len(args) != 3:
+            raise ValueError("'scrypt' takes 3 arguments.")
+        return 'scrypt:{}:{}:{}'.format(*map(int, args))
+    if name == 'pbkdf2':
+        if len(args) > 2:
+            raise ValueError("'pbkdf2' takes 2 arguments.")
+        hash_name = args[0] if args else 'sha256'
+        iterations = int(args[1]) if len(args) == 2 else DEFAULT_PBKDF2_ITERATIONS
+        return f'pbkdf2:{hash_name}:{iterations}'
+    raise ValueError(f"Invalid hash method '{method}'.")
+
+
+def hash_password(password):
+    """
+    Hash a password with the configured method on the hashing executor.
+
+    Args:
+        password (str): The plain-text password.
+
+    Returns:
+        str: The password hash.
+
+    Raises:
+        HashingOverloaded: If the hashing executor is saturated.
+    """
+    method, salt_length = _hash_settings()
+    return hashing_executor.run(generate_password_hash, password, method, salt_length)
+
+
+def needs_rehash(password_hash):
+    """
+    Check whether a stored hash was created with different parameters than the current ones.
+
+    Args:
+        password_hash (str): The stored password hash.
+
+    Returns:
+        bool: True if the hash method, its cost parameters or the salt length changed.
+    """
+    method, salt_length = _hash_settings()
+    stored_method, _, rest = password_hash.partition('$')
+    stored_salt = rest.partition('$')[0]
+    return stored_method != _method_prefix(method) or len(stored_salt) != salt_length
+
+
+def verify_password(password_hash, password):
+    """
+    Check a password against a stored hash on the hashing executor.
+
+    Args:
+        password_hash (str): The stored password hash.
+        password (str): The plain-text password to check.
+
+    Returns:
+        bool: True if the password matches.
+
+    Raises:
+        HashingOverloaded: If the hashing executor is saturated.
+    """
+    return hashing_executor.run(check_password_hash, password_hash, password)
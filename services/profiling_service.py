@@ -0,0 +1,156 @@
+from datetime import datetime, timezone
+from flask import request
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+
+PROFILE_HEADER = 'X-Profile'
+DEFAULT_MAX_FILES = 200
+
+
+class ProfilingMiddleware:
+    """
+    WSGI middleware that profiles selected requests with cProfile.
+
+    A request is profiled when it carries the `X-Profile` header with the configured
+    token, or when it is picked by the sampling rate. The profile covers the whole
+    request, including streaming the response body. Each profile is written to
+    `directory` as a `.prof` file (readable with `pstats` or snakeviz) plus a `.json`
+    file with the endpoint, timing metadata and a text summary of the hottest calls.
+
+    Only one request per process is profiled at a time; others run normally.
+
+    Attributes:
+        token (str): Value of the `X-Profile` header that triggers a profile, or None.
+        sample_rate (float): Fraction of requests profiled at random (0 to 1).
+        directory (str): Where profiles are written.
+        max_files (int): Number of profiles kept; the oldest ones are deleted.
+    """
+
+    def __init__(self, wsgi_app, directory, token=None, sample_rate=0.0, max_files=DEFAULT_MAX_FILES):
+        self.wsgi_app = wsgi_app
+        self.directory = directory
+        self.token = token
+        self.sample_rate = sample_rate
+        self.max_files = max_files
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _trigger(self, environ):
+        header = environ.get('HTTP_' + PROFILE_HEADER.upper().replace('-', '_'))
+        if self.token and header and hmac.compare_digest(header, self.token):
+            return 'header'
+        if self.sample_rate and random.random() < self.sample_rate:
+            return 'sample'
+        return None
+
+    def __call__(self, environ, start_response):
+        trigger = self._trigger(environ)
+        if trigger is None or not self._lock.acquire(blocking=False):
+            return self.wsgi_app(environ, start_response)
+
+        try:
+            profile = cProfile.Profile()
+            status = []
+            profile_id = self._profile_id(environ)
+
+            def profiled_start_response(status_line, headers, exc_info=None):
+                status.append(status_line)
+                if trigger == 'header':
+                    headers = list(headers) + [('X-Profile-Id', profile_id)]
+                return start_response(status_line, headers, exc_info)
+
+            started = time.perf_counter()
+            profile.enable()
+            try:
+                iterable = self.wsgi_app(environ, profiled_start_response)
+                try:
+                    body = list(iterable)
+                finally:
+                    if hasattr(iterable, 'close'):
+                        iterable.close()
+            finally:
+                profile.disable()
+            elapsed = time.perf_counter() - started
+
+            self._write(profile, profile_id, {
+                'endpoint': environ.get('profiling.endpoint'),
+                'method': environ.get('REQUEST_METHOD'),
+                'path': environ.get('PATH_INFO'),
+                'query_string': environ.get('QUERY_STRING'),
+                'status': status[0] if status else None,
+                'duration_ms': round(elapsed * 1000, 3),
+                'trigger': trigger,
+                'pid': os.getpid(),
+                'started_at': datetime.now(timezone.utc).isoformat(),
+            })
+            return body
+        finally:
+            self._lock.release()
+
+    def _profile_id(self, environ):
+        path = re.sub(r'[^A-Za-z0-9]+', '_', environ.get('PATH_INFO', '')).strip('_') or 'root'
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')
+        return f'{stamp}-{environ.get("REQUEST_METHOD", "GET")}-{path[:60]}-{os.getpid()}'
+
+    def _write(self, profile, profile_id, metadata):
+        summary = io.StringIO()
+        pstats.Stats(profile, stream=summary).sort_stats('cumulative').print_stats(25)
+        metadata['summary'] = summary.getvalue()
+
+        base = os.path.join(self.directory, profile_id)
+        profile.dump_stats(base + '.prof')
+        with open(base + '.json', 'w') as output:
+            json.dump(metadata, output, indent=2)
+        self._prune()
+
+    def _prune(self):
+        profiles = sorted(name for name in os.listdir(self.directory) if name.endswith('.prof'))
+        for name in profiles[:max(len(profiles) - self.max_files, 0)]:
+            for extension in ('.prof', '.json'):
+                try:
+                    os.remove(os.path.join(self.directory, name[:-len('.prof')] + extension))
+                except FileNotFoundError:
+                    pass
+
+
+def init_profiling(app):
+    """
+    Install the request profiler when `PROFILE_TOKEN` or `PROFILE_SAMPLE_RATE` is set.
+
+    Profiles are written to `PROFILE_DIR` (by default `instance/profiles/`) and at most
+    `PROFILE_MAX_FILES` are kept. When neither trigger is configured nothing is
+    installed, so the profiler adds no overhead.
+
+    Args:
+        app (Flask): The Flask application instance.
+
+    Returns:
+        ProfilingMiddleware: The installed middleware, or None if profiling is disabled.
+    """
+    token = app.config.get('PROFILE_TOKEN')
+    sample_rate = app.config.get('PROFILE_SAMPLE_RATE') or 0.0
+    if not token and not sample_rate:
+        return None
+
+    middleware = ProfilingMiddleware(
+        app.wsgi_app,
+        directory=app.config.get('PROFILE_DIR') or os.path.join(app.instance_path, 'profiles'),
+        token=token,
+        sample_rate=sample_rate,
+        max_files=app.config.get('PROFILE_MAX_FILES', DEFAULT_MAX_FILES),
+    )
+    app.wsgi_app = middleware
+
+    @app.before_request
+    def record_endpoint():
+        request.environ['profiling.endpoint'] = request.endpoint
+
+    return middleware
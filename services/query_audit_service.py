@@ -0,0 +1,138 @@
+from contextlib import contextmanager
+from flask import g, request, has_request_context
+from sqlalchemy import event
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SLOW_QUERY_MS = 100
+DEFAULT_REPEAT_THRESHOLD = 5
+
+
+class QueryAudit:
+    """
+    Development/staging query auditor.
+
+    Statements slower than `slow_query_ms` are logged with their parameters, duration
+    and query plan (`EXPLAIN QUERY PLAN` on SQLite, `EXPLAIN` elsewhere). At the end of
+    each request, statements executed `repeat_threshold` times or more with the same
+    SQL text are logged as likely N+1 patterns.
+
+    Attributes:
+        slow_query_ms (float): Duration above which a statement is logged.
+        repeat_threshold (int): Executions of one statement per request that are
+            reported as a likely N+1 pattern.
+        explain (bool): Whether to capture the query plan of slow statements.
+    """
+
+    def __init__(self, slow_query_ms=DEFAULT_SLOW_QUERY_MS, repeat_threshold=DEFAULT_REPEAT_THRESHOLD, explain=True):
+        self.slow_query_ms = slow_query_ms
+        self.repeat_threshold = repeat_threshold
+        self.explain = explain
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('audit_query_start', []).append(time.perf_counter())
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('audit_query_start')
+        if not starts:
+            return
+        elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+        if has_request_context():
+            counts = g.setdefault('audit_statements', {})
+            counts[statement] = counts.get(statement, 0) + 1
+        if elapsed_ms >= self.slow_query_ms:
+            plan = self.query_plan(conn, statement, parameters) if self.explain and not executemany else None
+            logger.warning("Slow query (%.1f ms): %s | parameters: %r%s", elapsed_ms, statement, parameters,
+                           f"\nQuery plan:\n{plan}" if plan else '')
+
+    def query_plan(self, conn, statement, parameters):
+        """
+        Return the query plan of a statement as text, or None if it cannot be explained.
+
+        The plan is read through the raw DBAPI cursor, so it is not audited itself.
+        """
+        if not statement.lstrip().upper().startswith(('SELECT', 'WITH', 'UPDATE', 'DELETE')):
+            return None
+        prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            return '\n'.join(' | '.join(str(column) for column in row) for row in cursor.fetchall())
+        except Exception as e:
+            return f'(plan unavailable: {e})'
+        finally:
+            cursor.close()
+
+    def check_request(self, response):
+        """
+        Log the statements repeated often enough in the current request to look like N+1.
+
+        Args:
+            response (Response): The response, returned unchanged.
+
+        Returns:
+            Response: The same response.
+        """
+        counts = g.pop('audit_statements', None) or {}
+        for statement, count in counts.items():
+            if count >= self.repeat_threshold:
+                logger.warning("Possible N+1 in %s %s: %d executions of %s",
+                               request.method, request.endpoint or request.path, count, statement)
+        return response
+
+
+def init_query_audit(app, engine):
+    """
+    Enable the slow-query log and N+1 detection when `QUERY_AUDIT_ENABLED` is set.
+
+    Reads `SLOW_QUERY_MS`, `QUERY_REPEAT_THRESHOLD` and `QUERY_AUDIT_EXPLAIN`. Meant for
+    development and staging: with the audit disabled no listener is installed.
+
+    Args:
+        app (Flask): The Flask application instance.
+        engine (Engine): The SQLAlchemy engine to audit.
+
+    Returns:
+        QueryAudit: The installed auditor, or None if the audit is disabled.
+    """
+    if not app.config.get('QUERY_AUDIT_ENABLED'):
+        return None
+    audit = QueryAudit(
+        slow_query_ms=app.config.get('SLOW_QUERY_MS', DEFAULT_SLOW_QUERY_MS),
+        repeat_threshold=app.config.get('QUERY_REPEAT_THRESHOLD', DEFAULT_REPEAT_THRESHOLD),
+        explain=app.config.get('QUERY_AUDIT_EXPLAIN', True),
+    )
+    event.listen(engine, 'before_cursor_execute', audit.before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', audit.after_cursor_execute)
+    app.after_request(audit.check_request)
+    return audit
+
+
+@contextmanager
+def capture_queries(engine):
+    """
+    Record every SQL statement executed on `engine` inside the `with` block.
+
+    Example:
+        with capture_queries(db.engine) as statements:
+            client.get('/tasks/dashboard')
+        assert len(statements) <= 3
+
+    Args:
+        engine (Engine): The SQLAlchemy engine to watch.
+
+    Yields:
+        list[str]: The executed statements, filled in as they run.
+    """
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'after_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'after_cursor_execute', record)
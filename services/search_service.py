@@ -0,0 +1,202 @@
+import re
+from models.models import db, Task
+from sqlalchemy import text, or_, and_, bindparam, delete, table, column
+
+DEFAULT_SEARCH_PAGE_SIZE = 20
+# Peso del título frente a la descripción en el ranking bm25
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+# Disponibilidad del índice FTS5, por URL de la base de datos
+_fts_available = {}
+# El índice FTS5 para las sentencias construidas con SQLAlchemy
+_task_fts = table('task_fts', column('rowid'))
+
+
+def _tokens(query):
+    return _TOKEN_RE.findall(query or '')
+
+
+def build_match_query(query):
+    """
+    Turn free text typed by a user into a safe FTS5 MATCH expression.
+
+    Every word is quoted, so FTS5 operators and punctuation in the input are treated as
+    text, and gets a `*` suffix for prefix matching. All words must match.
+
+    Args:
+        query (str): The text typed by the user.
+
+    Returns:
+        str: The MATCH expression, or None if the text contains no words.
+    """
+    tokens = _tokens(query)
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def fts_available():
+    """
+    Check whether the `task_fts` full-text index exists in the current database.
+
+    Only SQLite has it; other databases use the LIKE fallback of `search_tasks`.
+
+    Returns:
+        bool: True if the FTS5 index can be used.
+    """
+    engine = db.engine
+    key = str(engine.url)
+    if key not in _fts_available:
+        available = False
+        if engine.dialect.name == 'sqlite':
+            with engine.connect() as connection:
+                available = connection.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'task_fts'"
+                )).first() is not None
+        _fts_available[key] = available
+    return _fts_available[key]
+
+
+def index_task(task):
+    """
+    Add or replace a task in the full-text index, inside the current transaction.
+
+    The task must already have an id (call `db.session.flush()` for new tasks).
+
+    Args:
+        task (Task): The task to index.
+
+    Returns:
+        None
+    """
+    if not fts_available():
+        return
+    db.session.execute(text("DELETE FROM task_fts WHERE rowid = :id"), {'id': task.id})
+    db.session.execute(
+        text("INSERT INTO task_fts (rowid, title, description, user_id) "
+             "VALUES (:id, :title, :description, :user_id)"),
+        {'id': task.id, 'title': task.title, 'description': task.description or '', 'user_id': task.user_id}
+    )
+
+
+def index_tasks(task_ids):
+    """
+    Add many newly inserted tasks to the full-text index with one statement, inside
+    the current transaction.
+
+    Args:
+        task_ids (list[int]): The ids of the tasks, which must not be indexed yet.
+
+    Returns:
+        None
+    """
+    if not task_ids or not fts_available():
+        return
+    db.session.execute(
+        text("INSERT INTO task_fts (rowid, title, description, user_id) "
+             "SELECT id, title, coalesce(description, ''), user_id FROM task WHERE id IN :ids")
+        .bindparams(bindparam('ids', expanding=True)),
+        {'ids': list(task_ids)}
+    )
+
+
+def remove_task(task_id):
+    """
+    Remove a task from the full-text index, inside the current transaction.
+
+    Args:
+        task_id (int): The id of the removed task.
+
+    Returns:
+        None
+    """
+    if fts_available():
+        db.session.execute(text("DELETE FROM task_fts WHERE rowid = :id"), {'id': task_id})
+
+
+def remove_tasks(task_ids):
+    """
+    Remove many tasks from the full-text index with one statement, inside the current
+    transaction.
+
+    Args:
+        task_ids (Select): A query selecting the ids of the removed tasks.
+
+    Returns:
+        None
+    """
+    if fts_available():
+        db.session.execute(delete(_task_fts).where(_task_fts.c.rowid.in_(task_ids)))
+
+
+def rebuild_index():
+    """
+    Rebuild the full-text index from the task table and commit it.
+
+    Used after importing data or to repair an index that got out of sync.
+
+    Returns:
+        int: The number of indexed tasks, or None if the database has no FTS5 index.
+    """
+    _fts_available.pop(str(db.engine.url), None)
+    if not fts_available():
+        return None
+    db.session.execute(text("DELETE FROM task_fts"))
+    db.session.execute(text(
+        "INSERT INTO task_fts (rowid, title, description, user_id) "
+        "SELECT id, title, coalesce(description, ''), user_id FROM task WHERE deleted_at IS NULL"
+    ))
+    db.session.execute(text("INSERT INTO task_fts (task_fts) VALUES ('optimize')"))
+    db.session.commit()
+    return db.session.execute(text("SELECT count(*) FROM task_fts")).scalar()
+
+
+def search_tasks(user, query, page=1, per_page=DEFAULT_SEARCH_PAGE_SIZE):
+    """
+    Search a user's tasks by title and description.
+
+    With the FTS5 index, results are ranked by bm25 (title matches weigh more than
+    description matches) and every word is matched as a prefix. Without it, tasks whose
+    title or description contain every word are returned in priority order.
+
+    Args:
+        user (User): The user whose tasks are searched.
+        query (str): The text typed by the user.
+        page (int): The 1-based page number.
+        per_page (int): Maximum number of tasks per page.
+
+    Returns:
+        tuple[list, bool]: The tasks of the page and whether there is a next page.
+    """
+    tokens = _tokens(query)
+    if not tokens:
+        return [], False
+    page = max(page, 1)
+    offset = (page - 1) * per_page
+
+    if not fts_available():
+        conditions = []
+        for token in tokens:
+            pattern = '%' + token.replace('_', r'\_') + '%'
+            conditions.append(or_(Task.title.ilike(pattern, escape='\\'),
+                                  Task.description.ilike(pattern, escape='\\')))
+        tasks = (Task.query.filter(Task.user_id == user.id, Task.live(), and_(*conditions))
+                 .order_by(Task.priority, Task.id).offset(offset).limit(per_page + 1).all())
+        return tasks[:per_page], len(tasks) > per_page
+
+    ids = db.session.execute(
+        text("SELECT task.id FROM task_fts JOIN task ON task.id = task_fts.rowid "
+             "WHERE task_fts MATCH :match AND task.user_id = :user_id "
+             "ORDER BY bm25(task_fts, :title_weight, :description_weight), task.id "
+             "LIMIT :limit OFFSET :offset"),
+        {'match': build_match_query(query), 'user_id': user.id, 'limit': per_page + 1, 'offset': offset,
+         'title_weight': TITLE_WEIGHT, 'description_weight': DESCRIPTION_WEIGHT}
+    ).scalars().all()
+    has_next = len(ids) > per_page
+    ids = ids[:per_page]
+
+    # Recuperar las tareas conservando el orden del ranking
+    tasks = {task.id: task for task in Task.query.filter(Task.id.in_(ids), Task.live())} if ids else {}
+    return [tasks[task_id] for task_id in ids if task_id in tasks], has_next
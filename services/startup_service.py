@@ -0,0 +1,139 @@
+from models.models import db
+from services.metrics_service import metrics
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Módulos pesados que no deben importarse al arrancar la aplicación
+DEFERRED_MODULES = ('authlib', 'requests')
+
+# Se ejecuta en un intérprete nuevo para medir un arranque en frío real
+STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import app as module
+imported = time.perf_counter()
+application = module.create_app()
+created = time.perf_counter()
+application.test_client().get('/auth/login')
+served = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (served - created) * 1000,
+    'deferred_loaded': sorted(name for name in %r if name in sys.modules),
+}))
+""" % (DEFERRED_MODULES,)
+
+PHASES = ('process_ms', 'import_ms', 'create_app_ms', 'first_request_ms', 'total_ms')
+
+
+def warm_imports():
+    """
+    Import the modules that the app otherwise loads on first use.
+
+    Called in the gunicorn master when the app is preloaded, so every worker inherits
+    them through copy-on-write instead of importing them again on its first OAuth
+    login or CheapShark fetch.
+
+    Returns:
+        list[str]: The names of the imported modules.
+    """
+    import requests  # noqa: F401
+    import services.oauth_client  # noqa: F401
+    return ['requests', 'services.oauth_client']
+
+
+def after_fork(app):
+    """
+    Drop the database connections a worker inherited from the preloading master.
+
+    The pooled connections are discarded without closing them, so the master's own
+    connections stay valid; the worker opens new ones on first use.
+
+    Args:
+        app (Flask): The preloaded Flask application instance.
+
+    Returns:
+        None
+    """
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def measure_startup(runs=5, env=None):
+    """
+    Measure the cold start of the app in `runs` fresh Python processes.
+
+    Each process imports `app`, calls `create_app()` and serves one request to the login
+    page. `process_ms` is the wall time of the whole process, interpreter start and exit
+    included.
+
+    Args:
+        runs (int): Number of processes to start, one after the other.
+        env (dict, optional): Environment of the processes. Defaults to the current one.
+
+    Returns:
+        list[dict]: One sample per run with the duration of each phase in milliseconds
+            and the deferred modules that were loaded anyway (`deferred_loaded`).
+
+    Raises:
+        RuntimeError: If a process fails.
+    """
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], cwd=ROOT_DIR, env=env,
+                                capture_output=True, text=True)
+        elapsed = (time.perf_counter() - started) * 1000
+        if result.returncode != 0:
+            raise RuntimeError(f"El arranque de la aplicación falló:\n{result.stderr}")
+        sample = json.loads(result.stdout.strip().splitlines()[-1])
+        sample['process_ms'] = elapsed
+        sample['total_ms'] = sample['import_ms'] + sample['create_app_ms'] + sample['first_request_ms']
+        samples.append(sample)
+    return samples
+
+
+def summarize_startup(samples):
+    """
+    Return the median and maximum of every startup phase.
+
+    Args:
+        samples (list[dict]): The samples returned by `measure_startup`.
+
+    Returns:
+        dict: Phase names mapped to `{'median_ms', 'max_ms'}`, plus `deferred_loaded`,
+            the deferred modules loaded in any run.
+    """
+    summary = {
+        phase: {
+            'median_ms': round(statistics.median(sample[phase] for sample in samples), 1),
+            'max_ms': round(max(sample[phase] for sample in samples), 1),
+        }
+        for phase in PHASES
+    }
+    summary['deferred_loaded'] = sorted({name for sample in samples for name in sample['deferred_loaded']})
+    return summary
+
+
+def record_worker_startup(started, preloaded):
+    """
+    Record how long a gunicorn worker took from fork to ready to serve, as the
+    `worker_startup_seconds` histogram.
+
+    Args:
+        started (float): `time.monotonic()` right after the fork.
+        preloaded (bool): Whether the app was preloaded in the master.
+
+    Returns:
+        float: The startup time in seconds.
+    """
+    elapsed = time.monotonic() - started
+    metrics.observe('worker_startup_seconds', elapsed, {'preload': str(preloaded).lower()})
+    return elapsed
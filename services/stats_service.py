@@ -0,0 +1,200 @@
+from collections import Counter
+from models.models import db, Task, TaskStat, User
+from services.job_service import job
+from sqlalchemy import select, delete, func, insert, update
+
+# Dialectos con INSERT ... ON CONFLICT DO UPDATE
+_UPSERT_DIALECTS = ('sqlite', 'postgresql')
+
+
+def stat_key(task):
+    """
+    Return the counter a task is counted in.
+
+    Args:
+        task (Task | dict): The task, or its fields.
+
+    Returns:
+        tuple[int, bool]: The task's (priority, is_complete); a NULL state counts as open.
+    """
+    if isinstance(task, dict):
+        return task['priority'], bool(task.get('is_complete'))
+    return task.priority, bool(task.is_complete)
+
+
+def track_change(deltas, before=None, after=None):
+    """
+    Record that a task moved from one counter to another.
+
+    Args:
+        deltas (Counter): The pending changes, keyed by (priority, is_complete).
+        before (tuple[int, bool], optional): The task's key before the change, or None
+            for a new task.
+        after (tuple[int, bool], optional): The task's key after the change, or None
+            for a deleted task.
+
+    Returns:
+        Counter: `deltas`, updated.
+    """
+    if before != after:
+        if before is not None:
+            deltas[before] -= 1
+        if after is not None:
+            deltas[after] += 1
+    return deltas
+
+
+def _upsert(dialect):
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert
+
+
+def adjust_task_stats(user_id, deltas):
+    """
+    Apply changes to a user's task counters inside the current transaction.
+
+    On SQLite and PostgreSQL every counter is changed with a single
+    `INSERT ... ON CONFLICT DO UPDATE`, which adds to the stored count atomically, so
+    concurrent requests never lose an update. Other databases update each counter and
+    insert the missing ones.
+
+    Args:
+        user_id (int): The id of the user whose tasks changed.
+        deltas (Mapping[tuple[int, bool], int]): Changes keyed by (priority, is_complete),
+            as built by `track_change`. Zero changes are ignored.
+
+    Returns:
+        None
+    """
+    rows = [{'user_id': user_id, 'priority': priority, 'is_complete': is_complete, 'count': delta}
+            for (priority, is_complete), delta in sorted(deltas.items()) if delta]
+    if not rows:
+        return
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect in _UPSERT_DIALECTS:
+        statement = _upsert(dialect)(TaskStat).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=['user_id', 'priority', 'is_complete'],
+            set_={'count': TaskStat.count + statement.excluded['count']}
+        )
+        db.session.execute(statement)
+        return
+
+    for row in rows:
+        increment = update(TaskStat).where(
+            TaskStat.user_id == user_id, TaskStat.priority == row['priority'],
+            TaskStat.is_complete == row['is_complete']
+        ).values(count=TaskStat.count + row['count'])
+        if not db.session.execute(increment).rowcount:
+            db.session.execute(insert(TaskStat).values(row))
+
+
+def get_task_stats(user):
+    """
+    Read a user's task counts by priority and completion state.
+
+    Only the user's counters are read (at most one row per priority and state), so the
+    cost does not depend on how many tasks the user has.
+
+    Args:
+        user (User): The user whose statistics are read.
+
+    Returns:
+        dict: 'total', 'open' and 'done' counts, and 'by_priority', which maps each
+            priority the user has tasks with to its 'open', 'done' and 'total' counts.
+    """
+    rows = db.session.execute(
+        select(TaskStat.priority, TaskStat.is_complete, TaskStat.count)
+        .where(TaskStat.user_id == user.id, TaskStat.count != 0)
+        .order_by(TaskStat.priority)
+    )
+    stats = {'total': 0, 'open': 0, 'done': 0, 'by_priority': {}}
+    for priority, is_complete, count in rows:
+        state = 'done' if is_complete else 'open'
+        counts = stats['by_priority'].setdefault(priority, {'open': 0, 'done': 0, 'total': 0})
+        counts[state] += count
+        counts['total'] += count
+        stats[state] += count
+        stats['total'] += count
+    return stats
+
+
+def count_tasks(user_id=None):
+    """
+    Count live tasks by owner, priority and completion state with a SQL `GROUP BY`.
+
+    Args:
+        user_id (int, optional): Only count the tasks of this user.
+
+    Returns:
+        Counter: Task counts keyed by (user_id, priority, is_complete).
+    """
+    is_complete = func.coalesce(Task.is_complete, False)
+    query = select(Task.user_id, Task.priority, is_complete, func.count()).where(Task.live()).group_by(
+        Task.user_id, Task.priority, is_complete
+    )
+    if user_id is not None:
+        query = query.where(Task.user_id == user_id)
+    return Counter({(owner, priority, bool(done)): count
+                    for owner, priority, done, count in db.session.execute(query)})
+
+
+def reconcile_task_stats(user_id=None):
+    """
+    Recompute the task counters from the tasks and fix the ones that drifted.
+
+    Counters normally never drift, since they are changed in the same transaction as the
+    tasks; this repairs them after changes made outside the application (manual SQL,
+    restores) and is cheap enough to run periodically. The task list version of every
+    corrected user is bumped, so pages showing the old counts are not reused.
+
+    The tasks and the counters are read inside one write transaction that starts by
+    locking the users' rows, which every task change also updates, so no task can change
+    between the two reads and be "corrected" into a wrong count.
+
+    Args:
+        user_id (int, optional): Only reconcile the counters of this user.
+
+    Returns:
+        int: The number of counters that were wrong and have been corrected.
+    """
+    # Primero el bloqueo: en SQLite la escritura toma el bloqueo de escritor de la base de
+    # datos; en PostgreSQL/MySQL bloquea las filas que también actualiza bump_task_list_version
+    users = update(User).values(task_version=User.task_version)
+    if user_id is not None:
+        users = users.where(User.id == user_id)
+    db.session.execute(users)
+
+    actual = count_tasks(user_id)
+    query = select(TaskStat.user_id, TaskStat.priority, TaskStat.is_complete, TaskStat.count)
+    if user_id is not None:
+        query = query.where(TaskStat.user_id == user_id)
+    stored = {(owner, priority, bool(done)): count for owner, priority, done, count in db.session.execute(query)}
+
+    wrong = [key for key in actual.keys() | stored.keys() if actual.get(key, 0) != stored.get(key, 0)]
+    for owner, priority, is_complete in wrong:
+        key = (owner, priority, is_complete)
+        if key in stored:
+            db.session.execute(delete(TaskStat).where(
+                TaskStat.user_id == owner, TaskStat.priority == priority, TaskStat.is_complete == is_complete
+            ))
+        if actual.get(key):
+            db.session.execute(insert(TaskStat).values(
+                user_id=owner, priority=priority, is_complete=is_complete, count=actual[key]
+            ))
+    if wrong:
+        owners = {owner for owner, _, _ in wrong}
+        db.session.execute(
+            update(User).where(User.id.in_(owners)).values(task_version=User.task_version + 1)
+        )
+    db.session.commit()
+    return len(wrong)
+
+
+@job('stats.reconcile', every='STATS_RECONCILE_INTERVAL')
+def reconcile_job():
+    reconcile_task_stats()
@@ -0,0 +1,415 @@
+from flask import current_app, Request
+from sqlalchemy.exc import IntegrityError
+from werkzeug.exceptions import RequestEntityTooLarge
+from models.models import db, Attachment, Task, Job, utcnow
+from services.job_service import job, enqueue
+from collections import Counter
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+DEFAULT_MAX_UPLOAD_SIZE = 5 * 1024 * 1024
+DEFAULT_SPOOL_THRESHOLD = 512 * 1024
+DEFAULT_COLLECT_DELAY = 30
+
+
+class UploadSpool:
+    """
+    Writable file used by the form parser to receive one uploaded file.
+
+    Bytes are counted and hashed as they arrive, and the upload is rejected with a 413
+    error as soon as it grows past `limit`, before the rest of the body is read. Small
+    uploads stay in memory; once more than `threshold` bytes arrive the content is moved
+    to a temporary file inside the upload folder, so memory use per upload is bounded by
+    the threshold and the file can later be moved into the store without copying it.
+
+    Attributes:
+        limit (int): Maximum accepted size in bytes.
+        threshold (int): Size in bytes above which the upload is spooled to disk.
+        size (int): Bytes received so far.
+        path (str): Path of the temporary file, or None while the upload is in memory.
+    """
+
+    def __init__(self, limit, threshold, folder):
+        self.limit = limit
+        self.threshold = threshold
+        self.folder = folder
+        self.size = 0
+        self.path = None
+        self._hasher = hashlib.sha256()
+        self._file = io.BytesIO()
+
+    @property
+    def digest(self):
+        """Hex SHA-256 digest of the bytes received so far."""
+        return self._hasher.hexdigest()
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.limit:
+            # El parser no llega a registrar el archivo, así que se limpia aquí
+            self.close()
+            raise RequestEntityTooLarge(f"El archivo supera el límite de {self.limit} bytes.")
+        self._hasher.update(data)
+        if self.path is None and self.size > self.threshold:
+            self._rollover()
+        return self._file.write(data)
+
+    def _rollover(self):
+        os.makedirs(self.folder, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=self.folder, prefix='.upload-')
+        disk_file = os.fdopen(fd, 'w+b')
+        disk_file.write(self._file.getbuffer())
+        self._file = disk_file
+
+    def detach(self):
+        """
+        Close the spool and hand over its temporary file to the caller.
+
+        Returns:
+            str: The path of the temporary file, which the caller must move or delete.
+        """
+        path, self.path = self.path, None
+        self._file.close()
+        return path
+
+    def close(self):
+        self._file.close()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+class StreamingUploadRequest(Request):
+    """
+    Request class that receives uploaded files into bounded `UploadSpool` objects.
+
+    The size limit comes from `MAX_UPLOAD_SIZE` and the in-memory threshold from
+    `UPLOAD_SPOOL_THRESHOLD`. Views marked with `content_limit` accept request bodies
+    up to their own setting instead of `MAX_CONTENT_LENGTH`.
+    """
+
+    @property
+    def max_content_length(self):
+        view = current_app.view_functions.get(self.endpoint) if current_app and self.endpoint else None
+        setting = getattr(view, 'content_limit', None)
+        if setting:
+            return current_app.config.get(setting)
+        return super().max_content_length
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        config = current_app.config
+        return UploadSpool(
+            limit=config.get('MAX_UPLOAD_SIZE', DEFAULT_MAX_UPLOAD_SIZE),
+            threshold=config.get('UPLOAD_SPOOL_THRESHOLD', DEFAULT_SPOOL_THRESHOLD),
+            folder=config['UPLOAD_FOLDER']
+        )
+
+
+def content_limit(setting):
+    """
+    Mark a view as accepting request bodies up to `config[setting]` bytes instead of
+    `MAX_CONTENT_LENGTH` (for example bulk imports streamed from the request body).
+
+    Apply it below `login_required` so the mark is copied to the wrapper.
+
+    Args:
+        setting (str): Name of the config setting holding the limit in bytes.
+
+    Returns:
+        Callable: The decorator.
+    """
+    def decorator(view):
+        view.content_limit = setting
+        return view
+    return decorator
+
+
+def upload_path(filename):
+    """
+    Build the absolute path of a stored upload.
+
+    Args:
+        filename (str): The stored filename, relative to the upload folder.
+
+    Returns:
+        str: The absolute path inside the configured `UPLOAD_FOLDER`.
+    """
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+
+
+def blob_name(digest, extension):
+    """
+    Build the content-addressed filename of an upload.
+
+    Files are fanned out in sub-folders named after the first two hex digits of the
+    digest, so no single folder grows too large.
+
+    Args:
+        digest (str): Hex SHA-256 digest of the content.
+        extension (str): File extension, without the dot.
+
+    Returns:
+        str: The stored filename, e.g. 'ab/ab12...ef.png'.
+    """
+    return f"{digest[:2]}/{digest}.{extension.lower()}"
+
+
+def _spool_and_hash(stream, folder, limit):
+    """Copy a stream into a temporary file in `folder`, hashing it chunk by chunk."""
+    spool = UploadSpool(limit=limit, threshold=0, folder=folder)
+    try:
+        for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+            spool.write(chunk)
+        if spool.path is None:
+            spool._rollover()
+    except BaseException:
+        spool.close()
+        raise
+    return spool.digest, spool.size, spool.detach()
+
+
+def _add_reference(digest, filename, size):
+    """Increment the reference count of a blob, creating its row if needed."""
+    increment = db.update(Attachment).where(Attachment.sha256 == digest).values(
+        ref_count=Attachment.ref_count + 1
+    )
+    if db.session.execute(increment).rowcount:
+        return db.session.get(Attachment, digest)
+    try:
+        with db.session.begin_nested():
+            attachment = Attachment(sha256=digest, filename=filename, size=size, ref_count=1)
+            db.session.add(attachment)
+        return attachment
+    except IntegrityError:
+        # Otra petición creó la fila a la vez
+        db.session.execute(increment)
+        return db.session.get(Attachment, digest)
+
+
+def store_upload(file, extension):
+    """
+    Store an uploaded file in the content-addressed store and take a reference to it.
+
+    Files received through `StreamingUploadRequest` were already hashed while they
+    arrived: if a blob with the same SHA-256 exists nothing is written at all, and a new
+    blob spooled to disk is moved into place without copying it. Other streams are
+    hashed while they are copied to a temporary file. The reference count change is
+    added to the current database session and is committed by the caller.
+
+    Args:
+        file (FileStorage): The uploaded file object.
+        extension (str): The extension to give the stored file if it is new.
+
+    Returns:
+        str: The stored filename, relative to the upload folder.
+
+    Raises:
+        RequestEntityTooLarge: If the file is larger than `MAX_UPLOAD_SIZE`.
+    """
+    folder = current_app.config['UPLOAD_FOLDER']
+    os.makedirs(folder, exist_ok=True)
+    stream = file.stream
+    if isinstance(stream, UploadSpool):
+        digest, size = stream.digest, stream.size
+    else:
+        limit = current_app.config.get('MAX_UPLOAD_SIZE', DEFAULT_MAX_UPLOAD_SIZE)
+        digest, size, temp_path = _spool_and_hash(stream, folder, limit)
+        stream = None
+
+    try:
+        attachment = _add_reference(digest, blob_name(digest, extension), size)
+        final_path = upload_path(attachment.filename)
+        if os.path.exists(final_path):
+            return attachment.filename
+
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        if stream is not None:
+            if stream.path is None:
+                stream._rollover()
+            temp_path = stream.detach()
+        os.replace(temp_path, final_path)
+        temp_path = None
+        return attachment.filename
+    finally:
+        if stream is None and temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def release_uploads(filenames):
+    """
+    Drop references to stored uploads, without touching the files.
+
+    Files nobody references any more are removed later by `collect_unreferenced_uploads`,
+    so requests never wait for file deletions. It runs in every sweep and, when a
+    `flask worker` runs the jobs (`SWEEPER_THREAD` off), in the 'uploads.collect' job
+    queued here. With the sweeper thread on no job is queued, since nothing would claim
+    it: the next sweep collects the files. The reference count changes and the job are
+    added to the current database session and are committed by the caller.
+
+    Releases are grouped in windows of `UPLOAD_COLLECT_DELAY` seconds with one job each,
+    due when its window closes. A job therefore only starts once its window is over, and
+    uploads released while it runs belong to a later window with a job of its own.
+
+    Args:
+        filenames (Iterable[str]): The stored filenames, relative to the upload folder,
+            once per dropped reference.
+
+    Returns:
+        None
+    """
+    released = Counter(filter(None, filenames))
+    for filename, count in sorted(released.items()):
+        db.session.execute(
+            db.update(Attachment).where(Attachment.filename == filename).values(
+                ref_count=Attachment.ref_count - count
+            )
+        )
+    if released:
+        _schedule_collection()
+
+
+def _schedule_collection():
+    if current_app.config.get('SWEEPER_THREAD', True):
+        # Sin `flask worker` nadie reclamaría el trabajo; el barrido recoge los archivos
+        return
+    window = current_app.config.get('UPLOAD_COLLECT_DELAY', DEFAULT_COLLECT_DELAY)
+    if window <= 0:
+        enqueue('uploads.collect')
+        return
+    now = time.time()
+    slot = int(now // window)
+    enqueue('uploads.collect', key=f'uploads.collect:{slot}', delay=(slot + 1) * window - now)
+
+
+def release_upload(filename):
+    """
+    Drop one reference to a stored upload; see `release_uploads`.
+
+    Args:
+        filename (str): The stored filename, relative to the upload folder.
+
+    Returns:
+        None
+    """
+    release_uploads([filename])
+
+
+def collect_unreferenced_uploads(min_age=3600, batch_size=500):
+    """
+    Delete the stored uploads that no task references any more, and commit.
+
+    Blobs whose reference count dropped to zero are deleted row first and file second
+    inside the same transaction, so an upload of the same content at the same time
+    either keeps the row alive or waits and then stores the file again. The row deletion
+    is only committed once its file is gone: if the file cannot be deleted the row is kept
+    (and left for the next run), and a crash before the commit keeps it as well, so a
+    file is never left behind without the row that leads back to it. Files in the
+    upload folder that have no attachment row and no task pointing at them (uploads
+    stored before the content-addressed store existed, or temporary files of aborted
+    uploads; other hidden files are kept) are deleted once they are older than `min_age` seconds, which leaves
+    uploads in progress alone. The files found in the folder are looked up in the database
+    `batch_size` at a time, so memory use does not grow with the size of the store.
+    Due 'uploads.collect' jobs that are still waiting are dropped first, since this run
+    does what they were queued for.
+
+    Args:
+        min_age (float): Seconds an unknown file must be left untouched before it is
+            deleted.
+        batch_size (int): Blobs deleted per transaction, and files looked up per query.
+
+    Returns:
+        int: The number of deleted files.
+    """
+    db.session.execute(db.delete(Job).where(Job.name == 'uploads.collect', Job.status == 'queued',
+                                           Job.run_at <= utcnow()))
+    deleted = 0
+    kept = set()
+    while True:
+        unreferenced = db.session.execute(
+            db.select(Attachment.sha256, Attachment.filename)
+            .where(Attachment.ref_count <= 0, Attachment.sha256.not_in(kept))
+            .limit(batch_size)
+        ).all()
+        if not unreferenced:
+            break
+        for digest, filename in unreferenced:
+            try:
+                with db.session.begin_nested():
+                    removed = db.session.execute(
+                        db.delete(Attachment).where(Attachment.sha256 == digest, Attachment.ref_count <= 0)
+                    ).rowcount
+                    if removed and _remove_file(upload_path(filename)):
+                        deleted += 1
+            except OSError as e:
+                # Se deshace el borrado de la fila: el archivo se vuelve a intentar en la próxima pasada
+                logger.warning("Could not delete upload %s: %s", filename, e)
+                kept.add(digest)
+        db.session.commit()
+
+    folder = current_app.config['UPLOAD_FOLDER']
+    if not os.path.isdir(folder):
+        return deleted
+    cutoff = time.time() - min_age
+    candidates = {}
+    for directory, _, names in os.walk(folder):
+        for name in names:
+            # Se conservan los archivos ocultos (.gitkeep) salvo los temporales de subidas
+            if name.startswith('.') and not name.startswith('.upload-'):
+                continue
+            path = os.path.join(directory, name)
+            if _modified_at(path) > cutoff:
+                continue
+            candidates[os.path.relpath(path, folder).replace(os.sep, '/')] = path
+            if len(candidates) >= batch_size:
+                deleted += _remove_unknown_files(candidates)
+    return deleted + _remove_unknown_files(candidates)
+
+
+def _remove_unknown_files(candidates):
+    # Sólo se consulta la base de datos por los archivos encontrados, de un lote en un lote
+    if not candidates:
+        return 0
+    names = list(candidates)
+    known = set(db.session.execute(db.select(Attachment.filename).where(Attachment.filename.in_(names))).scalars())
+    known.update(db.session.execute(db.select(Task.image).where(Task.image.in_(names))).scalars())
+    db.session.commit()
+    deleted = 0
+    for filename, path in candidates.items():
+        if filename in known:
+            continue
+        try:
+            deleted += _remove_file(path)
+        except OSError as e:
+            logger.warning("Could not delete upload %s: %s", filename, e)
+    candidates.clear()
+    return deleted
+
+
+@job('uploads.collect')
+def collect_uploads_job():
+    collect_unreferenced_uploads(current_app.config['UPLOAD_GC_MIN_AGE'])
+
+
+def _modified_at(path):
+    try:
+        return os.path.getmtime(path)
+    except FileNotFoundError:
+        return float('inf')
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
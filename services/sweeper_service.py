@@ -0,0 +1,202 @@
+from datetime import timedelta
+from flask import current_app
+from models.models import db, Task, utcnow
+from services.job_service import job
+from services.storage_service import release_uploads, collect_unreferenced_uploads
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SWEEP_INTERVAL = 300
+DEFAULT_PURGE_AFTER = 3600
+DEFAULT_PURGE_BATCH_SIZE = 500
+DEFAULT_UPLOAD_MIN_AGE = 3600
+
+
+def purge_deleted_tasks(older_than=DEFAULT_PURGE_AFTER, batch_size=DEFAULT_PURGE_BATCH_SIZE):
+    """
+    Permanently delete the tasks soft deleted more than `older_than` seconds ago.
+
+    Tasks are purged in batches, each committed on its own together with the release of
+    their images, so the database is never locked for long. The files themselves are
+    deleted afterwards by `collect_unreferenced_uploads`.
+
+    Args:
+        older_than (float): Seconds a deleted task is kept before it is purged.
+        batch_size (int): Tasks purged per transaction.
+
+    Returns:
+        int: The number of purged tasks.
+    """
+    cutoff = utcnow() - timedelta(seconds=older_than)
+    purged = 0
+    while True:
+        rows = db.session.execute(
+            db.select(Task.id, Task.image)
+            .where(Task.deleted_at.is_not(None), Task.deleted_at <= cutoff)
+            .order_by(Task.deleted_at)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return purged
+        release_uploads(image for _, image in rows)
+        db.session.execute(db.delete(Task).where(Task.id.in_([task_id for task_id, _ in rows])))
+        db.session.commit()
+        purged += len(rows)
+
+
+def sweep(purge_after=DEFAULT_PURGE_AFTER, upload_min_age=DEFAULT_UPLOAD_MIN_AGE,
+          batch_size=DEFAULT_PURGE_BATCH_SIZE):
+    """
+    Purge old soft deleted tasks and delete the uploads nobody references any more.
+
+    Args:
+        purge_after (float): Seconds a deleted task is kept before it is purged.
+        upload_min_age (float): Seconds an unknown file in the upload folder is left
+            untouched before it is deleted.
+        batch_size (int): Rows handled per transaction.
+
+    Returns:
+        dict: The number of 'purged_tasks' and 'deleted_files'.
+    """
+    return {
+        'purged_tasks': purge_deleted_tasks(purge_after, batch_size),
+        'deleted_files': collect_unreferenced_uploads(upload_min_age, batch_size),
+    }
+
+
+class Sweeper:
+    """
+    Background thread that runs `sweep` every `interval` seconds in each process.
+
+    The thread is started by the first request a process handles, so it also runs in
+    gunicorn workers forked from a preloaded master. Running it in several processes at
+    once is safe: every step only deletes rows that still match its conditions. When a
+    `flask worker` runs the periodic 'tasks.sweep' job instead, turn the thread off with
+    `SWEEPER_THREAD`.
+
+    Attributes:
+        interval (float): Seconds between sweeps; 0 disables the thread.
+        purge_after (float): Seconds a deleted task is kept before it is purged.
+        upload_min_age (float): Seconds an unknown upload is left untouched.
+        totals (dict): Tasks purged and files deleted by this process so far.
+    """
+
+    def __init__(self, interval=DEFAULT_SWEEP_INTERVAL, purge_after=DEFAULT_PURGE_AFTER,
+                 upload_min_age=DEFAULT_UPLOAD_MIN_AGE):
+        self.interval = interval
+        self.purge_after = purge_after
+        self.upload_min_age = upload_min_age
+        self.totals = {'purged_tasks': 0, 'deleted_files': 0}
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def configure(self, interval=None, purge_after=None, upload_min_age=None):
+        if interval is not None:
+            self.interval = interval
+        if purge_after is not None:
+            self.purge_after = purge_after
+        if upload_min_age is not None:
+            self.upload_min_age = upload_min_age
+
+    def run_once(self, app):
+        """
+        Run one sweep in an application context, logging instead of raising errors.
+
+        Args:
+            app (Flask): The Flask application instance.
+
+        Returns:
+            dict: The sweep report, or None if it failed.
+        """
+        with app.app_context():
+            try:
+                report = sweep(self.purge_after, self.upload_min_age)
+            except Exception:
+                db.session.rollback()
+                logger.exception('Sweep failed')
+                return None
+            finally:
+                db.session.remove()
+        self.record(report)
+        return report
+
+    def record(self, report):
+        """Add a sweep report to the totals of this process and log it."""
+        with self._lock:
+            for key, value in report.items():
+                self.totals[key] += value
+        if any(report.values()):
+            logger.info('Sweep purged %(purged_tasks)d tasks and deleted %(deleted_files)d files', report)
+
+    def start(self, app):
+        """
+        Start the sweeper thread of the current process, if it is not running yet.
+
+        Args:
+            app (Flask): The Flask application instance.
+
+        Returns:
+            None
+        """
+        if self.interval <= 0 or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+
+        def run():
+            while True:
+                time.sleep(self.interval)
+                self.run_once(app)
+
+        threading.Thread(target=run, name='sweeper', daemon=True).start()
+
+
+sweeper = Sweeper()
+
+
+@job('tasks.sweep', every='SWEEP_INTERVAL')
+def sweep_job():
+    config = current_app.config
+    sweeper.record(sweep(config['PURGE_DELETED_AFTER'], config['UPLOAD_GC_MIN_AGE']))
+
+
+def init_sweeper(app):
+    """
+    Configure the background sweeper from the `SWEEP_INTERVAL`, `PURGE_DELETED_AFTER`
+    and `UPLOAD_GC_MIN_AGE` settings and start it with the first request of each
+    process. It is not started while testing or when `SWEEPER_THREAD` is off.
+
+    Args:
+        app (Flask): The Flask application instance.
+
+    Returns:
+        None
+    """
+    sweeper.configure(interval=app.config.get('SWEEP_INTERVAL'),
+                      purge_after=app.config.get('PURGE_DELETED_AFTER'),
+                      upload_min_age=app.config.get('UPLOAD_GC_MIN_AGE'))
+
+    if not app.config.get('SWEEPER_THREAD', True):
+        return
+
+    @app.before_request
+    def start_sweeper():
+        if not app.testing:
+            sweeper.start(app)
+
+
+def sweeper_collector():
+    """
+    Export the sweeper totals of this process as `sweeper_purged_tasks_total` and
+    `sweeper_deleted_files_total`.
+
+    Returns:
+        list[tuple]: `(name, labels, value)` samples for `MetricsRegistry.register_collector`.
+    """
+    return [(f'sweeper_{key}_total', {}, value) for key, value in sweeper.totals.items()]
@@ -1,10 +1,50 @@
-from werkzeug.utils import secure_filename
-from models.models import db, Task
-from flask import flash
-import os
+from models.models import db, Task, User, utcnow
+from services.storage_service import store_upload, release_upload, DEFAULT_MAX_UPLOAD_SIZE
+from services.search_service import index_task, remove_task, remove_tasks
+from services.cache_service import LRUCache
+from services.stats_service import stat_key, track_change, adjust_task_stats
+from collections import Counter
+from flask import flash, current_app
+from werkzeug.exceptions import RequestEntityTooLarge
+from sqlalchemy import or_, and_, select, update, func, bindparam
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf'}
-MAX_FILE_SIZE = 5 * 1024 * 1024
+MAX_FILE_SIZE = DEFAULT_MAX_UPLOAD_SIZE
+DEFAULT_PAGE_SIZE = 50
+PRIORITIES = (1, 2, 3, 4)
+TITLE_MAX_LENGTH = 100
+BATCH_OPERATIONS = ('create', 'update', 'toggle', 'delete')
+
+# Fragmentos HTML renderizados del listado de tareas; las claves empiezan por el id del usuario
+task_list_fragments = LRUCache(maxsize=512, ttl=600)
+
+
+def init_fragment_cache(app):
+    """
+    Configure the task list fragment cache from the `FRAGMENT_CACHE_SIZE` and
+    `FRAGMENT_CACHE_TTL` settings.
+
+    Args:
+        app (Flask): The Flask application instance.
+
+    Returns:
+        None
+    """
+    task_list_fragments.configure(maxsize=app.config.get('FRAGMENT_CACHE_SIZE'),
+                                  ttl=app.config.get('FRAGMENT_CACHE_TTL'))
+
+
+def invalidate_task_fragments(user_id):
+    """
+    Drop every cached task list fragment of a user.
+
+    Args:
+        user_id (int): The id of the user whose tasks changed.
+
+    Returns:
+        int: The number of dropped fragments.
+    """
+    return task_list_fragments.invalidate_where(lambda key: key[0] == user_id)
 
 
 def allowed_file(filename):
@@ -24,45 +64,45 @@ def validate_and_save_file(file):
     """
     Validate and save an uploaded file to the server.
 
-    This function checks if the file has an allowed extension and is within the size limit.
-    If validation passes, the file is saved in the 'static/uploads' directory.
+    This function checks if the file has an allowed extension. If it does, the file is
+    saved in the content-addressed upload store, so the same content uploaded several
+    times is only stored once. The size limit is enforced while the file is streamed,
+    without buffering or measuring it first.
 
     Args:
         file (FileStorage): The uploaded file object.
 
     Returns:
-        str: The filename if successfully saved, None otherwise.
+        str: The stored filename if successfully saved, None otherwise.
     """
     if not allowed_file(file.filename):
         flash("Archivo no permitido. Sólo se aceptan imágenes.", "error")
         return None
 
-    file.seek(0, os.SEEK_END)
-    file_length = file.tell()
-    if file_length > MAX_FILE_SIZE:
-        flash(f"El archivo es demasiado grande. Límite: {MAX_FILE_SIZE // (1024 * 1024)} MB.", "error")
+    extension = file.filename.rsplit('.', 1)[1].lower()
+    try:
+        return store_upload(file, extension)
+    except RequestEntityTooLarge:
+        limit = current_app.config.get('MAX_UPLOAD_SIZE', MAX_FILE_SIZE)
+        flash(f"El archivo es demasiado grande. Límite: {limit // (1024 * 1024)} MB.", "error")
         return None
 
-    file.seek(0)
-    filename = secure_filename(file.filename)
-    file.save(os.path.join('static/uploads', filename))
-    return filename
-
 
 def delete_old_file(filename):
     """
-    Delete an old file from the server storage.
+    Release a task's reference to a stored file.
+
+    The file is not removed here: the background sweeper deletes it once no task
+    references it.
 
     Args:
-        filename (str): The name of the file to be deleted.
+        filename (str): The stored filename to release.
 
     Returns:
         None
     """
     if filename:
-        old_file_path = os.path.join('static/uploads', filename)
-        if os.path.exists(old_file_path):
-            os.remove(old_file_path)
+        release_upload(filename)
 
 
 def get_tasks_by_user(user):
@@ -75,7 +115,112 @@ def get_tasks_by_user(user):
     Returns:
         list: A list of Task objects belonging to the specified user, sorted by priority.
     """
-    return Task.query.filter_by(owner=user).order_by(Task.priority).all()
+    return Task.query.filter(Task.user_id == user.id, Task.live()).order_by(Task.priority).all()
+
+
+def get_task_list_version(user):
+    """
+    Return the current version of a user's task list.
+
+    The version is read from the database on every call (and not from the cached user)
+    so every worker process sees the changes made by the others.
+
+    Args:
+        user (User): The user whose task list version is read.
+
+    Returns:
+        int: The version, increased by every change to the user's tasks.
+    """
+    return db.session.execute(select(User.task_version).where(User.id == user.id)).scalar() or 0
+
+
+def bump_task_list_version(user_id):
+    """
+    Increase a user's task list version inside the current transaction.
+
+    The user's cached task list fragments are dropped as well. Fragments are keyed by
+    version, so those cached by other worker processes are simply never used again.
+
+    Args:
+        user_id (int): The id of the user whose tasks changed.
+
+    Returns:
+        None
+    """
+    db.session.execute(
+        update(User).where(User.id == user_id).values(task_version=User.task_version + 1)
+    )
+    invalidate_task_fragments(user_id)
+
+
+def encode_cursor(task):
+    """
+    Build the pagination cursor that points just after a task.
+
+    Args:
+        task (Task): The last task of a page.
+
+    Returns:
+        str: The cursor, in the form '<priority>-<id>'.
+    """
+    return f"{task.priority}-{task.id}"
+
+
+def decode_cursor(cursor):
+    """
+    Parse a pagination cursor created by `encode_cursor`.
+
+    Args:
+        cursor (str): The cursor to parse.
+
+    Returns:
+        tuple[int, int]: The (priority, id) position the cursor points after.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    priority, task_id = cursor.split('-')
+    return int(priority), int(task_id)
+
+
+def get_task_page(user, is_complete=None, priority=None, after=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Retrieve one page of a user's tasks, filtered and sorted by priority in SQL.
+
+    Pages use keyset pagination on (priority, id): instead of an offset, each page starts
+    right after the position encoded in the previous page's cursor, so the cost of a page
+    depends on its size and not on how many tasks the user has.
+
+    Args:
+        user (User): The user whose tasks are listed.
+        is_complete (bool, optional): Only return tasks with this completion state.
+        priority (int, optional): Only return tasks with this priority.
+        after (str, optional): Cursor returned with the previous page.
+        limit (int): Maximum number of tasks in the page.
+
+    Returns:
+        tuple[list, str]: The tasks of the page and the cursor of the next page,
+            or None as cursor if this is the last page.
+
+    Raises:
+        ValueError: If `after` is not a valid cursor.
+    """
+    query = Task.query.filter(Task.user_id == user.id, Task.live())
+    if is_complete is not None:
+        query = query.filter(Task.is_complete == is_complete)
+    if priority is not None:
+        query = query.filter(Task.priority == priority)
+    if after:
+        after_priority, after_id = decode_cursor(after)
+        query = query.filter(or_(
+            Task.priority > after_priority,
+            and_(Task.priority == after_priority, Task.id > after_id)
+        ))
+
+    tasks = query.order_by(Task.priority, Task.id).limit(limit + 1).all()
+    if len(tasks) > limit:
+        return tasks[:limit], encode_cursor(tasks[limit - 1])
+    return tasks, None
 
 
 def create_task(form, user):
@@ -89,7 +234,7 @@ def create_task(form, user):
         user (User): The user who owns the task.
 
     Returns:
-        None
+        Task: The created task.
     """
     filename = None
     if form.image.data:
@@ -99,11 +244,33 @@ def create_task(form, user):
         title=form.title.data,
         description=form.description.data,
         priority=form.priority.data,
-        owner=user,
+        user_id=user.id,
         image=filename
     )
     db.session.add(new_task)
+    db.session.flush()
+    index_task(new_task)
+    adjust_task_stats(user.id, track_change(Counter(), after=stat_key(new_task)))
+    bump_task_list_version(user.id)
     db.session.commit()
+    return new_task
+
+
+def get_user_task(task_id, user):
+    """
+    Load a live task of a user.
+
+    Args:
+        task_id (int): The ID of the task.
+        user (User): The user who must own the task.
+
+    Returns:
+        Task: The task, or None if it does not exist, was deleted or belongs to another user.
+    """
+    task = db.session.get(Task, task_id)
+    if task is None or task.user_id != user.id or task.deleted_at is not None:
+        return None
+    return task
 
 
 def update_task(task_id, user, form=None):
@@ -120,20 +287,25 @@ def update_task(task_id, user, form=None):
     Returns:
         Task: The updated task object, or None if the user is not the owner of the task.
     """
-    task = db.session.get(Task, task_id)
-    if task.owner != user:
+    task = get_user_task(task_id, user)
+    if task is None:
         return None
 
     if form:
+        before = stat_key(task)
         task.title = form.title.data
         task.description = form.description.data
         task.priority = form.priority.data
 
         if form.image.data:
             new_filename = validate_and_save_file(form.image.data)
-            delete_old_file(task.image)
-            task.image = new_filename
+            if new_filename:
+                delete_old_file(task.image)
+                task.image = new_filename
 
+        index_task(task)
+        adjust_task_stats(user.id, track_change(Counter(), before, stat_key(task)))
+        bump_task_list_version(user.id)
         db.session.commit()
     return task
 
@@ -149,9 +321,235 @@ def toggle_task_completion(task_id, user):
         user (User): The user attempting to toggle the completion status of the task.
 
     Returns:
-        None
+        Task: The updated task, or None if it does not exist or the user is not its owner.
     """
-    task = db.session.get(Task, task_id)
-    if task and task.owner == user:
-        task.is_complete = not task.is_complete
+    task = get_user_task(task_id, user)
+    if task is None:
+        return None
+    before = stat_key(task)
+    task.is_complete = not task.is_complete
+    adjust_task_stats(user.id, track_change(Counter(), before, stat_key(task)))
+    bump_task_list_version(user.id)
+    db.session.commit()
+    return task
+
+
+def delete_task(task_id, user):
+    """
+    Soft delete a task.
+
+    The task is only marked as deleted: it disappears from every listing, search and
+    count at once, and the background sweeper purges it and releases its image later.
+
+    Args:
+        task_id (int): The ID of the task to delete.
+        user (User): The user attempting to delete the task.
+
+    Returns:
+        Task: The deleted task, or None if it does not exist or the user is not its owner.
+    """
+    task = get_user_task(task_id, user)
+    if task is None:
+        return None
+    task.deleted_at = utcnow()
+    remove_task(task.id)
+    adjust_task_stats(user.id, track_change(Counter(), stat_key(task)))
+    bump_task_list_version(user.id)
+    db.session.commit()
+    return task
+
+
+def delete_tasks(user, task_ids=None, is_complete=None):
+    """
+    Soft delete many tasks of a user with a fixed number of statements.
+
+    The tasks are marked as deleted with a single UPDATE, their counters are adjusted
+    from one `GROUP BY` and they are removed from the search index with one DELETE, so
+    deleting a whole list costs the same few statements for ten tasks or ten thousand.
+    Purging the rows and their files is left to the background sweeper.
+
+    Args:
+        user (User): The user who owns the tasks.
+        task_ids (list[int], optional): Only delete these tasks.
+        is_complete (bool, optional): Only delete tasks with this completion state.
+
+    Returns:
+        int: The number of deleted tasks.
+    """
+    conditions = [Task.user_id == user.id, Task.live()]
+    if task_ids is not None:
+        if not task_ids:
+            return 0
+        conditions.append(Task.id.in_(bindparam('task_ids', list(task_ids), expanding=True)))
+    if is_complete is not None:
+        conditions.append(func.coalesce(Task.is_complete, False) == is_complete)
+
+    state = func.coalesce(Task.is_complete, False)
+    deltas = Counter()
+    for priority, done, count in db.session.execute(
+        select(Task.priority, state, func.count()).where(*conditions).group_by(Task.priority, state)
+    ):
+        deltas[(priority, bool(done))] -= count
+    if not deltas:
+        return 0
+
+    remove_tasks(select(Task.id).where(*conditions))
+    deleted = db.session.execute(
+        update(Task).where(*conditions).values(deleted_at=utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    adjust_task_stats(user.id, deltas)
+    bump_task_list_version(user.id)
+    db.session.commit()
+    return deleted
+
+
+def task_to_dict(task):
+    """
+    Serialize a task for the JSON API.
+
+    Args:
+        task (Task): The task to serialize.
+
+    Returns:
+        dict: The task's id, title, description, priority, completion state and image.
+    """
+    return {
+        'id': task.id,
+        'title': task.title,
+        'description': task.description,
+        'priority': task.priority,
+        'is_complete': bool(task.is_complete),
+        'image': task.image,
+    }
+
+
+def validate_task_fields(data, partial=False):
+    """
+    Validate the task fields of a JSON payload.
+
+    Args:
+        data (dict): The payload, with optional 'title', 'description', 'priority'
+            and 'is_complete' keys.
+        partial (bool): If True, missing fields are allowed (used for updates).
+
+    Returns:
+        dict: The validated fields present in the payload.
+
+    Raises:
+        ValueError: If a field is missing or invalid.
+    """
+    fields = {}
+    if 'title' in data or not partial:
+        title = data.get('title')
+        if not isinstance(title, str) or not title.strip():
+            raise ValueError("'title' is required")
+        if len(title) > TITLE_MAX_LENGTH:
+            raise ValueError(f"'title' must be at most {TITLE_MAX_LENGTH} characters")
+        fields['title'] = title
+    if 'description' in data:
+        description = data['description']
+        if description is not None and not isinstance(description, str):
+            raise ValueError("'description' must be a string")
+        fields['description'] = description
+    if 'priority' in data or not partial:
+        priority = data.get('priority')
+        if isinstance(priority, bool) or priority not in PRIORITIES:
+            raise ValueError(f"'priority' must be one of {list(PRIORITIES)}")
+        fields['priority'] = priority
+    if 'is_complete' in data:
+        if not isinstance(data['is_complete'], bool):
+            raise ValueError("'is_complete' must be a boolean")
+        fields['is_complete'] = data['is_complete']
+    return fields
+
+
+def apply_task_batch(user, operations):
+    """
+    Apply many create, update, toggle and delete operations in a single transaction.
+
+    Every referenced task is loaded with one query, each operation is validated on its
+    own, and all successful operations are committed together, along with the changes to
+    the full-text search index. An invalid operation only fails its own item; the rest of
+    the batch is still applied. Deletes are soft deletes, like `delete_task`.
+
+    Args:
+        user (User): The user who owns the tasks.
+        operations (list[dict]): The operations. Each one has an 'op' key ('create',
+            'update', 'toggle' or 'delete'), an 'id' key for everything but 'create',
+            and the task fields accepted by `validate_task_fields`.
+
+    Returns:
+        list[dict]: One result per operation, in order. Successful results have
+            'status': 'ok' and the resulting 'task' (or the deleted 'id'); failed ones
+            have 'status': 'error' and an 'error' message.
+
+    Raises:
+        SQLAlchemyError: If the database rejects the batch; the session is rolled back
+            and none of the operations are applied.
+    """
+    ids = {op.get('id') for op in operations if isinstance(op, dict) and isinstance(op.get('id'), int)}
+    tasks = {}
+    if ids:
+        tasks = {task.id: task for task in Task.query.filter(Task.id.in_(ids), Task.user_id == user.id, Task.live())}
+
+    results = []
+    # Cambios en los contadores de tareas, aplicados con una sola sentencia
+    deltas = Counter()
+    for operation in operations:
+        try:
+            if not isinstance(operation, dict) or operation.get('op') not in BATCH_OPERATIONS:
+                raise ValueError(f"'op' must be one of {list(BATCH_OPERATIONS)}")
+            op = operation['op']
+
+            if op == 'create':
+                task = Task(user_id=user.id, **validate_task_fields(operation))
+                db.session.add(task)
+                track_change(deltas, after=stat_key(task))
+                results.append({'status': 'ok', 'op': op, 'task': task})
+                continue
+
+            task = tasks.get(operation.get('id'))
+            if task is None:
+                raise LookupError(f"Task {operation.get('id')} not found")
+
+            before = stat_key(task)
+            if op == 'update':
+                for field, value in validate_task_fields(operation, partial=True).items():
+                    setattr(task, field, value)
+            elif op == 'toggle':
+                task.is_complete = not task.is_complete
+            else:
+                track_change(deltas, before)
+                task.deleted_at = utcnow()
+                del tasks[task.id]
+                results.append({'status': 'ok', 'op': op, 'id': task.id})
+                continue
+            track_change(deltas, before, stat_key(task))
+            results.append({'status': 'ok', 'op': op, 'task': task})
+
+        except (ValueError, LookupError) as e:
+            results.append({'status': 'error', 'error': str(e)})
+
+    try:
+        # Un único flush asigna los ids y permite serializar antes del commit
+        db.session.flush()
+        for result in results:
+            if result['status'] != 'ok':
+                continue
+            if result['op'] == 'delete':
+                remove_task(result['id'])
+                continue
+            if result['op'] in ('create', 'update'):
+                index_task(result['task'])
+            result['task'] = task_to_dict(result['task'])
+        adjust_task_stats(user.id, deltas)
+        if any(result['status'] == 'ok' for result in results):
+            bump_task_list_version(user.id)
         db.session.commit()
+    except Exception:
+        # La base de datos rechazó el lote: no se aplica ninguna operación y la sesión
+        # queda lista para responder el error
+        db.session.rollback()
+        raise
+    return results
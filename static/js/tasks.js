@@ -0,0 +1,152 @@
+// Mejora progresiva del dashboard y de la edición: marcar, borrar, crear o editar una tarea
+// envía una sola petición y sólo se actualiza lo afectado, sin volver a cargar la página. Sin
+// JavaScript, o si la petición no llega al servidor, los formularios se envían de la forma normal.
+(function () {
+    'use strict';
+
+    // Envía el formulario y pasa la respuesta a `onResponse`. Sólo si no llega ninguna
+    // respuesta (error de red) se envía el formulario de la forma normal: con una respuesta,
+    // aunque sea un error, el servidor ya ha decidido y reenviarlo podría repetir el cambio.
+    function sendPartial(form, accept, onResponse) {
+        // FormData incluye los campos ocultos del formulario, también su token CSRF
+        fetch(form.action || window.location.href, {
+            method: 'POST',
+            body: new FormData(form),
+            credentials: 'same-origin',
+            headers: {'X-Requested-With': 'fetch', 'Accept': accept}
+        }).then(onResponse, function () {
+            form.submit();
+        });
+    }
+
+    function toHtmlElement(html) {
+        var template = document.createElement('template');
+        template.innerHTML = html.trim();
+        return template.content.firstElementChild;
+    }
+
+    // Coloca una tarea nueva donde la pondría el servidor: las páginas se ordenan por prioridad
+    // y después por id, así que va tras las de su misma prioridad. Si no cumple el filtro de
+    // prioridad, o su sitio está en otra página, no se muestra.
+    function insertTask(list, item) {
+        var priority = Number(item.dataset.priority);
+        if (list.dataset.priority !== '' && Number(list.dataset.priority) !== priority) {
+            return;
+        }
+        var next = Array.prototype.find.call(list.children, function (other) {
+            return Number(other.dataset.priority) > priority;
+        });
+        if (!next) {
+            if (list.dataset.lastPage === 'true') {
+                list.appendChild(item);
+            }
+        } else if (next !== list.firstElementChild || list.dataset.firstPage === 'true') {
+            list.insertBefore(item, next);
+        }
+    }
+
+    function toggleTask(form) {
+        var item = form.closest('li');
+        var list = document.getElementById('task-list');
+        sendPartial(form, 'text/html', function (response) {
+            if (response.status === 404) {
+                // La tarea ya no existe
+                item.remove();
+                return;
+            }
+            if (!response.ok) {
+                window.location.reload();
+                return;
+            }
+            return response.text().then(function (html) {
+                var updated = toHtmlElement(html);
+                var done = updated.querySelector('input[name="is_complete"]').checked;
+                // La tarea sale de la lista si ya no cumple su filtro (pendientes o completadas)
+                if (list && list.dataset.status === (done ? 'open' : 'done')) {
+                    item.remove();
+                } else {
+                    item.replaceWith(updated);
+                }
+            });
+        });
+    }
+
+    function deleteTask(form) {
+        var item = form.closest('li');
+        sendPartial(form, 'text/html', function (response) {
+            if (response.ok || response.status === 404) {
+                item.remove();
+            } else {
+                window.location.reload();
+            }
+        });
+    }
+
+    function createTask(form) {
+        var list = document.getElementById('task-list');
+        sendPartial(form, 'text/html', function (response) {
+            if (response.status === 400) {
+                // No se ha guardado nada: el servidor vuelve a mostrar el formulario con sus errores
+                form.submit();
+                return;
+            }
+            if (response.status !== 201) {
+                window.location.reload();
+                return;
+            }
+            return response.text().then(function (html) {
+                // Las tareas nuevas están pendientes: no se muestran en el filtro de completadas
+                if (list && list.dataset.status !== 'done') {
+                    insertTask(list, toHtmlElement(html));
+                }
+                form.reset();
+            });
+        });
+    }
+
+    function editTask(form) {
+        var message = document.getElementById('task-edit-status');
+        sendPartial(form, 'application/json', function (response) {
+            if (response.status === 400) {
+                // No se ha guardado nada: se muestran los errores sin salir del formulario
+                return response.json().then(function (data) {
+                    message.textContent = Object.keys(data.errors).map(function (field) {
+                        return field + ': ' + data.errors[field].join(' ');
+                    }).join(' ');
+                });
+            }
+            if (!response.ok) {
+                window.location.reload();
+                return;
+            }
+            return response.json().then(function (data) {
+                // El formulario muestra los valores guardados, tal como los ha normalizado el servidor
+                form.elements.title.value = data.task.title;
+                form.elements.description.value = data.task.description || '';
+                form.elements.priority.value = data.task.priority;
+                form.elements.image.value = '';
+                message.textContent = 'Saved.';
+            });
+        });
+    }
+
+    document.addEventListener('submit', function (event) {
+        var form = event.target;
+        if (!window.fetch) {
+            return;
+        }
+        if (form.classList.contains('task-toggle')) {
+            event.preventDefault();
+            toggleTask(form);
+        } else if (form.classList.contains('task-delete')) {
+            event.preventDefault();
+            deleteTask(form);
+        } else if (form.id === 'task-form') {
+            event.preventDefault();
+            createTask(form);
+        } else if (form.id === 'task-edit-form') {
+            event.preventDefault();
+            editTask(form);
+        }
+    });
+})();
@@ -2,26 +2,53 @@ from werkzeug.security import generate_password_hash
 import pytest
 import sys
 import os
+import tempfile
+from contextlib import contextmanager
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from app import create_app, db
 from forms.forms import *
 from models.models import User, Task
+from services.api_service import deals_cache
+from services.auth_service import user_cache
+from services.task_service import task_list_fragments
+from services.metrics_service import metrics
+from services.http_service import http_clients
+from services.query_audit_service import capture_queries
+from services.migration_service import schema_version
 
 class TestConfig:
     TESTING = True
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    # Base de datos propia de las pruebas, nunca instance/app.db
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='todo-db-'), 'test.db')
     WTF_CSRF_ENABLED = False
     SERVER_NAME = 'localhost'
+    UPLOAD_FOLDER = tempfile.mkdtemp(prefix='todo-uploads-')
+    METRICS_ENABLED = True
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    deals_cache.clear()
+    user_cache.clear()
+    task_list_fragments.clear()
+    metrics.clear()
+    for http_client in http_clients.values():
+        http_client.reset()
+    yield
+    deals_cache.clear()
+    user_cache.clear()
+    task_list_fragments.clear()
+
 
 @pytest.fixture
 def client():
-    app = create_app()
-    app.config.from_object(TestConfig)
+    app = create_app(TestConfig)
     with app.app_context():
-        db.create_all() 
+        db.create_all()
         yield app.test_client()
         db.session.remove()
-        db.drop_all() 
+        db.drop_all()
+        # `flask db upgrade` registra las migraciones fuera de los modelos
+        schema_version.drop(db.engine, checkfirst=True)
 
 
 @pytest.fixture
@@ -36,3 +63,17 @@ def authenticated_client(client):
             'password': 'testpass'
         })
         yield client
+
+
+@pytest.fixture
+def assert_max_queries():
+    """Context manager factory failing the test if the block runs more than `limit` SQL statements."""
+    @contextmanager
+    def check(limit):
+        # Las peticiones del cliente de pruebas comparten la sesión del test: se vacía
+        # para medir lo mismo que una petición real, que empieza con la sesión vacía
+        db.session.expunge_all()
+        with capture_queries(db.engine) as statements:
+            yield statements
+        assert len(statements) <= limit, f"{len(statements)} queries (limit {limit}):\n" + "\n".join(statements)
+    return check
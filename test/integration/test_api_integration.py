@@ -0,0 +1,93 @@
+from conftest import *
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from services.task_service import apply_task_batch
+
+
+def test_batch_create_update_toggle_delete(authenticated_client):
+    response = authenticated_client.post('/api/v1/tasks/batch', json={'operations': [
+        {'op': 'create', 'title': 'First', 'priority': 2},
+        {'op': 'create', 'title': 'Second', 'description': 'Batch', 'priority': 4},
+    ]})
+    assert response.status_code == 200
+    created = [result['task'] for result in response.get_json()['results']]
+    assert [task['title'] for task in created] == ['First', 'Second']
+
+    first, second = created
+    response = authenticated_client.post('/api/v1/tasks/batch', json={'operations': [
+        {'op': 'update', 'id': first['id'], 'title': 'First updated', 'priority': 1},
+        {'op': 'toggle', 'id': second['id']},
+        {'op': 'delete', 'id': first['id']},
+    ]})
+    data = response.get_json()
+    assert data['succeeded'] == 3
+    assert data['results'][0]['task']['title'] == 'First updated'
+    assert data['results'][1]['task']['is_complete'] is True
+
+    # Los borrados son lógicos: la tarea desaparece del listado y la purga el sweeper
+    assert db.session.get(Task, first['id']).deleted_at is not None
+    listed = authenticated_client.get('/api/v1/tasks').get_json()['tasks']
+    assert [task['id'] for task in listed] == [second['id']]
+    assert db.session.get(Task, second['id']).is_complete is True
+
+
+def test_batch_reports_errors_per_item(authenticated_client):
+    other = User(username='other')
+    db.session.add(other)
+    db.session.commit()
+    foreign = Task(title='Not yours', priority=1, owner=other)
+    db.session.add(foreign)
+    db.session.commit()
+
+    response = authenticated_client.post('/api/v1/tasks/batch', json={'operations': [
+        {'op': 'create', 'title': 'Valid', 'priority': 3},
+        {'op': 'create', 'title': '', 'priority': 3},
+        {'op': 'create', 'title': 'Bad priority', 'priority': 9},
+        {'op': 'toggle', 'id': foreign.id},
+        {'op': 'archive', 'id': 1},
+    ]})
+    results = response.get_json()['results']
+
+    assert [result['status'] for result in results] == ['ok', 'error', 'error', 'error', 'error']
+    assert Task.query.filter_by(title='Valid').count() == 1
+    assert db.session.get(Task, foreign.id).is_complete is False
+
+
+def test_batch_rejects_invalid_payload(authenticated_client):
+    response = authenticated_client.post('/api/v1/tasks/batch', json={'tasks': []})
+    assert response.status_code == 400
+
+
+def test_list_tasks_paginated(authenticated_client):
+    authenticated_client.post('/api/v1/tasks/batch', json={'operations': [
+        {'op': 'create', 'title': f'Task {i}', 'priority': 1} for i in range(5)
+    ]})
+
+    response = authenticated_client.get('/api/v1/tasks?limit=3')
+    data = response.get_json()
+    assert len(data['tasks']) == 3
+    assert data['next_cursor']
+
+    response = authenticated_client.get(f"/api/v1/tasks?limit=3&after={data['next_cursor']}")
+    assert len(response.get_json()['tasks']) == 2
+
+
+def test_api_requires_login(client):
+    response = client.get('/api/v1/tasks')
+    assert response.status_code == 401
+
+
+def test_batch_rejected_by_the_database_is_rolled_back(authenticated_client):
+    user = User.query.filter_by(username='testuser').first()
+    db.session.execute(text("CREATE TRIGGER reject_boom BEFORE INSERT ON task WHEN NEW.title = 'Boom' "
+                            "BEGIN SELECT RAISE(ABORT, 'rejected'); END"))
+    db.session.commit()
+
+    with pytest.raises(IntegrityError):
+        apply_task_batch(user, [{'op': 'create', 'title': 'Fine', 'priority': 1},
+                                {'op': 'create', 'title': 'Boom', 'priority': 1}])
+
+    # La sesión sigue utilizable y no queda nada del lote
+    assert Task.query.count() == 0
+    db.session.execute(text('DROP TRIGGER reject_boom'))
+    db.session.commit()
@@ -1,5 +1,7 @@
 from werkzeug.security import generate_password_hash
 import pytest
+import os
+import tempfile
 from flask import url_for
 from app import create_app, db
 from models.models import User
@@ -7,14 +9,13 @@ from conftest import authenticated_client
 
 class TestConfig:
     TESTING = True
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='todo-db-'), 'test.db')
     WTF_CSRF_ENABLED = False
     SERVER_NAME = "localhost:5000"
 
 @pytest.fixture
 def client():
-    app = create_app()
-    app.config.from_object(TestConfig)
+    app = create_app(TestConfig)
 
     with app.test_client() as client:
         with app.app_context():
@@ -3,21 +3,21 @@ from unittest.mock import patch
 from flask import url_for, session
 import sys
 import os
+import tempfile
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../..')))
 from app import create_app, db, User
 
 
 class TestConfig:
     TESTING = True
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='todo-db-'), 'test.db')
     WTF_CSRF_ENABLED = False
     SERVER_NAME = 'localhost'  
 
 
 @pytest.fixture(scope="module")
 def test_app():
-    app = create_app()
-    app.config.from_object(TestConfig)
+    app = create_app(TestConfig)
     with app.app_context():
         db.create_all()
         yield app.test_client()
@@ -0,0 +1,144 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from authlib.jose import JsonWebKey, jwt
+from conftest import *
+from services import oauth_service
+from services.oauth_service import oauth, oidc_cache, init_oauth, get_provider
+
+
+class LocalIdentityProvider:
+    """Stand-in OpenID Connect provider serving discovery and JWKS documents."""
+
+    def __init__(self):
+        self.hits = {'discovery': 0, 'jwks': 0}
+        self.keys = [self._new_key('key-1')]
+        provider = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/.well-known/openid-configuration':
+                    provider.hits['discovery'] += 1
+                    body = provider.discovery()
+                elif self.path == '/jwks':
+                    provider.hits['jwks'] += 1
+                    body = {'keys': [key.as_dict(is_private=False) for key in provider.keys]}
+                else:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                payload = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @staticmethod
+    def _new_key(kid):
+        return JsonWebKey.generate_key('RSA', 2048, is_private=True, options={'kid': kid})
+
+    def discovery(self):
+        return {
+            'issuer': self.url,
+            'authorization_endpoint': f'{self.url}/authorize',
+            'token_endpoint': f'{self.url}/token',
+            'jwks_uri': f'{self.url}/jwks',
+            'id_token_signing_alg_values_supported': ['RS256'],
+        }
+
+    def rotate(self, kid):
+        self.keys = [self._new_key(kid)]
+
+    def id_token(self, nonce, kid=None):
+        key = self.keys[0] if kid is None else self._new_key(kid)
+        now = int(time.time())
+        claims = {
+            'iss': self.url, 'aud': 'local-client', 'sub': 'local-1', 'email': 'local@example.com',
+            'nonce': nonce, 'iat': now, 'exp': now + 300,
+        }
+        return jwt.encode({'alg': 'RS256', 'kid': key.as_dict()['kid']}, claims, key).decode()
+
+
+@pytest.fixture
+def idp():
+    provider = LocalIdentityProvider()
+    yield provider
+    provider.server.shutdown()
+
+
+@pytest.fixture
+def local_client(client, idp):
+    oidc_cache.clear()
+    app = client.application
+    app.config['OAUTH_PROVIDERS'] = {'local': {
+        'client_id': 'local-client',
+        'client_secret': 'local-secret',
+        'server_metadata_url': f'{idp.url}/.well-known/openid-configuration',
+        'client_kwargs': {'scope': 'openid email'},
+    }}
+    # Cada ejecución usa un IdP en un puerto distinto
+    oauth._clients.pop('local', None)
+    oauth_service._registered.discard('local')
+    init_oauth(app)
+    yield get_provider('local')
+    oidc_cache.clear()
+
+
+def test_providers_registered_once(client):
+    registry = dict(oauth._registry)
+    init_oauth(client.application)
+    init_oauth(create_app())
+
+    assert oauth._registry == registry
+    assert get_provider('google') is oauth.create_client('google')
+    assert get_provider('unknown') is None
+
+
+def test_discovery_document_is_cached(local_client, idp):
+    for _ in range(5):
+        metadata = local_client.load_server_metadata()
+
+    assert metadata['issuer'] == idp.url
+    assert idp.hits['discovery'] == 1
+
+
+def test_parse_id_token_uses_prefetched_keys(local_client, idp):
+    # Como en oauth_login: authorize_redirect ya ha cargado los metadatos
+    local_client.load_server_metadata()
+    oidc_cache.prefetch(local_client)
+    oidc_cache.jwks(f'{idp.url}/jwks')
+    fetched = dict(idp.hits)
+
+    userinfo = local_client.parse_id_token({'id_token': idp.id_token('n-1')}, nonce='n-1')
+
+    assert userinfo['email'] == 'local@example.com'
+    assert idp.hits == fetched
+
+
+def test_key_rotation_refreshes_jwks_once(local_client, idp):
+    local_client.fetch_jwk_set()
+    idp.rotate('key-2')
+
+    userinfo = local_client.parse_id_token({'id_token': idp.id_token('n-2')}, nonce='n-2')
+    assert userinfo['sub'] == 'local-1'
+    assert idp.hits['jwks'] == 2
+
+    # Una clave desconocida no vuelve a consultar el IdP dentro del intervalo mínimo
+    with pytest.raises(Exception):
+        local_client.parse_id_token({'id_token': idp.id_token('n-3', kid='key-3')}, nonce='n-3')
+    assert idp.hits['jwks'] == 2
+
+
+def test_login_route_for_unknown_provider(client):
+    response = client.get('/oauth/login/unknown')
+    assert response.status_code == 404
@@ -85,4 +85,53 @@ def test_get_tasks_by_user(authenticated_client):
         tasks = get_tasks_by_user(user)
 
         assert tasks[0].priority == 1
-        assert tasks[1].priority == 4
\ No newline at end of file
+        assert tasks[1].priority == 4
+
+PARTIAL = {'X-Requested-With': 'fetch'}
+
+
+def test_toggle_complete_partial_returns_only_the_task(authenticated_client, mocker):
+    deals = mocker.patch('routes.tasks.get_game_deals')
+    user = User.query.filter_by(username='testuser').first()
+    task = Task(title='Partial toggle', priority=2, is_complete=False, owner=user)
+    db.session.add(task)
+    db.session.commit()
+
+    response = authenticated_client.post(f'/tasks/toggle_complete/{task.id}', headers=PARTIAL)
+    assert response.status_code == 200
+    html = response.get_data(as_text=True)
+    assert html.strip().startswith(f'<li id="task-{task.id}"')
+    assert 'checked' in html
+    deals.assert_not_called()
+
+    response = authenticated_client.post(f'/tasks/toggle_complete/{task.id}',
+                                         headers=dict(PARTIAL, Accept='application/json'))
+    assert response.get_json()['task']['is_complete'] is False
+
+    assert authenticated_client.post('/tasks/toggle_complete/9999', headers=PARTIAL).status_code == 404
+
+
+def test_create_and_edit_task_partial(authenticated_client):
+    response = authenticated_client.post('/tasks/dashboard', headers=PARTIAL, data={
+        'title': 'Partial create', 'description': '', 'priority': 3
+    })
+    assert response.status_code == 201
+    assert 'data-priority="3"' in response.get_data(as_text=True)
+    task = Task.query.filter_by(title='Partial create').first()
+
+    response = authenticated_client.post(f'/tasks/edit_task/{task.id}', headers=dict(PARTIAL, Accept='application/json'),
+                                         data={'title': 'Partial edit', 'description': 'Now', 'priority': 1})
+    assert response.status_code == 200
+    assert response.get_json()['task'] == {
+        'id': task.id, 'title': 'Partial edit', 'description': 'Now', 'priority': 1, 'is_complete': False, 'image': None
+    }
+
+    response = authenticated_client.post(f'/tasks/edit_task/{task.id}', headers=PARTIAL,
+                                         data={'title': '', 'priority': 1})
+    assert response.status_code == 400
+    assert 'title' in response.get_json()['errors']
+    assert db.session.get(Task, task.id).title == 'Partial edit'
+
+    response = authenticated_client.post('/tasks/dashboard', headers=PARTIAL, data={'title': '', 'priority': 3})
+    assert response.status_code == 400
+    assert 'title' in response.get_json()['errors']
@@ -1,32 +1,51 @@
+import threading
+import time
 import pytest
-from unittest.mock import patch, MagicMock
-from services.api_service import get_game_deals, requests
-
-
-@patch('services.api_service.requests.get')
-def test_get_game_deals_success(mock_get):
-    mock_response = MagicMock()
-    mock_response.raise_for_status.return_value = None
-    mock_response.json.return_value = [
-        {
-            'title': 'Game 1',
-            'salePrice': '19.99',
-            'normalPrice': '39.99',
-            'dealID': '123',
-            'metacriticScore': '90',
-            'dealRating': '9.5'
-        },
-        {
-            'title': 'Game 2',
-            'salePrice': '15.99',
-            'normalPrice': '29.99',
-            'dealID': '456',
-            'metacriticScore': '88',
-            'dealRating': '9.0'
-        }
-    ]
-
-    mock_get.return_value = mock_response
+from benchmarks.stubs import StubServer
+from services import api_service
+from services.api_service import get_game_deals, get_game_deals_fingerprint
+
+DEALS = [
+    {
+        'title': 'Game 1',
+        'salePrice': '19.99',
+        'normalPrice': '39.99',
+        'dealID': '123',
+        'metacriticScore': '90',
+        'dealRating': '9.5'
+    },
+    {
+        'title': 'Game 2',
+        'salePrice': '15.99',
+        'normalPrice': '29.99',
+        'dealID': '456',
+        'metacriticScore': '88',
+        'dealRating': '9.0'
+    }
+]
+
+
+@pytest.fixture
+def cheapshark(monkeypatch):
+    """Local stand-in for CheapShark; `hits` counts the requests it received."""
+    server = StubServer({})
+    server.hits = 0
+
+    def serve(status, body):
+        def handler():
+            server.hits += 1
+            return status, body
+        server.routes['/deals'] = handler
+
+    server.serve = serve
+    monkeypatch.setattr(api_service, 'CHEAPSHARK_API_URL', server.url + '/deals')
+    monkeypatch.setattr(api_service.cheapshark_http, 'backoff', 0.001)
+    with server:
+        yield server
+
+
+def test_get_game_deals_success(cheapshark):
+    cheapshark.serve(200, DEALS)
 
     deals = get_game_deals()
 
@@ -35,10 +54,58 @@ def test_get_game_deals_success(mock_get):
     assert deals[1]['title'] == 'Game 2'
 
 
-@patch('services.api_service.requests.get')
-def test_get_game_deals_error(mock_get):
-    mock_get.side_effect = requests.RequestException('API failure')
+def test_get_game_deals_error(cheapshark):
+    cheapshark.serve(500, {'error': 'API failure'})
 
     deals = get_game_deals()
 
-    assert deals == []
\ No newline at end of file
+    assert deals == []
+
+
+def test_get_game_deals_is_cached(cheapshark):
+    cheapshark.serve(200, DEALS[:1])
+
+    first = get_game_deals()
+    second = get_game_deals()
+
+    assert first == second
+    assert cheapshark.hits == 1
+
+
+def test_get_game_deals_error_is_negatively_cached(cheapshark):
+    cheapshark.serve(500, {'error': 'API failure'})
+
+    assert get_game_deals() == []
+    assert get_game_deals() == []
+    assert cheapshark.hits == 1
+
+
+def test_get_game_deals_retries_unavailable_upstream(cheapshark):
+    cheapshark.serve(503, {'error': 'busy'})
+
+    assert get_game_deals() == []
+    assert cheapshark.hits == 1 + api_service.cheapshark_http.retries
+
+
+def test_deals_fingerprint_is_computed_once_per_refresh(cheapshark, monkeypatch):
+    cheapshark.serve(200, DEALS)
+    monkeypatch.setattr(api_service, '_deals_fingerprint', (None, None))
+    dumps = api_service.json.dumps
+    calls = []
+
+    def slow_dumps(*args, **kwargs):
+        calls.append(1)
+        time.sleep(0.01)
+        return dumps(*args, **kwargs)
+
+    get_game_deals()
+    monkeypatch.setattr(api_service.json, 'dumps', slow_dumps)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(get_game_deals_fingerprint())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(results)) == 1 and len(results) == 8
+    assert len(calls) == 1
@@ -1,5 +1,6 @@
 from conftest import *
-from services.auth_service import get_user_by_username, create_user
+from services.auth_service import (get_user_by_username, create_user, get_or_create_oauth_user, load_user_snapshot,
+                                   invalidate_user, user_cache, UserSnapshot)
 
 def test_get_user_by_username(client):
     with client.application.app_context():
@@ -65,3 +66,32 @@ def test_login_incorrect_credentials(client):
         assert response.status_code == 200
         with client.session_transaction() as session:
             assert '_user_id' not in session
+
+
+def test_user_loader_uses_cache(authenticated_client, mocker):
+    user = User.query.filter_by(username='testuser').first()
+    user_cache.clear()
+
+    get = mocker.spy(db.session, 'get')
+    for _ in range(3):
+        snapshot = load_user_snapshot(user.id)
+
+    assert isinstance(snapshot, UserSnapshot)
+    assert snapshot.username == 'testuser'
+    assert not hasattr(snapshot, 'password')
+    assert get.call_count == 1
+    assert user_cache.stats()['hits'] == 2
+
+
+def test_user_cache_invalidated_by_auth_service(client):
+    with client.application.app_context():
+        create_user('cached', 'password')
+        user = get_user_by_username('cached')
+        assert load_user_snapshot(user.id).username == 'cached'
+
+        user_cache.set(user.id, UserSnapshot(user.id, 'stale-name'))
+        invalidate_user(user.id)
+        assert load_user_snapshot(user.id).username == 'cached'
+
+        oauth_user = get_or_create_oauth_user('oauth@example.com', 'google', '1')
+        assert load_user_snapshot(oauth_user.id).oauth_provider == 'google'
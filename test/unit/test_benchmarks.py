@@ -0,0 +1,26 @@
+from conftest import *
+from benchmarks.micro import compare, summarize, main
+
+
+def test_summarize_reports_milliseconds():
+    summary = summarize([0.001, 0.002, 0.003])
+    assert summary == {'median_ms': 2.0, 'p95_ms': 3.0, 'min_ms': 1.0, 'runs': 3}
+
+
+def test_compare_flags_only_regressions_beyond_threshold():
+    baseline = {'login@10': {'median_ms': 100.0}, 'create_task@10': {'median_ms': 2.0}}
+    results = {
+        'login@10': {'median_ms': 120.0},
+        'create_task@10': {'median_ms': 3.0},
+        'toggle_task@10': {'median_ms': 50.0},
+    }
+    regressions = compare(results, baseline, threshold=0.25)
+    assert len(regressions) == 1
+    assert regressions[0].startswith('create_task@10')
+
+
+def test_check_fails_without_a_baseline(tmp_path, mocker):
+    run = mocker.patch('benchmarks.micro.run')
+
+    assert main(['--check', '--baseline', str(tmp_path / 'missing.json')]) == 2
+    run.assert_not_called()
@@ -0,0 +1,149 @@
+from conftest import *
+import csv
+import io
+import json
+from services.bulk_service import export_tasks, import_tasks, read_rows
+from services.search_service import search_tasks
+from services.task_service import get_task_list_version
+
+CSV_FILE = (
+    'title,description,priority,is_complete\n'
+    'Pay rent,Before the 5th,3,false\n'
+    ',No title,2,false\n'
+    'Water plants,,1,yes\n'
+    'Call mum,Sunday,9,no\n'
+    'Book flights,"Lisbon, Porto",4,\n'
+)
+
+
+def current_user_row():
+    return User.query.filter_by(username='testuser').first()
+
+
+def test_csv_import_reports_row_errors(authenticated_client):
+    user = current_user_row()
+    version = get_task_list_version(user)
+
+    response = authenticated_client.post('/api/v1/tasks/import', data=CSV_FILE, content_type='text/csv')
+
+    assert response.status_code == 200
+    report = response.get_json()
+    assert report['imported'] == 3 and report['failed'] == 2
+    assert [error['line'] for error in report['errors']] == [3, 5]
+    assert "'priority'" in report['errors'][1]['error']
+
+    tasks = {task.title: task for task in Task.query.filter_by(user_id=user.id)}
+    assert set(tasks) == {'Pay rent', 'Water plants', 'Book flights'}
+    assert tasks['Water plants'].is_complete is True and tasks['Water plants'].description is None
+    assert tasks['Book flights'].description == 'Lisbon, Porto'
+    assert get_task_list_version(user) > version
+    assert [task.title for task in search_tasks(user, 'lisbon')[0]] == ['Book flights']
+
+
+def test_ndjson_import_commits_in_batches(authenticated_client, mocker):
+    authenticated_client.application.config['IMPORT_BATCH_SIZE'] = 2
+    lines = [json.dumps({'title': f'Task {n}', 'priority': n % 4 + 1}) for n in range(5)]
+    body = '\n'.join(lines[:3] + ['', 'not json', '[1, 2]'] + lines[3:]) + '\n'
+    commit = mocker.spy(db.session, 'commit')
+
+    response = authenticated_client.post('/api/v1/tasks/import?format=ndjson', data=body,
+                                         content_type='application/x-ndjson')
+
+    report = response.get_json()
+    assert report['imported'] == 5
+    assert report['errors'] == [{'line': 5, 'error': 'Invalid JSON'}, {'line': 6, 'error': 'Expected a JSON object'}]
+    assert commit.call_count == 3
+    assert Task.query.filter_by(user_id=current_user_row().id).count() == 5
+
+
+def test_invalid_utf8_is_a_row_error(authenticated_client):
+    authenticated_client.application.config['IMPORT_BATCH_SIZE'] = 1
+    body = 'title,priority\nFirst,1\n'.encode() + b'Caf\xe9,2\n' + 'Last,3\n'.encode()
+
+    response = authenticated_client.post('/api/v1/tasks/import', data=body, content_type='text/csv')
+
+    assert response.status_code == 200
+    report = response.get_json()
+    assert (report['imported'], report['failed']) == (2, 1)
+    assert report['errors'] == [{'line': 3, 'error': 'Not valid UTF-8'}]
+    assert {task.title for task in Task.query} == {'First', 'Last'}
+
+
+def test_oversized_csv_field_stops_the_import_with_a_report(authenticated_client):
+    authenticated_client.application.config['IMPORT_BATCH_SIZE'] = 1
+    body = 'title,priority\nFirst,1\n' + 'x' * 200_000 + ',2\nLast,3\n'
+
+    response = authenticated_client.post('/api/v1/tasks/import', data=body, content_type='text/csv')
+
+    assert response.status_code == 200
+    report = response.get_json()
+    assert (report['imported'], report['failed']) == (1, 1)
+    assert report['errors'][0]['line'] == 3
+    assert 'field larger than field limit' in report['errors'][0]['error']
+    assert {task.title for task in Task.query} == {'First'}
+
+
+def test_import_has_its_own_size_limit(authenticated_client):
+    app = authenticated_client.application
+    app.config.update(MAX_CONTENT_LENGTH=20, IMPORT_MAX_SIZE=len(CSV_FILE))
+    assert authenticated_client.post('/api/v1/tasks/import', data=CSV_FILE, content_type='text/csv').status_code == 200
+
+    app.config['IMPORT_MAX_SIZE'] = 20
+    response = authenticated_client.post('/api/v1/tasks/import', data=CSV_FILE, content_type='text/csv')
+    assert response.status_code == 413
+
+
+def test_import_requires_a_known_format(authenticated_client):
+    response = authenticated_client.post('/api/v1/tasks/import', data='{}', content_type='application/json')
+    assert response.status_code == 415
+
+    # Un formulario de otro sitio no puede elegir el formato con ?format
+    for content_type in ('text/plain', 'application/x-www-form-urlencoded', 'application/x-ndjson'):
+        response = authenticated_client.post('/api/v1/tasks/import?format=csv', data=CSV_FILE,
+                                             content_type=content_type)
+        assert response.status_code == 415
+    assert Task.query.count() == 0
+
+
+def test_export_streams_every_task(authenticated_client):
+    user = current_user_row()
+    import_tasks(user.id, read_rows(io.BytesIO(CSV_FILE.encode()), 'csv'))
+
+    response = authenticated_client.get('/api/v1/tasks/export?format=csv')
+    assert response.is_streamed
+    assert response.headers['Content-Disposition'] == 'attachment; filename=tasks.csv'
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [row['title'] for row in rows] == ['Pay rent', 'Water plants', 'Book flights']
+    assert rows[1]['is_complete'] == 'true'
+
+    response = authenticated_client.get('/api/v1/tasks/export?format=ndjson')
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert records[2] == {'id': records[2]['id'], 'title': 'Book flights', 'description': 'Lisbon, Porto',
+                          'priority': 4, 'is_complete': False}
+
+
+def test_export_is_produced_in_chunks(authenticated_client):
+    user = current_user_row()
+    rows = ((n, {'title': f'Task {n}', 'priority': 1}) for n in range(5))
+    import_tasks(user.id, rows)
+
+    pieces = list(export_tasks(user.id, 'ndjson', chunk_size=2))
+    assert [piece.count('\n') for piece in pieces] == [2, 2, 1]
+
+
+def test_cli_import_and_export(authenticated_client, tmp_path):
+    source = tmp_path / 'tasks.csv'
+    source.write_text(CSV_FILE)
+    runner = authenticated_client.application.test_cli_runner()
+
+    result = runner.invoke(args=['tasks', 'import', str(source), '--user', 'testuser'])
+    assert result.exit_code == 0, result.output
+    assert 'Imported 3 tasks, 2 rows failed.' in result.output
+    assert 'Line 3:' in result.output
+
+    result = runner.invoke(args=['tasks', 'export', '--user', 'testuser', '--format', 'ndjson'])
+    assert [json.loads(line)['title'] for line in result.output.splitlines()] == ['Pay rent', 'Water plants',
+                                                                                   'Book flights']
+
+    result = runner.invoke(args=['tasks', 'import', str(source), '--user', 'nobody'])
+    assert result.exit_code == 1
@@ -0,0 +1,120 @@
+import threading
+import pytest
+from services.cache_service import StaleWhileRevalidateCache, LRUCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_fresh_value_is_served_from_cache(clock):
+    calls = []
+    cache = StaleWhileRevalidateCache(lambda: calls.append(1) or len(calls), ttl=10, clock=clock)
+
+    assert cache.get() == 1
+    clock.now = 5
+    assert cache.get() == 1
+
+    assert len(calls) == 1
+    assert cache.stats()['misses'] == 1
+    assert cache.stats()['hits'] == 1
+
+
+def test_stale_value_served_while_refreshing(clock):
+    release = threading.Event()
+    values = iter(['old', 'new'])
+
+    def loader():
+        value = next(values)
+        if value == 'new':
+            release.wait(5)
+        return value
+
+    cache = StaleWhileRevalidateCache(loader, ttl=10, stale_ttl=100, clock=clock)
+    assert cache.get() == 'old'
+
+    clock.now = 20
+    assert cache.get() == 'old'
+    assert cache.get() == 'old'
+    assert cache.stats()['refreshes'] == 1
+
+    release.set()
+    assert cache.refresh() == 'new'
+    assert cache.get() == 'new'
+    assert cache.stats()['loads'] == 2
+
+
+def test_concurrent_misses_trigger_a_single_load(clock):
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        release.wait(5)
+        return 'deals'
+
+    cache = StaleWhileRevalidateCache(loader, clock=clock)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get())) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ['deals'] * 10
+    assert len(calls) == 1
+
+
+def test_failures_are_negatively_cached(clock):
+    calls = []
+
+    def loader():
+        calls.append(1)
+        raise RuntimeError('upstream down')
+
+    cache = StaleWhileRevalidateCache(loader, negative_ttl=30, default=[], clock=clock)
+
+    assert cache.get() == []
+    clock.now = 10
+    assert cache.get() == []
+    assert len(calls) == 1
+    assert cache.stats()['negative_hits'] == 1
+    assert isinstance(cache.last_error, RuntimeError)
+
+    clock.now = 31
+    assert cache.get() == []
+    assert len(calls) == 2
+
+
+def test_last_good_value_kept_after_failure(clock):
+    values = iter(['deals'])
+    cache = StaleWhileRevalidateCache(lambda: next(values), ttl=10, stale_ttl=0, default=[], clock=clock)
+
+    assert cache.get() == 'deals'
+    clock.now = 20
+    assert cache.get() == 'deals'
+    assert cache.stats()['failures'] == 1
+
+
+def test_lru_get_or_set_builds_missing_entries_once():
+    cache = LRUCache(maxsize=2)
+    calls = []
+
+    def build():
+        calls.append(1)
+        return 'value'
+
+    assert cache.get_or_set('a', build) == 'value'
+    assert cache.get_or_set('a', build) == 'value'
+    assert len(calls) == 1
+    assert cache.stats()['hits'] == 1
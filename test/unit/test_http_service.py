@@ -0,0 +1,197 @@
+import time
+import pytest
+import requests
+from benchmarks.db_profiles import free_port
+from benchmarks.stubs import StubServer
+from services.http_service import HTTPClient, CircuitOpenError, http_clients
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def make_client():
+    """Build test clients that do not stay in the process-wide registry."""
+    created = []
+
+    def make(name='upstream', **options):
+        options.setdefault('backoff', 0.001)
+        client = HTTPClient(f'test-{name}', **options)
+        created.append(client)
+        return client
+
+    yield make
+    for client in created:
+        client.close()
+        http_clients.pop(client.name, None)
+
+
+def flaky(failures, status=503):
+    """Route handler failing `failures` times with `status`, then answering 200."""
+    calls = []
+
+    def handler():
+        calls.append(1)
+        return (status, {'error': 'busy'}) if len(calls) <= failures else (200, {'ok': True})
+    handler.calls = calls
+    return handler
+
+
+def closed_port_url():
+    return f'http://127.0.0.1:{free_port()}'
+
+
+def test_connections_are_kept_alive(make_client):
+    client = make_client()
+    with StubServer({'/ping': lambda: (200, {'pong': True})}) as server:
+        for _ in range(5):
+            assert client.get_json(server.url + '/ping') == {'pong': True}
+
+    assert len(server.peers) == 1
+
+
+def test_idempotent_requests_are_retried_with_backoff(make_client):
+    pauses = []
+    client = make_client(retries=3, backoff=0.1, max_backoff=0.15, sleep=pauses.append)
+    handler = flaky(2)
+    with StubServer({'/deals': handler}) as server:
+        assert client.get_json(server.url + '/deals') == {'ok': True}
+
+    assert len(handler.calls) == 3
+    assert len(pauses) == 2
+    assert 0 <= pauses[0] <= 0.1 and 0 <= pauses[1] <= 0.15
+    assert client.stats()['retries'] == 2
+
+
+def test_post_is_not_retried(make_client):
+    client = make_client(retries=3)
+    handler = flaky(1)
+    with StubServer({'/token': handler}) as server:
+        with pytest.raises(requests.HTTPError):
+            client.post(server.url + '/token')
+
+    assert len(handler.calls) == 1
+
+
+def test_deadline_bounds_the_whole_call(make_client):
+    def slow():
+        time.sleep(1)
+        return 200, {}
+
+    client = make_client(timeout=5, deadline=0.2, retries=5)
+    with StubServer({'/slow': slow}) as server:
+        started = time.monotonic()
+        with pytest.raises(requests.Timeout):
+            client.get(server.url + '/slow')
+        assert time.monotonic() - started < 0.9
+
+
+def test_circuit_opens_and_recovers(make_client):
+    clock = FakeClock()
+    client = make_client(retries=0, failure_threshold=2, reset_timeout=30, clock=clock)
+    down = closed_port_url()
+
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            client.get(down)
+    assert client.breaker.state == 'open'
+
+    # Con el circuito abierto no se llama al servicio
+    with pytest.raises(CircuitOpenError):
+        client.get(down)
+
+    clock.now += 31
+    with StubServer({'/ping': lambda: (200, {})}) as server:
+        assert client.get(server.url + '/ping').status_code == 200
+    assert client.breaker.state == 'closed'
+    assert client.stats() == {'requests': 3, 'retries': 0, 'failures': 2, 'short_circuits': 1, 'circuit_opens': 1}
+
+
+def test_failed_trial_reopens_circuit(make_client):
+    clock = FakeClock()
+    client = make_client(retries=0, failure_threshold=1, reset_timeout=30, clock=clock)
+    down = closed_port_url()
+
+    with pytest.raises(requests.ConnectionError):
+        client.get(down)
+    clock.now += 31
+    with pytest.raises(requests.ConnectionError):
+        client.get(down)
+
+    assert client.breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        client.get(down)
+
+
+def test_unexpected_error_in_trial_call_does_not_block_the_circuit(make_client, mocker):
+    clock = FakeClock()
+    client = make_client(retries=0, failure_threshold=1, reset_timeout=30, clock=clock)
+    down = closed_port_url()
+
+    with pytest.raises(requests.ConnectionError):
+        client.get(down)
+    clock.now += 31
+    mocker.patch.object(client.session(), 'request', side_effect=ValueError('adapter bug'))
+    with pytest.raises(ValueError):
+        client.get(down)
+
+    # La llamada de prueba fallida vuelve a abrir el circuito, que admite otra prueba más tarde
+    assert client.breaker.state == 'open'
+    mocker.stopall()
+    clock.now += 31
+    with StubServer({'/ping': lambda: (200, {})}) as server:
+        assert client.get(server.url + '/ping').status_code == 200
+    assert client.breaker.state == 'closed'
+
+
+def test_call_counts_only_transport_errors_as_failures(make_client):
+    client = make_client(failure_threshold=1)
+
+    def rejected():
+        raise ValueError('invalid_grant')
+
+    with pytest.raises(ValueError):
+        client.call(rejected)
+    assert client.breaker.state == 'closed'
+
+    def unreachable():
+        raise requests.ConnectionError('refused')
+
+    with pytest.raises(requests.ConnectionError):
+        client.call(unreachable)
+    assert client.breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        client.call(rejected)
+
+
+def test_open_circuit_serves_cached_deals(client, monkeypatch):
+    from services import api_service
+    from services.api_service import cheapshark_http, deals_cache, get_game_deals
+
+    monkeypatch.setattr(api_service, 'CHEAPSHARK_API_URL', closed_port_url())
+    monkeypatch.setattr(deals_cache, 'negative_ttl', 0)
+    monkeypatch.setattr(cheapshark_http, 'retries', 0)
+    monkeypatch.setattr(cheapshark_http.breaker, 'failure_threshold', 1)
+
+    assert get_game_deals() == []
+    started = time.monotonic()
+    assert get_game_deals() == []
+    assert time.monotonic() - started < 0.1
+    assert cheapshark_http.stats()['short_circuits'] == 1
+
+
+def test_oauth_sessions_share_the_pool():
+    from services.oauth_client import PooledOAuth2Session
+
+    with StubServer({'/token': lambda: (200, {'access_token': 'a', 'token_type': 'Bearer'})}) as server:
+        for _ in range(2):
+            with PooledOAuth2Session(client_id='c', client_secret='s') as session:
+                assert session.post(server.url + '/token', withhold_token=True).status_code == 200
+
+        # La segunda sesión reutiliza la conexión de la primera
+        assert len(server.peers) == 1
@@ -0,0 +1,171 @@
+from conftest import *
+import io
+from datetime import timedelta
+from models.models import Job, utcnow
+from services.job_service import (job, job_handlers, enqueue, claim_jobs, finish_job, fail_job, schedule_periodic_jobs,
+                                  queue_stats, retry_failed_jobs, Worker)
+from services.storage_service import upload_path, release_uploads, collect_unreferenced_uploads
+
+calls = []
+
+
+@pytest.fixture
+def app(client):
+    app = client.application
+    # Sin trabajos periódicos salvo en las pruebas que los activan
+    app.config.update(SWEEP_INTERVAL=0, STATS_RECONCILE_INTERVAL=0, JOB_RETRY_BACKOFF=0, UPLOAD_COLLECT_DELAY=0,
+                      SWEEPER_THREAD=False)
+    calls.clear()
+    yield app
+    for name in [name for name in job_handlers if name.startswith('test.')]:
+        del job_handlers[name]
+
+
+@pytest.fixture
+def handlers(app):
+    @job('test.echo')
+    def echo(text):
+        calls.append(text)
+
+    @job('test.broken', max_attempts=2)
+    def broken():
+        calls.append('broken')
+        raise RuntimeError('upstream down')
+
+
+def test_jobs_are_committed_with_the_request_transaction(app, handlers):
+    enqueue('test.echo', {'text': 'lost'})
+    db.session.rollback()
+    enqueue('test.echo', {'text': 'kept'})
+    db.session.commit()
+
+    assert Worker(app, concurrency=1).run(burst=True) == 1
+    assert calls == ['kept']
+    assert Job.query.count() == 0
+
+
+def test_keyed_jobs_are_not_duplicated(app, handlers):
+    assert enqueue('test.echo', {'text': 'a'}, key='echo') is not None
+    assert enqueue('test.echo', {'text': 'b'}, key='echo') is None
+    db.session.commit()
+    assert queue_stats() == {'queued': 1, 'running': 0, 'failed': 0}
+
+
+def test_delayed_jobs_wait_until_due(app, handlers):
+    enqueue('test.echo', {'text': 'later'}, delay=60)
+    db.session.commit()
+
+    assert Worker(app, concurrency=1).run(burst=True) == 0
+    assert claim_jobs('w', 10) == []
+
+
+def test_failing_jobs_are_retried_then_kept_as_failed(app, handlers):
+    enqueue('test.broken', key='broken')
+    db.session.commit()
+
+    Worker(app, concurrency=1).run(burst=True)
+
+    assert calls == ['broken', 'broken']
+    failed = Job.query.one()
+    assert (failed.status, failed.attempts, failed.key) == ('failed', 2, None)
+    assert 'upstream down' in failed.last_error
+
+    assert retry_failed_jobs() == 1
+    assert Job.query.one().status == 'queued'
+
+
+def test_expired_claims_are_taken_over(app, handlers):
+    enqueue('test.echo', {'text': 'slow'})
+    db.session.commit()
+    [first] = claim_jobs('worker-a', 1, visibility_timeout=30)
+    assert claim_jobs('worker-b', 1) == []
+
+    # worker-a dejó de responder: su reclamación caduca
+    db.session.execute(db.update(Job).values(locked_until=utcnow() - timedelta(seconds=1)))
+    db.session.commit()
+    [second] = claim_jobs('worker-b', 1)
+    assert second.id == first.id and second.attempts == 2
+
+    # worker-a ya no puede cerrar un trabajo que ahora es de worker-b
+    finish_job(first, 'worker-a', app.config)
+    assert Job.query.one().locked_by == 'worker-b'
+    assert fail_job(second, 'worker-b', 'boom', app.config) == 'retry'
+    assert Job.query.one().status == 'queued'
+
+
+def test_periodic_jobs_keep_one_instance(app, authenticated_client):
+    app.config['STATS_RECONCILE_INTERVAL'] = 3600
+    assert schedule_periodic_jobs(app.config) == ['stats.reconcile']
+    assert schedule_periodic_jobs(app.config) == []
+
+    Worker(app, concurrency=1).run(burst=True)
+
+    periodic = Job.query.one()
+    assert periodic.key == 'periodic:stats.reconcile' and periodic.status == 'queued'
+    assert periodic.run_at > utcnow() + timedelta(minutes=59)
+
+
+def test_released_uploads_are_collected_by_a_job(app, authenticated_client):
+    authenticated_client.post('/tasks/dashboard', data={
+        'title': 'Picture', 'priority': 2, 'image': (io.BytesIO(b'first picture'), 'first.png')
+    })
+    task = Task.query.filter_by(title='Picture').first()
+    old_path = upload_path(task.image)
+
+    authenticated_client.post(f'/tasks/edit_task/{task.id}', data={
+        'title': 'Picture', 'priority': 2, 'image': (io.BytesIO(b'second picture'), 'second.png')
+    })
+    assert os.path.exists(old_path)
+    assert Job.query.filter_by(name='uploads.collect').count() == 1
+
+    Worker(app, concurrency=1).run(burst=True)
+    assert not os.path.exists(old_path)
+
+
+def test_uploads_released_during_a_collection_get_another_one(app, mocker):
+    app.config['UPLOAD_COLLECT_DELAY'] = 60
+    clock = mocker.patch('services.storage_service.time.time', return_value=1000.0)
+    release_uploads(['a.png'])
+    release_uploads(['b.png'])
+    db.session.commit()
+    [first] = Job.query.filter_by(name='uploads.collect').all()
+    assert first.run_at >= utcnow() + timedelta(seconds=19)
+
+    # La recogida de la primera ventana está en marcha cuando se libera otro archivo
+    db.session.execute(db.update(Job).values(run_at=utcnow()))
+    db.session.commit()
+    assert [job.id for job in claim_jobs('worker-a', 1)] == [first.id]
+    clock.return_value = 1030.0
+    release_uploads(['c.png'])
+    db.session.commit()
+
+    assert Job.query.filter_by(name='uploads.collect', status='queued').count() == 1
+
+
+def test_released_uploads_are_left_to_the_sweeper_thread(app):
+    # Sin `flask worker` no se encola nada: el barrido recoge los archivos
+    app.config['SWEEPER_THREAD'] = True
+    release_uploads(['a.png'])
+    db.session.commit()
+    assert Job.query.filter_by(name='uploads.collect').count() == 0
+
+    # Los trabajos encolados antes se descartan al recoger
+    app.config['SWEEPER_THREAD'] = False
+    release_uploads(['b.png'])
+    db.session.commit()
+    collect_unreferenced_uploads()
+    assert Job.query.filter_by(name='uploads.collect').count() == 0
+
+
+def test_worker_cli(app, handlers):
+    enqueue('test.echo', {'text': 'from cli'})
+    db.session.commit()
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(args=['worker', '--burst', '--concurrency', '1'])
+    assert result.exit_code == 0, result.output
+    assert 'Processed 1 jobs.' in result.output
+    assert calls == ['from cli']
+
+    result = runner.invoke(args=['jobs', 'status'])
+    assert 'queued: 0' in result.output
@@ -0,0 +1,81 @@
+from conftest import *
+import json
+import requests
+from benchmarks.stubs import StubServer
+from services import api_service
+from services.api_service import fetch_game_deals
+from services.metrics_service import MetricsRegistry
+from config import validate_config
+
+
+def test_registry_renders_counters_and_cumulative_histograms():
+    registry = MetricsRegistry()
+    registry.inc('jobs_total', {'queue': 'default'}, 2)
+    registry.observe('latency_seconds', 0.02, {'endpoint': 'a'}, buckets=(0.01, 0.1))
+    registry.observe('latency_seconds', 0.5, {'endpoint': 'a'}, buckets=(0.01, 0.1))
+
+    text = registry.render()
+    assert '# TYPE jobs_total counter' in text
+    assert 'jobs_total{queue="default"} 2' in text
+    assert 'latency_seconds_bucket{endpoint="a",le="0.01"} 0' in text
+    assert 'latency_seconds_bucket{endpoint="a",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{endpoint="a",le="+Inf"} 2' in text
+    assert 'latency_seconds_count{endpoint="a"} 2' in text
+
+
+def test_registry_adds_up_every_worker_file(tmp_path):
+    registry = MetricsRegistry(directory=str(tmp_path))
+    registry.inc('cache_hits_total', {'cache': 'deals'}, 3)
+    registry.inc('cache_misses_total', {'cache': 'deals'}, 1)
+    # Fichero dejado por otro worker (quizá ya terminado)
+    (tmp_path / '999999.json').write_text(json.dumps({
+        'pid': 999999,
+        'counters': {'cache_hits_total': [[{'cache': 'deals'}, 4]]},
+        'histograms': {},
+    }))
+
+    text = registry.render()
+    assert 'cache_hits_total{cache="deals"} 7' in text
+    assert 'cache_hit_ratio{cache="deals"} 0.875' in text
+
+
+def test_metrics_endpoint_reports_requests_and_sql(authenticated_client, mocker):
+    mocker.patch('services.api_service.fetch_game_deals', return_value=[])
+    authenticated_client.get('/tasks/dashboard')
+
+    response = authenticated_client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{endpoint="tasks.dashboard",method="GET",status="200"} 1' in text
+    assert 'sql_queries_per_request_count{endpoint="tasks.dashboard"} 1' in text
+    assert 'sql_queries_per_request_bucket{endpoint="tasks.dashboard",le="1.0"} 0' in text
+    assert 'cache_hits_total{cache="task_list_fragments"}' in text
+
+
+def test_metrics_endpoint_requires_token_when_configured(client):
+    client.application.config['METRICS_TOKEN'] = 'secret'
+    assert client.get('/metrics').status_code == 403
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 403
+    assert client.get('/metrics', headers={'Authorization': 'Bearer secret'}).status_code == 200
+
+
+def test_metrics_need_a_token_outside_development():
+    config = {'OAUTH_CLIENT_ID': 'id', 'OAUTH_CLIENT_SECRET': 'secret', 'OAUTH_REDIRECT_URI': 'http://localhost/cb',
+              'METRICS_ENABLED': True}
+    with pytest.raises(ValueError):
+        validate_config(config)
+
+    validate_config(dict(config, METRICS_TOKEN='secret'))
+    validate_config(dict(config, DEBUG=True))
+    validate_config(dict(config, METRICS_ENABLED=False))
+
+
+def test_outbound_calls_are_timed(client, monkeypatch):
+    with StubServer({'/deals': lambda: (500, {'error': 'down'})}) as cheapshark:
+        monkeypatch.setattr(api_service, 'CHEAPSHARK_API_URL', cheapshark.url + '/deals')
+        with pytest.raises(requests.RequestException):
+            fetch_game_deals()
+
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'outbound_request_duration_seconds_count{outcome="error",service="cheapshark"} 1' in text
@@ -0,0 +1,71 @@
+from conftest import *
+import sqlalchemy as sa
+from services.migration_service import MIGRATIONS, upgrade, pending_migrations
+
+
+@pytest.fixture
+def engine():
+    return sa.create_engine('sqlite://')
+
+
+def test_upgrade_applies_every_migration_once(engine):
+    applied = upgrade(engine)
+    assert [migration.version for migration in applied] == [migration.version for migration in MIGRATIONS]
+
+    assert upgrade(engine) == []
+    assert pending_migrations(engine) == []
+
+
+def test_upgrade_matches_models(engine):
+    upgrade(engine)
+    inspector = sa.inspect(engine)
+
+    for table in db.metadata.sorted_tables:
+        columns = {column['name'] for column in inspector.get_columns(table.name)}
+        assert columns == {column.name for column in table.columns}, table.name
+        indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        assert {index.name for index in table.indexes} <= indexes, table.name
+
+
+def test_upgrade_existing_database_created_with_create_all(engine):
+    with engine.begin() as connection:
+        MIGRATIONS[0].apply(connection)
+        connection.execute(sa.text("INSERT INTO user (username) VALUES ('legacy')"))
+
+    upgrade(engine)
+
+    with engine.connect() as connection:
+        assert connection.execute(sa.text('SELECT username FROM user')).scalar() == 'legacy'
+    assert 'ix_task_user_complete_priority_id' in {index['name'] for index in sa.inspect(engine).get_indexes('task')}
+
+
+def test_upgrade_to_target(engine):
+    applied = upgrade(engine, target=1)
+    assert [migration.version for migration in applied] == [1]
+    assert pending_migrations(engine)[0].version == 2
+
+
+def test_db_cli_commands(client):
+    runner = client.application.test_cli_runner()
+
+    result = runner.invoke(args=['db', 'status'])
+    assert '0001' in result.output
+
+    result = runner.invoke(args=['db', 'upgrade'])
+    assert result.exit_code == 0
+
+
+def test_soft_delete_migration_makes_listing_index_partial(engine):
+    upgrade(engine, target=6)
+    with engine.begin() as connection:
+        connection.execute(sa.text("INSERT INTO user (username) VALUES ('legacy')"))
+        connection.execute(sa.text("INSERT INTO task (title, priority, user_id) VALUES ('Old', 1, 1)"))
+
+    upgrade(engine)
+
+    with engine.connect() as connection:
+        assert connection.execute(sa.text('SELECT deleted_at FROM task')).all() == [(None,)]
+        index_sql = connection.execute(sa.text(
+            "SELECT sql FROM sqlite_master WHERE name = 'ix_task_user_complete_priority_id'"
+        )).scalar()
+    assert index_sql.endswith('WHERE deleted_at IS NULL')
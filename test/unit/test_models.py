@@ -43,3 +43,14 @@ def test_delete_task():
     except NameError:
         task = None
     assert task is None
+
+
+def test_apply_sqlite_pragmas():
+    from sqlalchemy import create_engine, text
+    from models.models import apply_sqlite_pragmas
+
+    engine = create_engine('sqlite://')
+    apply_sqlite_pragmas(engine, {'cache_size': -2000, 'temp_store': 'MEMORY'})
+    with engine.connect() as connection:
+        assert connection.execute(text('PRAGMA cache_size')).scalar() == -2000
+        assert connection.execute(text('PRAGMA temp_store')).scalar() == 2
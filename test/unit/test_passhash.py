@@ -1,7 +1,73 @@
 from conftest import *
+import hashlib
+import threading
+from services.auth_service import get_user_by_username
+from services.password_service import HashingExecutor, HashingOverloaded, needs_rehash, _method_prefix
 
 def test_password_hash():
     password = "SuperSecret"
     hashed_password = generate_password_hash(password)
     assert password != hashed_password
     assert hashed_password.startswith('scrypt:')
+
+
+def test_login_upgrades_outdated_hash(client):
+    app = client.application
+    with app.app_context():
+        user = User(username='legacy', password=generate_password_hash('secret', method='pbkdf2:sha256:1000'))
+        db.session.add(user)
+        db.session.commit()
+        assert needs_rehash(user.password)
+
+        response = client.post('/auth/login', data={'username': 'legacy', 'password': 'secret'})
+        assert response.status_code == 302
+
+        upgraded = get_user_by_username('legacy').password
+        assert upgraded.startswith('scrypt:')
+        assert not needs_rehash(upgraded)
+
+
+def test_method_prefix_matches_werkzeug_without_hashing(mocker):
+    methods = ['scrypt', 'scrypt:16384:8:1', 'pbkdf2', 'pbkdf2:sha512', 'pbkdf2:sha256:1000']
+    expected = {method: generate_password_hash('', method=method).split('$')[0] for method in methods}
+    scrypt = mocker.spy(hashlib, 'scrypt')
+    pbkdf2 = mocker.spy(hashlib, 'pbkdf2_hmac')
+
+    assert {method: _method_prefix(method) for method in methods} == expected
+    assert scrypt.call_count == pbkdf2.call_count == 0
+    with pytest.raises(ValueError):
+        _method_prefix('md5')
+
+
+def test_hashing_executor_rejects_when_full():
+    executor = HashingExecutor(workers=1, queue_limit=0, timeout=5)
+    started, release = threading.Event(), threading.Event()
+
+    def slow_hash():
+        started.set()
+        release.wait(5)
+        return 'hash'
+
+    worker = threading.Thread(target=executor.run, args=(slow_hash,))
+    worker.start()
+    started.wait(5)
+
+    with pytest.raises(HashingOverloaded):
+        executor.run(lambda: 'hash')
+
+    release.set()
+    worker.join()
+    assert executor.run(lambda: 'hash') == 'hash'
+    assert executor.stats()['rejected'] == 1
+
+
+def test_login_returns_503_when_hashing_overloaded(client, mocker):
+    with client.application.app_context():
+        db.session.add(User(username='busy', password=generate_password_hash('secret')))
+        db.session.commit()
+
+    mocker.patch('services.auth_service.verify_password', side_effect=HashingOverloaded)
+    response = client.post('/auth/login', data={'username': 'busy', 'password': 'secret'})
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
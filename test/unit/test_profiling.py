@@ -0,0 +1,42 @@
+from conftest import *
+import json
+import pstats
+from services.profiling_service import init_profiling
+
+
+def enable_profiling(app, tmp_path, **config):
+    app.config.update(PROFILE_DIR=str(tmp_path), **config)
+    return init_profiling(app)
+
+
+def test_profiling_disabled_installs_nothing(client):
+    wsgi_app = client.application.wsgi_app
+    assert init_profiling(client.application) is None
+    assert client.application.wsgi_app == wsgi_app
+
+
+def test_profile_written_for_authorized_header(client, tmp_path):
+    enable_profiling(client.application, tmp_path, PROFILE_TOKEN='let-me-profile')
+
+    assert client.get('/auth/login', headers={'X-Profile': 'wrong'}).status_code == 200
+    assert list(tmp_path.iterdir()) == []
+
+    response = client.get('/auth/login', headers={'X-Profile': 'let-me-profile'})
+    profile_id = response.headers['X-Profile-Id']
+    metadata = json.loads((tmp_path / f'{profile_id}.json').read_text())
+    assert metadata['endpoint'] == 'auth.login'
+    assert metadata['status'].startswith('200')
+    assert metadata['trigger'] == 'header'
+    assert metadata['duration_ms'] > 0
+    assert 'render_template' in metadata['summary']
+    assert pstats.Stats(str(tmp_path / f'{profile_id}.prof')).total_calls > 0
+
+
+def test_sampling_profiles_and_prunes_old_files(client, tmp_path):
+    enable_profiling(client.application, tmp_path, PROFILE_SAMPLE_RATE=1.0, PROFILE_MAX_FILES=2)
+    for _ in range(3):
+        client.get('/auth/login')
+
+    profiles = sorted(path.name for path in tmp_path.iterdir())
+    assert len([name for name in profiles if name.endswith('.prof')]) == 2
+    assert len([name for name in profiles if name.endswith('.json')]) == 2
@@ -0,0 +1,67 @@
+from conftest import *
+import logging
+from services.query_audit_service import init_query_audit
+
+PARTIAL = {'X-Requested-With': 'fetch'}
+
+
+def seed_tasks(count):
+    user = User.query.filter_by(username='testuser').first()
+    tasks = [Task(title=f'Task {i}', priority=i % 4 + 1, owner=user) for i in range(count)]
+    db.session.add_all(tasks)
+    db.session.commit()
+    return [task.id for task in tasks]
+
+
+def test_hot_endpoints_query_budget(authenticated_client, assert_max_queries, mocker):
+    mocker.patch('services.api_service.fetch_game_deals', return_value=[])
+    ids = seed_tasks(60)
+    authenticated_client.get('/tasks/dashboard')
+
+    # Versión de la lista + una página de tareas, sin importar cuántas haya
+    with assert_max_queries(2):
+        authenticated_client.get('/tasks/dashboard?status=all')
+    with assert_max_queries(2):
+        authenticated_client.get('/api/v1/tasks?limit=50')
+    # Cargar la tarea, actualizarla, ajustar sus contadores, subir la versión y releerla para el fragmento
+    with assert_max_queries(5):
+        authenticated_client.post(f'/tasks/toggle_complete/{ids[0]}', headers=PARTIAL)
+    # Un lote se resuelve con una sola carga, UPDATEs agrupados y un único ajuste de los
+    # contadores, no una consulta por tarea
+    with assert_max_queries(4):
+        authenticated_client.post('/api/v1/tasks/batch', json={
+            'operations': [{'op': 'toggle', 'id': task_id} for task_id in ids[:40]]
+        })
+
+
+def test_query_audit_logs_slow_queries_with_plan_and_repeated_statements(client, caplog):
+    app = client.application
+    app.config.update(QUERY_AUDIT_ENABLED=True, SLOW_QUERY_MS=0, QUERY_REPEAT_THRESHOLD=3)
+    init_query_audit(app, db.engine)
+
+    user = User(username='audited')
+    db.session.add(user)
+    db.session.commit()
+    ids = []
+    for i in range(4):
+        task = Task(title=f'Task {i}', priority=1, owner=user)
+        db.session.add(task)
+        db.session.commit()
+        ids.append(task.id)
+
+    @app.route('/n-plus-one')
+    def n_plus_one():
+        db.session.expunge_all()
+        return ','.join(db.session.get(Task, task_id).title for task_id in ids)
+
+    with caplog.at_level(logging.WARNING, logger='services.query_audit_service'):
+        client.get('/n-plus-one')
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert any(message.startswith('Slow query') and 'Query plan:' in message and 'task' in message
+               for message in messages)
+    assert any(message.startswith('Possible N+1 in GET n_plus_one: 4 executions') for message in messages)
+
+
+def test_query_audit_disabled_by_default(client):
+    assert init_query_audit(client.application, db.engine) is None
@@ -0,0 +1,94 @@
+from conftest import *
+from sqlalchemy import text
+from services.search_service import build_match_query, search_tasks, rebuild_index
+
+
+def current_user_row():
+    return User.query.filter_by(username='testuser').first()
+
+
+def test_build_match_query_quotes_words():
+    assert build_match_query('pay "bills" OR NEAR(') == '"pay"* "bills"* "OR"* "NEAR"*'
+    assert build_match_query('  ?! ') is None
+
+
+def test_created_tasks_are_searchable_by_prefix(authenticated_client):
+    authenticated_client.post('/tasks/dashboard', data={
+        'title': 'Renew passport', 'description': 'Bring photos', 'priority': 2
+    }, follow_redirects=True)
+    user = current_user_row()
+
+    tasks, has_next = search_tasks(user, 'pass')
+    assert [task.title for task in tasks] == ['Renew passport']
+    assert has_next is False
+    assert search_tasks(user, 'phot')[0][0].title == 'Renew passport'
+    assert search_tasks(user, 'holiday') == ([], False)
+
+
+def test_search_ranks_title_matches_first_and_paginates(authenticated_client):
+    user = current_user_row()
+    response = authenticated_client.post('/api/v1/tasks/batch', json={'operations': [
+        {'op': 'create', 'title': 'Call the bank', 'description': 'About the garden loan', 'priority': 1},
+        {'op': 'create', 'title': 'Garden', 'description': 'Water the plants', 'priority': 4},
+        {'op': 'create', 'title': 'Garden fence', 'priority': 3},
+    ]})
+    assert response.get_json()['succeeded'] == 3
+
+    first_page, has_next = search_tasks(user, 'garden', page=1, per_page=2)
+    second_page, last = search_tasks(user, 'garden', page=2, per_page=2)
+    assert has_next is True and last is False
+    assert {task.title for task in first_page} == {'Garden', 'Garden fence'}
+    assert [task.title for task in second_page] == ['Call the bank']
+
+
+def test_search_index_follows_updates_and_deletes(authenticated_client):
+    created = authenticated_client.post('/api/v1/tasks/batch', json={'operations': [
+        {'op': 'create', 'title': 'Old title', 'priority': 1},
+    ]}).get_json()['results'][0]['task']
+    user = current_user_row()
+
+    authenticated_client.post(f"/tasks/edit_task/{created['id']}", data={
+        'title': 'Dentist appointment', 'description': '', 'priority': 1
+    })
+    assert search_tasks(user, 'old')[0] == []
+    assert [task.id for task in search_tasks(user, 'dentist')[0]] == [created['id']]
+
+    authenticated_client.post('/api/v1/tasks/batch', json={'operations': [{'op': 'delete', 'id': created['id']}]})
+    assert search_tasks(user, 'dentist')[0] == []
+    assert db.session.execute(text("SELECT count(*) FROM task_fts")).scalar() == 0
+
+
+def test_search_only_returns_own_tasks(authenticated_client):
+    other = User(username='other')
+    db.session.add(other)
+    db.session.commit()
+    db.session.add(Task(title='Secret plan', priority=1, owner=other))
+    db.session.commit()
+    rebuild_index()
+
+    response = authenticated_client.get('/api/v1/tasks/search?q=secret')
+    assert response.status_code == 200
+    assert response.get_json() == {'tasks': [], 'next_page': None}
+
+
+def test_rebuild_index_indexes_existing_tasks(client):
+    user = User(username='legacy')
+    db.session.add(user)
+    db.session.commit()
+    db.session.add(Task(title='Imported groceries', priority=2, owner=user))
+    db.session.commit()
+    assert search_tasks(user, 'groceries')[0] == []
+
+    result = client.application.test_cli_runner().invoke(args=['search', 'rebuild'])
+    assert 'Indexed 1 tasks.' in result.output
+    assert [task.title for task in search_tasks(user, 'groceries')[0]] == ['Imported groceries']
+
+
+def test_search_page_renders_results(authenticated_client):
+    authenticated_client.post('/api/v1/tasks/batch', json={'operations': [
+        {'op': 'create', 'title': 'Book flights', 'priority': 2},
+    ]})
+    response = authenticated_client.get('/tasks/search?q=flig')
+    assert response.status_code == 200
+    assert b'Book flights' in response.data
+    assert authenticated_client.get('/api/v1/tasks/search').status_code == 400
@@ -0,0 +1,62 @@
+from conftest import *
+import importlib.util
+from types import SimpleNamespace
+from services import startup_service
+from services.startup_service import after_fork, measure_startup, summarize_startup
+
+
+def sample(total, deferred=()):
+    return {'process_ms': total + 200, 'import_ms': total - 50, 'create_app_ms': 30, 'first_request_ms': 20,
+            'total_ms': total, 'deferred_loaded': list(deferred)}
+
+
+def load_gunicorn_config():
+    spec = importlib.util.spec_from_file_location('gunicorn_conf', os.path.join(startup_service.ROOT_DIR, 'gunicorn.conf.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_cold_start_defers_heavy_imports():
+    samples = measure_startup(runs=1)
+
+    assert samples[0]['deferred_loaded'] == []
+    assert samples[0]['total_ms'] > 0
+    assert samples[0]['process_ms'] > samples[0]['import_ms']
+
+
+def test_summarize_startup():
+    summary = summarize_startup([sample(400), sample(600, ['requests']), sample(500)])
+
+    assert summary['total_ms'] == {'median_ms': 500, 'max_ms': 600}
+    assert summary['deferred_loaded'] == ['requests']
+
+
+def test_perf_startup_enforces_budget(client, mocker):
+    mocker.patch('cli.measure_startup', return_value=[sample(400), sample(500)])
+    runner = client.application.test_cli_runner()
+
+    result = runner.invoke(args=['perf', 'startup', '--budget-ms', '1000'])
+    assert result.exit_code == 0, result.output
+    assert 'Within the 1000 ms startup budget' in result.output
+
+    result = runner.invoke(args=['perf', 'startup', '--budget-ms', '300'])
+    assert result.exit_code == 1
+    assert 'over the 300 ms budget' in result.output
+
+
+def test_after_fork_disposes_pooled_connections(client, mocker):
+    dispose = mocker.spy(db.engine, 'dispose')
+    after_fork(client.application)
+    dispose.assert_called_once_with(close=False)
+
+
+def test_gunicorn_start_clears_metrics_dir(tmp_path, monkeypatch):
+    (tmp_path / '123.json').write_text('{}')
+    monkeypatch.setenv('METRICS_DIR', str(tmp_path))
+    config = load_gunicorn_config()
+
+    config.on_starting(SimpleNamespace(cfg=SimpleNamespace(preload_app=False)))
+
+    assert config.preload_app is True
+    assert list(tmp_path.iterdir()) == []
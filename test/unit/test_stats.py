@@ -0,0 +1,120 @@
+from conftest import *
+from types import SimpleNamespace
+import sqlalchemy as sa
+from sqlalchemy import text
+from models.models import TaskStat
+from services.stats_service import count_tasks, get_task_stats, reconcile_task_stats
+from services.task_service import get_task_list_version
+
+PARTIAL = {'X-Requested-With': 'fetch'}
+
+
+def current_user_row():
+    return User.query.filter_by(username='testuser').first()
+
+
+def add_task(client, title, priority):
+    response = client.post('/tasks/dashboard', data={'title': title, 'priority': str(priority)}, headers=PARTIAL)
+    assert response.status_code == 201
+    return Task.query.filter_by(title=title).first().id
+
+
+def stored_counters(user):
+    return {(stat.user_id, stat.priority, stat.is_complete): stat.count
+            for stat in TaskStat.query.filter_by(user_id=user.id) if stat.count}
+
+
+def test_counters_follow_task_changes(authenticated_client):
+    first = add_task(authenticated_client, 'Pay rent', 4)
+    second = add_task(authenticated_client, 'Water plants', 1)
+    add_task(authenticated_client, 'Call mum', 1)
+
+    authenticated_client.post(f'/tasks/toggle_complete/{second}', headers=PARTIAL)
+    authenticated_client.post(f'/tasks/edit_task/{first}', data={'title': 'Pay rent', 'priority': '2'},
+                              headers=PARTIAL)
+
+    response = authenticated_client.get('/api/v1/tasks/stats')
+    assert response.get_json() == {
+        'total': 3, 'open': 2, 'done': 1,
+        'by_priority': {'1': {'open': 1, 'done': 1, 'total': 2}, '2': {'open': 1, 'done': 0, 'total': 1}},
+    }
+    user = current_user_row()
+    assert stored_counters(user) == count_tasks(user.id)
+
+
+def test_batch_and_import_update_counters(authenticated_client):
+    ids = [add_task(authenticated_client, f'Task {n}', 3) for n in range(3)]
+    authenticated_client.post('/api/v1/tasks/batch', json={'operations': [
+        {'op': 'create', 'title': 'New', 'priority': 1, 'is_complete': True},
+        {'op': 'update', 'id': ids[0], 'priority': 4},
+        {'op': 'toggle', 'id': ids[1]},
+        {'op': 'delete', 'id': ids[2]},
+        {'op': 'delete', 'id': 999},
+    ]})
+    authenticated_client.post('/api/v1/tasks/import', data='title,priority,is_complete\nA,2,yes\nB,2,no\n',
+                              content_type='text/csv')
+
+    user = current_user_row()
+    assert stored_counters(user) == count_tasks(user.id)
+    stats = get_task_stats(user)
+    assert (stats['total'], stats['open'], stats['done']) == (5, 2, 3)
+
+
+def test_reads_do_not_scan_tasks(authenticated_client, assert_max_queries):
+    user = SimpleNamespace(id=current_user_row().id)
+    add_task(authenticated_client, 'Only task', 2)
+
+    with assert_max_queries(1) as statements:
+        assert get_task_stats(user)['total'] == 1
+    assert 'FROM task_stat' in statements[0] and 'FROM task ' not in statements[0]
+
+
+def test_reconcile_fixes_drifted_counters(authenticated_client):
+    add_task(authenticated_client, 'Kept', 1)
+    user = current_user_row()
+    # Cambios hechos por fuera de la aplicación
+    db.session.execute(text("INSERT INTO task (title, priority, is_complete, user_id) VALUES ('Raw', 3, 1, :id)"),
+                       {'id': user.id})
+    db.session.execute(text("UPDATE task_stat SET count = 7 WHERE priority = 1"))
+    db.session.commit()
+    version = get_task_list_version(user)
+
+    assert reconcile_task_stats() == 2
+    assert stored_counters(user) == count_tasks(user.id)
+    assert get_task_list_version(user) > version
+    assert reconcile_task_stats(user.id) == 0
+
+
+def test_reconcile_blocks_task_writers_while_counting(authenticated_client, mocker):
+    add_task(authenticated_client, 'Kept', 1)
+    writer = sa.create_engine(db.engine.url, connect_args={'timeout': 0})
+    blocked = []
+
+    def count_while_writing(user_id=None):
+        # Otro proceso intenta crear una tarea entre la lectura de tareas y la de contadores
+        try:
+            with writer.begin() as connection:
+                connection.execute(text("INSERT INTO task (title, priority, user_id) VALUES ('Late', 1, 1)"))
+        except sa.exc.OperationalError:
+            blocked.append(True)
+        return count_tasks(user_id)
+
+    mocker.patch('services.stats_service.count_tasks', side_effect=count_while_writing)
+    assert reconcile_task_stats() == 0
+    writer.dispose()
+    assert blocked == [True]
+
+
+def test_dashboard_header_shows_counts(authenticated_client):
+    add_task(authenticated_client, 'Pay rent', 4)
+
+    response = authenticated_client.get('/tasks/dashboard')
+    assert b'1 pending, 0 completed' in response.data
+
+
+def test_cli_reconcile(authenticated_client):
+    runner = authenticated_client.application.test_cli_runner()
+
+    result = runner.invoke(args=['stats', 'reconcile', '--user', 'testuser'])
+    assert result.exit_code == 0, result.output
+    assert 'Task counters are up to date.' in result.output
@@ -0,0 +1,176 @@
+from conftest import *
+import io
+import json
+import re
+from datetime import timedelta
+from models.models import Attachment, utcnow
+from services.search_service import search_tasks
+from services.stats_service import get_task_stats, reconcile_task_stats
+from services.storage_service import upload_path, collect_unreferenced_uploads
+from services.sweeper_service import purge_deleted_tasks, sweep
+from services.task_service import delete_tasks
+
+PARTIAL = {'X-Requested-With': 'fetch'}
+
+
+def current_user_row():
+    return User.query.filter_by(username='testuser').first()
+
+
+def add_task(client, title, priority=2, image=None):
+    data = {'title': title, 'priority': str(priority)}
+    if image:
+        data['image'] = (io.BytesIO(image), f'{title}.png')
+    client.post('/tasks/dashboard', data=data, headers=PARTIAL)
+    return Task.query.filter_by(title=title).first()
+
+
+def test_deleted_task_disappears_everywhere(authenticated_client):
+    kept = add_task(authenticated_client, 'Garden plants', 1)
+    gone = add_task(authenticated_client, 'Garden fence', 3)
+
+    response = authenticated_client.post(f'/tasks/delete_task/{gone.id}', headers=PARTIAL)
+    assert response.status_code == 204
+    assert authenticated_client.post(f'/tasks/delete_task/{gone.id}', headers=PARTIAL).status_code == 404
+
+    user = current_user_row()
+    listed = authenticated_client.get('/api/v1/tasks').get_json()['tasks']
+    assert [task['id'] for task in listed] == [kept.id]
+    assert [task.id for task in search_tasks(user, 'garden')[0]] == [kept.id]
+    assert get_task_stats(user)['total'] == 1
+    exported = authenticated_client.get('/api/v1/tasks/export?format=ndjson').get_data(as_text=True)
+    assert [json.loads(line)['id'] for line in exported.splitlines()] == [kept.id]
+    assert authenticated_client.post(f'/tasks/toggle_complete/{gone.id}', headers=PARTIAL).status_code == 404
+    assert db.session.get(Task, gone.id).deleted_at is not None
+
+
+def test_delete_form_requires_csrf_token(authenticated_client):
+    task = add_task(authenticated_client, 'Keep me')
+    task_id = task.id
+    authenticated_client.application.config['WTF_CSRF_ENABLED'] = True
+
+    response = authenticated_client.post(f'/tasks/delete_task/{task_id}', headers=PARTIAL)
+    assert response.status_code == 400
+    assert db.session.get(Task, task_id).deleted_at is None
+
+    page = authenticated_client.get('/tasks/dashboard').get_data(as_text=True)
+    token = re.search(r'task-delete.*?name="csrf_token" value="([^"]+)"', page, re.S).group(1)
+    response = authenticated_client.post(f'/tasks/delete_task/{task_id}', data={'csrf_token': token},
+                                         headers=PARTIAL)
+    assert response.status_code == 204
+
+
+def test_bulk_delete_costs_the_same_for_any_number_of_tasks(authenticated_client, assert_max_queries):
+    user = current_user_row()
+    tasks = [Task(title=f'Task {n}', priority=n % 4 + 1, is_complete=n % 2 == 0, owner=user) for n in range(2000)]
+    db.session.add_all(tasks)
+    db.session.commit()
+    ids = [task.id for task in tasks]
+    reconcile_task_stats()
+    authenticated_client.get('/api/v1/tasks/stats')
+
+    # Contar, quitar del índice, marcar, ajustar contadores y subir la versión
+    with assert_max_queries(6):
+        response = authenticated_client.post('/api/v1/tasks/delete', json={'status': 'done'})
+    assert response.get_json() == {'deleted': 1000}
+
+    response = authenticated_client.post('/api/v1/tasks/delete', json={'ids': [ids[1], ids[2], 10 ** 6]})
+    assert response.get_json() == {'deleted': 1}
+    assert authenticated_client.delete(f'/api/v1/tasks/{ids[3]}').status_code == 204
+    assert authenticated_client.delete(f'/api/v1/tasks/{ids[3]}').status_code == 404
+
+    stats = get_task_stats(current_user_row())
+    assert (stats['open'], stats['done']) == (998, 0)
+    assert authenticated_client.post('/api/v1/tasks/delete', json={'status': 'maybe'}).status_code == 400
+    assert authenticated_client.post('/api/v1/tasks/delete', json={}).status_code == 400
+
+
+def test_sweeper_purges_old_tasks_and_their_files(authenticated_client):
+    old = add_task(authenticated_client, 'Old', image=b'old picture')
+    recent = add_task(authenticated_client, 'Recent', image=b'recent picture')
+    old_id, old_image, recent_image = old.id, old.image, recent.image
+    path = upload_path(old_image)
+    delete_tasks(current_user_row(), [old_id, recent.id])
+    db.session.execute(db.update(Task).where(Task.id == old_id).values(deleted_at=utcnow() - timedelta(hours=2)))
+    db.session.commit()
+
+    # El borrado no toca los archivos
+    assert os.path.exists(path)
+
+    report = sweep(purge_after=3600)
+    assert report == {'purged_tasks': 1, 'deleted_files': 1}
+    assert not os.path.exists(path)
+    db.session.expunge_all()
+    assert db.session.get(Task, old_id) is None
+    assert Attachment.query.filter_by(filename=old_image).first() is None
+    assert os.path.exists(upload_path(recent_image))
+
+    assert purge_deleted_tasks(older_than=0) == 1
+    assert sweep(purge_after=0) == {'purged_tasks': 0, 'deleted_files': 1}
+
+
+def test_shared_upload_survives_purge(authenticated_client):
+    first = add_task(authenticated_client, 'First', image=b'same content')
+    second = add_task(authenticated_client, 'Second', image=b'same content')
+    delete_tasks(current_user_row(), [first.id])
+
+    assert sweep(purge_after=0) == {'purged_tasks': 1, 'deleted_files': 0}
+    assert os.path.exists(upload_path(second.image))
+    assert Attachment.query.filter_by(filename=second.image).first().ref_count == 1
+
+
+def test_upload_row_is_kept_when_its_file_cannot_be_deleted(authenticated_client, mocker):
+    broken = add_task(authenticated_client, 'Broken', image=b'locked picture')
+    other = add_task(authenticated_client, 'Other', image=b'other picture')
+    broken_image, other_image = broken.image, other.image
+    delete_tasks(current_user_row(), [broken.id, other.id])
+    purge_deleted_tasks(older_than=0)
+
+    remove = os.remove
+
+    def failing_remove(path):
+        if path == upload_path(broken_image):
+            raise PermissionError(path)
+        remove(path)
+
+    mocker.patch('services.storage_service.os.remove', side_effect=failing_remove)
+    assert collect_unreferenced_uploads(min_age=3600) == 1
+    db.session.expunge_all()
+    # El archivo que no se pudo borrar conserva su fila, y la próxima pasada lo vuelve a intentar
+    assert os.path.exists(upload_path(broken_image))
+    assert Attachment.query.filter_by(filename=broken_image).one().ref_count == 0
+    assert Attachment.query.filter_by(filename=other_image).first() is None
+
+    mocker.stopall()
+    assert collect_unreferenced_uploads(min_age=3600) == 1
+    assert not os.path.exists(upload_path(broken_image))
+    assert Attachment.query.filter_by(filename=broken_image).first() is None
+
+
+def test_orphan_files_are_checked_in_batches(authenticated_client, assert_max_queries):
+    folder = authenticated_client.application.config['UPLOAD_FOLDER']
+    legacy = add_task(authenticated_client, 'Legacy')
+    legacy.image = 'legacy.png'
+    db.session.commit()
+    names = ['legacy.png'] + [f'orphan-{n}.png' for n in range(5)]
+    for name in names:
+        with open(os.path.join(folder, name), 'wb') as file:
+            file.write(b'old')
+
+    with assert_max_queries(30) as statements:
+        collect_unreferenced_uploads(min_age=0, batch_size=2)
+
+    assert sorted(name for name in os.listdir(folder) if name in names) == ['legacy.png']
+    # Sólo se consultan los archivos encontrados, nunca la lista entera
+    lookups = [statement for statement in statements if 'task.image' in statement]
+    assert lookups and all(' IN ' in statement for statement in lookups)
+
+
+def test_cli_sweep(authenticated_client):
+    task = add_task(authenticated_client, 'Done')
+    delete_tasks(current_user_row(), [task.id])
+    runner = authenticated_client.application.test_cli_runner()
+
+    result = runner.invoke(args=['tasks', 'sweep', '--purge-after', '0'])
+    assert result.exit_code == 0, result.output
+    assert 'Purged 1 tasks' in result.output
@@ -1,7 +1,13 @@
 from conftest import *
 import io
+import hashlib
 from flask import url_for
-from services.task_service import validate_and_save_file, delete_old_file, get_tasks_by_user
+from werkzeug.datastructures import FileStorage
+from werkzeug.exceptions import RequestEntityTooLarge
+from models.models import Attachment
+import routes.tasks
+from services.storage_service import UploadSpool, collect_unreferenced_uploads
+from services.task_service import validate_and_save_file, delete_old_file, get_tasks_by_user, get_task_page, get_task_list_version
 
 
 def test_home_not_authenticated(client):
@@ -36,15 +42,15 @@ def test_create_task_valid(authenticated_client):
         assert task.priority == 4
 
 
-def test_validate_and_save_file(authenticated_client, mocker):
-    mock_file = mocker.Mock()
-    mock_file.filename = "sample_image.jpg"
-    mock_file.seek = mocker.Mock()
-    mock_file.tell.return_value = 1 * 1024 * 1024  # 1 MB
+def test_validate_and_save_file(authenticated_client):
+    content = b"x" * (1 * 1024 * 1024)  # 1 MB
+    file = FileStorage(stream=io.BytesIO(content), filename="sample_image.jpg")
 
-    response = validate_and_save_file(mock_file)
-    
-    assert response == "sample_image.jpg"
+    response = validate_and_save_file(file)
+
+    digest = hashlib.sha256(content).hexdigest()
+    assert response == f"{digest[:2]}/{digest}.jpg"
+    assert os.path.exists(os.path.join(authenticated_client.application.config['UPLOAD_FOLDER'], response))
 
 
 def test_create_task_with_image(authenticated_client):
@@ -60,7 +66,7 @@ def test_create_task_with_image(authenticated_client):
 
         task = Task.query.filter_by(title='Task with Image').first()
         assert task is not None
-        assert task.image == 'file.png'
+        assert task.image.endswith(hashlib.sha256(b"fake_data").hexdigest() + '.png')
 
 
 def test_create_task_without_image(authenticated_client):
@@ -86,24 +92,27 @@ def test_validate_and_save_file_invalid_extension(authenticated_client, mocker):
 
 def test_validate_and_save_file_too_large(authenticated_client, mocker):
     mocker.patch('services.task_service.flash')  # Mock de flash
-    mock_file = mocker.Mock()
-    mock_file.filename = "large_file.jpg"
-    mock_file.seek = mocker.Mock()
-    mock_file.tell.return_value = 10 * 1024 * 1024  # 10 MB (supera el límite de 5 MB)
+    content = b"x" * (10 * 1024 * 1024)  # 10 MB (supera el límite de 5 MB)
+    file = FileStorage(stream=io.BytesIO(content), filename="large_file.jpg")
 
-    response = validate_and_save_file(mock_file)
+    response = validate_and_save_file(file)
     assert response is None
+    upload_folder = authenticated_client.application.config['UPLOAD_FOLDER']
+    assert not any(name.startswith('.upload-') for name in os.listdir(upload_folder))
 
 
-def test_delete_old_file(authenticated_client, mocker):
+def test_delete_old_file(authenticated_client):
     filename = "existing_file.png"
-    file_path = os.path.join('static/uploads', filename)
-
-    mocker.patch('os.path.exists', return_value=True)
-    mocker.patch('os.remove')
+    file_path = os.path.join(authenticated_client.application.config['UPLOAD_FOLDER'], filename)
+    with open(file_path, 'wb') as legacy:
+        legacy.write(b"legacy")
 
+    # El archivo no se borra durante la petición sino en el sweeper
     delete_old_file(filename)
-    os.remove.assert_called_once_with(file_path)
+    assert os.path.exists(file_path)
+
+    collect_unreferenced_uploads(min_age=0)
+    assert not os.path.exists(file_path)
 
 
 def test_create_task_with_image(authenticated_client):
@@ -117,7 +126,7 @@ def test_create_task_with_image(authenticated_client):
     assert response.status_code == 302
     task = Task.query.filter_by(title='Task Image Test').first()
     assert task is not None
-    assert task.image == 'task_image.jpg'
+    assert task.image.endswith(hashlib.sha256(b"fake_data").hexdigest() + '.jpg')
 
 
 def test_create_task_without_image(authenticated_client):
@@ -128,3 +137,155 @@ def test_create_task_without_image(authenticated_client):
     })
 
     assert response.status_code == 302
+
+
+def test_get_task_page_filters_and_paginates(authenticated_client):
+    user = User.query.filter_by(username='testuser').first()
+    tasks = [Task(title=f'Task {i}', priority=i % 3 + 1, is_complete=(i % 4 == 0), owner=user) for i in range(20)]
+    db.session.add_all(tasks)
+    db.session.commit()
+
+    seen = []
+    cursor = None
+    while True:
+        page, cursor = get_task_page(user, is_complete=False, after=cursor, limit=4)
+        assert len(page) <= 4
+        seen.extend(page)
+        if cursor is None:
+            break
+
+    expected = sorted((t for t in tasks if not t.is_complete), key=lambda t: (t.priority, t.id))
+    assert [t.id for t in seen] == [t.id for t in expected]
+
+    urgent, cursor = get_task_page(user, priority=3, limit=100)
+    assert cursor is None
+    assert all(t.priority == 3 for t in urgent)
+
+
+def test_dashboard_invalid_cursor(authenticated_client):
+    response = authenticated_client.get('/tasks/dashboard?after=invalid')
+    assert response.status_code == 400
+
+
+def test_identical_uploads_are_deduplicated(authenticated_client):
+    for title in ('First', 'Second'):
+        authenticated_client.post('/tasks/dashboard', data={
+            'title': title,
+            'priority': 2,
+            'image': (io.BytesIO(b"same content"), f"{title}.png")
+        })
+
+    first = Task.query.filter_by(title='First').first()
+    second = Task.query.filter_by(title='Second').first()
+    assert first.image == second.image
+
+    attachment = Attachment.query.filter_by(filename=first.image).first()
+    assert attachment.ref_count == 2
+
+    path = os.path.join(authenticated_client.application.config['UPLOAD_FOLDER'], first.image)
+    delete_old_file(first.image)
+    db.session.commit()
+    assert os.path.exists(path)
+    assert attachment.ref_count == 1
+
+    delete_old_file(second.image)
+    db.session.commit()
+    assert os.path.exists(path)
+
+    assert collect_unreferenced_uploads() == 1
+    assert not os.path.exists(path)
+    assert Attachment.query.count() == 0
+
+
+def test_upload_spool_rolls_over_to_disk(tmp_path):
+    spool = UploadSpool(limit=1024, threshold=100, folder=str(tmp_path))
+    spool.write(b"a" * 60)
+    assert spool.path is None
+
+    spool.write(b"b" * 60)
+    assert spool.path is not None and os.path.exists(spool.path)
+    assert spool.digest == hashlib.sha256(b"a" * 60 + b"b" * 60).hexdigest()
+
+    spool.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_upload_spool_rejects_oversized_data(tmp_path):
+    spool = UploadSpool(limit=100, threshold=10, folder=str(tmp_path))
+    spool.write(b"a" * 50)
+    with pytest.raises(RequestEntityTooLarge):
+        spool.write(b"a" * 51)
+    assert os.listdir(tmp_path) == []
+
+
+def test_oversized_upload_rejected_while_streaming(authenticated_client):
+    app = authenticated_client.application
+    app.config['MAX_UPLOAD_SIZE'] = 1024
+    response = authenticated_client.post('/tasks/dashboard', data={
+        'title': 'Too big',
+        'priority': 2,
+        'image': (io.BytesIO(b"x" * 4096), "big.png")
+    })
+
+    assert response.status_code == 302
+    assert Task.query.filter_by(title='Too big').first() is None
+    assert not any(name.startswith('.upload-') for name in os.listdir(app.config['UPLOAD_FOLDER']))
+
+
+def test_dashboard_conditional_get(authenticated_client, mocker):
+    mocker.patch('services.api_service.fetch_game_deals', return_value=[])
+    first = authenticated_client.get('/tasks/dashboard')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert 'no-cache' in first.headers['Cache-Control']
+
+    get_task_page = mocker.spy(routes.tasks, 'get_task_page')
+    repeat = authenticated_client.get('/tasks/dashboard', headers={'If-None-Match': etag})
+    assert repeat.status_code == 304
+    assert repeat.data == b''
+    get_task_page.assert_not_called()
+
+    other_filter = authenticated_client.get('/tasks/dashboard?status=done', headers={'If-None-Match': etag})
+    assert other_filter.status_code == 200
+    assert other_filter.headers['ETag'] != etag
+
+
+def test_task_changes_bump_dashboard_version(authenticated_client, mocker):
+    mocker.patch('services.api_service.fetch_game_deals', return_value=[])
+    user = User.query.filter_by(username='testuser').first()
+    authenticated_client.get('/tasks/dashboard')
+    etag = authenticated_client.get('/tasks/dashboard').headers['ETag']
+
+    authenticated_client.post('/tasks/dashboard', data={'title': 'New', 'description': '', 'priority': 1})
+    assert get_task_list_version(user) == 1
+    response = authenticated_client.get('/tasks/dashboard', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert b'New' in response.data
+
+    task = Task.query.filter_by(title='New').first()
+    authenticated_client.post(f'/tasks/toggle_complete/{task.id}')
+    authenticated_client.post(f'/tasks/edit_task/{task.id}', data={'title': 'Renamed', 'description': '', 'priority': 2})
+    authenticated_client.post('/api/v1/tasks/batch', json={'operations': [{'op': 'toggle', 'id': task.id}]})
+    assert get_task_list_version(user) == 4
+
+    # Las operaciones fallidas no cambian la versión
+    authenticated_client.post('/api/v1/tasks/batch', json={'operations': [{'op': 'toggle', 'id': 9999}]})
+    assert get_task_list_version(user) == 4
+
+
+def test_task_list_fragment_is_cached_until_tasks_change(authenticated_client, mocker):
+    mocker.patch('services.api_service.fetch_game_deals', return_value=[])
+    user = User.query.filter_by(username='testuser').first()
+    db.session.add(Task(title='Cached task', priority=1, owner=user))
+    db.session.commit()
+    get_task_page = mocker.spy(routes.tasks, 'get_task_page')
+
+    assert b'Cached task' in authenticated_client.get('/tasks/dashboard').data
+    assert b'Cached task' in authenticated_client.get('/tasks/dashboard').data
+    assert get_task_page.call_count == 1
+
+    authenticated_client.post('/tasks/dashboard', data={'title': 'Fresh task', 'description': '', 'priority': 2})
+    assert task_list_fragments.stats()['size'] == 0
+    response = authenticated_client.get('/tasks/dashboard')
+    assert b'Fresh task' in response.data
+    assert get_task_page.call_count == 2
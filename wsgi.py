@@ -0,0 +1,11 @@
+"""
+Production WSGI entry point.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+With `preload_app` (see gunicorn.conf.py) this module is imported once in the gunicorn
+master and the workers share the loaded code and app through copy-on-write.
+"""
+from app import create_app
+
+app = create_app()